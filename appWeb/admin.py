@@ -1,7 +1,12 @@
 from django.contrib import admin
-from .models import Vendedor, Produto, ImagemProduto  # ajuste os nomes que você tiver
+from .models import Vendedor, Produto, ImagemProduto, EmailPendente  # ajuste os nomes que você tiver
 
 admin.site.register(Vendedor)
 admin.site.register(Produto)
 admin.site.register(ImagemProduto)
 
+
+@admin.register(EmailPendente)
+class EmailPendenteAdmin(admin.ModelAdmin):
+    list_display = ("assunto", "status", "tentativas", "proxima_tentativa_em", "criado_em")
+    list_filter = ("status",)
@@ -0,0 +1,130 @@
+"""
+API JSON somente leitura do catálogo (v1), para o app mobile.
+
+- Só produtos disponíveis de vendedores disponíveis (mesmo filtro das telas do
+  comprador) e vendedores disponíveis.
+- Paginação por cursor, na mesma ordem (nome, id) do catálogo HTML.
+- ``?fields=a,b`` escolhe os campos (ver serializers.CamposSelecionaveisMixin).
+- ``/vendedores/?celular=`` acha o vendedor pelo telefone, em qualquer formato.
+- ``ETag``/``Last-Modified`` vêm de ``atualizado_em`` (de produtos e
+  vendedores) + contagem de linhas, calculados com uma query de agregação.
+  Nos vendedores entra também ``produtos_atualizados_em``: os contadores
+  (``produtos_disponiveis``) mudam por ``.update()``, sem tocar em
+  ``atualizado_em`` (appWeb/contadores.py).
+  Se o cliente mandar ``If-None-Match``/``If-Modified-Since`` e nada mudou,
+  a resposta é 304 sem serializar nada.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework import viewsets
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+from .models import Vendedor, Produto
+from .serializers import ProdutoSerializer, VendedorSerializer
+from .telefones import normalizar_celular
+
+
+class CatalogoCursorPagination(CursorPagination):
+    ordering = ("nome", "id")
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
+class VendedorCursorPagination(CatalogoCursorPagination):
+    ordering = ("nome_venda", "id")
+
+
+def _validadores(request, *datas, extra=""):
+    """ETag e Last-Modified (timestamp) a partir das datas de alteração."""
+    datas = [d for d in datas if d is not None]
+    ultima = max(datas) if datas else None
+    base = "|".join([request.get_full_path(), extra] + [d.isoformat() for d in datas])
+    etag = '"%s"' % hashlib.md5(base.encode(), usedforsecurity=False).hexdigest()
+    return etag, int(ultima.timestamp()) if ultima else None
+
+
+class CondicionalMixin:
+    """
+    ``list``/``retrieve`` com GET condicional. As subclasses dizem como
+    calcular as datas sem carregar os objetos (``datas_lista``/``datas_objeto``).
+    """
+
+    def _responder(self, request, etag, last_modified, gerar):
+        nao_modificado = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if nao_modificado is not None:
+            return nao_modificado
+        response = gerar()
+        response["ETag"] = etag
+        if last_modified:
+            response["Last-Modified"] = http_date(last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        datas, extra = self.datas_lista(self.filter_queryset(self.get_queryset()))
+        etag, last_modified = _validadores(request, *datas, extra=extra)
+        return self._responder(
+            request, etag, last_modified, lambda: super(CondicionalMixin, self).list(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        objeto = self.get_object()
+        etag, last_modified = _validadores(request, *self.datas_objeto(objeto))
+        return self._responder(
+            request, etag, last_modified, lambda: Response(self.get_serializer(objeto).data)
+        )
+
+
+class ProdutoViewSet(CondicionalMixin, viewsets.ReadOnlyModelViewSet):
+    serializer_class = ProdutoSerializer
+    pagination_class = CatalogoCursorPagination
+
+    def get_queryset(self):
+        produtos = Produto.objects.select_related("vendedor").filter(
+            status_disponivel=True,
+            vendedor__status_disponivel=True,
+        )
+        vendedor = self.request.query_params.get("vendedor")
+        if vendedor and vendedor.isdigit():
+            produtos = produtos.filter(vendedor_id=vendedor)
+        return produtos
+
+    def datas_lista(self, queryset):
+        agregado = queryset.order_by().aggregate(
+            produto=Max("atualizado_em"),
+            vendedor=Max("vendedor__atualizado_em"),
+            total=Count("id"),
+        )
+        return (agregado["produto"], agregado["vendedor"]), str(agregado["total"])
+
+    def datas_objeto(self, produto):
+        return produto.atualizado_em, produto.vendedor.atualizado_em
+
+
+class VendedorViewSet(CondicionalMixin, viewsets.ReadOnlyModelViewSet):
+    serializer_class = VendedorSerializer
+    pagination_class = VendedorCursorPagination
+
+    def get_queryset(self):
+        vendedores = Vendedor.objects.filter(status_disponivel=True)
+        # ?celular= em qualquer formato; a busca é exata no índice de celular_e164
+        celular = self.request.query_params.get("celular")
+        if celular is not None:
+            e164 = normalizar_celular(celular)
+            vendedores = vendedores.filter(celular_e164=e164) if e164 else vendedores.none()
+        return vendedores
+
+    def datas_lista(self, queryset):
+        agregado = queryset.order_by().aggregate(
+            vendedor=Max("atualizado_em"),
+            contadores=Max("produtos_atualizados_em"),
+            total=Count("id"),
+        )
+        return (agregado["vendedor"], agregado["contadores"]), str(agregado["total"])
+
+    def datas_objeto(self, vendedor):
+        return vendedor.atualizado_em, vendedor.produtos_atualizados_em
@@ -0,0 +1,241 @@
+"""
+Backup e restauração de Vendedor / Produto / ImagemProduto.
+
+Cada backup é um arquivo ``backup_<data e hora>_<tipo>.jsonl.gz`` no diretório de
+destino, com um objeto por linha no formato do ``dumpdata`` (lido de volta por
+appWeb/carga.py). As linhas saem do banco com ``.iterator(chunk_size=...)``,
+então nem o banco inteiro nem o arquivo inteiro ficam na memória.
+
+- Completo: todas as linhas.
+- Incremental: só as linhas com ``atualizado_em``/``criado_em`` depois do
+  backup anterior (o horário fica em ``backup_estado.json``). Remoções não
+  aparecem no incremental: a restauração de completo + incrementais não apaga
+  o que foi removido depois do completo.
+
+O incremental confia em ``atualizado_em``, e ``.update()``/``bulk_update`` não
+passam pelo ``auto_now``. Quem grava assim atualiza o campo à mão: as ações em
+lote (lote_produtos.py), a conversão de senhas (senhas.py) e o backfill de
+miniaturas (``imagens.regerar_miniatura``). Ficam de fora, de propósito, os
+campos derivados que a restauração recalcula (``finalizar_carga``): contadores
+do vendedor (contadores.py), ``celular_e164`` (telefones.py) e a busca.
+ImagemProduto não tem ``atualizado_em``: uma miniatura regerada de imagem da
+galeria só entra no próximo backup completo.
+
+As imagens vão para ``media/<sha256[:2]>/<sha256>`` dentro do destino
+(armazenamento por conteúdo). O arquivo do backup só registra
+``{"model": "media", "campo", "nome", "sha256"}``; um arquivo que já está no
+armazenamento (ou um nome que já foi arquivado antes) não é copiado de novo.
+"""
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from itertools import islice
+from pathlib import Path
+
+from django.core import serializers
+from django.core.files import File
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils import timezone
+
+from .carga import carregar_objetos, ler_objetos
+from .dados_sinteticos import finalizar_carga
+from .imagens import CAMPOS_MINIATURA
+from .models import ImagemProduto, Produto, Vendedor
+
+MODELO_MEDIA = "media"
+ARQUIVO_ESTADO = "backup_estado.json"
+
+# pais antes dos filhos (FK)
+_MODELS = (Vendedor, Produto, ImagemProduto)
+# derivado: é recalculado pela reindexação depois da carga
+_IGNORAR = {"busca_vetor"}
+
+_TAMANHO_BLOCO = 1024 * 1024
+
+
+def _campos(model):
+    return [
+        campo.name for campo in model._meta.concrete_fields
+        if not campo.primary_key and campo.name not in _IGNORAR
+    ]
+
+
+def _campos_imagem(model):
+    return CAMPOS_MINIATURA[model.__name__]
+
+
+def _caminho_media(destino, sha256):
+    return Path(destino) / "media" / sha256[:2] / sha256
+
+
+def ler_estado(destino):
+    caminho = Path(destino) / ARQUIVO_ESTADO
+    if not caminho.exists():
+        return {"ultimo": None, "media": {}}
+    with open(caminho) as f:
+        estado = json.load(f)
+    estado.setdefault("ultimo", None)
+    estado.setdefault("media", {})
+    return estado
+
+
+def _salvar_estado(destino, estado):
+    caminho = Path(destino) / ARQUIVO_ESTADO
+    tmp = caminho.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump(estado, f)
+    os.replace(tmp, caminho)
+
+
+def _arquivar(destino, storage, nome):
+    """Copia ``nome`` do storage para o armazenamento por conteúdo; devolve o sha256."""
+    pasta = Path(destino) / "media"
+    pasta.mkdir(parents=True, exist_ok=True)
+    sha = hashlib.sha256()
+    with storage.open(nome, "rb") as origem, tempfile.NamedTemporaryFile(dir=pasta, delete=False) as tmp:
+        for bloco in iter(lambda: origem.read(_TAMANHO_BLOCO), b""):
+            sha.update(bloco)
+            tmp.write(bloco)
+    digest = sha.hexdigest()
+    final = _caminho_media(destino, digest)
+    if final.exists():
+        os.remove(tmp.name)
+    else:
+        final.parent.mkdir(exist_ok=True)
+        os.replace(tmp.name, final)
+    return digest
+
+
+def fazer_backup(destino, incremental=False, chunk_size=2000, com_media=True, log=None):
+    """
+    Gera um backup em ``destino``. Devolve (caminho, {label: linhas}, arquivos de
+    media copiados). Sem backup anterior, o incremental vira completo.
+    """
+    log = log or (lambda msg: None)
+    destino = Path(destino)
+    destino.mkdir(parents=True, exist_ok=True)
+    estado = ler_estado(destino)
+    # horário de antes da leitura: o que mudar durante o backup entra no próximo
+    inicio = timezone.now()
+
+    desde = None
+    if incremental and estado["ultimo"]:
+        desde = estado["ultimo"]
+    tipo = "incremental" if desde else "completo"
+    caminho = destino / f"backup_{inicio:%Y%m%d_%H%M%S_%f}_{tipo}.jsonl.gz"
+
+    # só ganha o nome final (e entra no listar_backups) quando termina
+    parcial = caminho.with_name(caminho.name + ".parcial")
+    contagem, copiados = {}, 0
+    with gzip.open(parcial, "wt", encoding="utf-8") as saida:
+        for model in _MODELS:
+            campos = _campos(model)
+            qs = model.objects.order_by("pk")
+            if desde:
+                filtro = Q(criado_em__gt=desde)
+                if "atualizado_em" in campos:
+                    filtro |= Q(atualizado_em__gt=desde)
+                qs = qs.filter(filtro)
+            if model is Produto:
+                qs = qs.defer(*_IGNORAR)
+
+            label = model._meta.label_lower
+            contagem[label] = 0
+            linhas = qs.iterator(chunk_size=chunk_size)
+            while True:
+                bloco = list(islice(linhas, chunk_size))
+                if not bloco:
+                    break
+                for objeto in serializers.serialize("python", bloco, fields=campos):
+                    saida.write(json.dumps(objeto, cls=DjangoJSONEncoder) + "\n")
+                if com_media:
+                    copiados += _backup_media(destino, estado, model, bloco, saida, log)
+                contagem[label] += len(bloco)
+                log(f"{label}: {contagem[label]}")
+
+    os.replace(parcial, caminho)
+    estado["ultimo"] = inicio.isoformat()
+    _salvar_estado(destino, estado)
+    return caminho, contagem, copiados
+
+
+def _backup_media(destino, estado, model, bloco, saida, log):
+    copiados = 0
+    for nome_campo in _campos_imagem(model):
+        storage = model._meta.get_field(nome_campo).storage
+        chave_campo = f"{model._meta.label_lower}.{nome_campo}"
+        for instance in bloco:
+            nome = getattr(instance, nome_campo).name
+            if not nome:
+                continue
+            # o storage nunca reaproveita um nome: nome já arquivado = mesmo conteúdo
+            digest = estado["media"].get(nome)
+            if digest is None or not _caminho_media(destino, digest).exists():
+                try:
+                    digest = _arquivar(destino, storage, nome)
+                except OSError as e:
+                    log(f"  sem arquivo para {chave_campo} {instance.pk} ({nome}): {e}")
+                    continue
+                estado["media"][nome] = digest
+                copiados += 1
+            saida.write(json.dumps({
+                "model": MODELO_MEDIA, "campo": chave_campo, "nome": nome, "sha256": digest,
+            }) + "\n")
+    return copiados
+
+
+def listar_backups(origem):
+    """Último backup completo de ``origem`` e os incrementais depois dele, em ordem."""
+    arquivos = sorted(Path(origem).glob("backup_*.jsonl.gz"))
+    completos = [i for i, a in enumerate(arquivos) if a.name.endswith("_completo.jsonl.gz")]
+    if not completos:
+        return []
+    return arquivos[completos[-1]:]
+
+
+def restaurar(arquivos, origem=None, lote=5000, com_media=True, log=None):
+    """
+    Carrega os ``arquivos`` em ordem (upsert por pk) e devolve a contagem
+    somada. As imagens saem de ``origem``/media para o storage de cada campo,
+    se ainda não estiverem lá.
+    """
+    log = log or (lambda msg: None)
+    total = {"media": 0}
+    for caminho in arquivos:
+        pasta = Path(origem) if origem else Path(caminho).parent
+        objetos = _separar_media(ler_objetos(caminho), pasta, com_media, total)
+        contagem = carregar_objetos(objetos, lote=lote, substituir=True, finalizar=False, log=log)
+        for label, quantidade in contagem.items():
+            total[label] = total.get(label, 0) + quantidade
+        log(f"{caminho}: ok")
+    finalizar_carga()
+    return total
+
+
+def _separar_media(objetos, pasta, com_media, total):
+    """Repassa as linhas de model; restaura as de media no caminho."""
+    for objeto in objetos:
+        if objeto.get("model") != MODELO_MEDIA:
+            yield objeto
+            continue
+        if com_media and _restaurar_arquivo(pasta, objeto):
+            total["media"] += 1
+
+
+def _restaurar_arquivo(pasta, registro):
+    label, nome_campo = registro["campo"].rsplit(".", 1)
+    model = {m._meta.label_lower: m for m in _MODELS}[label]
+    storage = model._meta.get_field(nome_campo).storage
+    nome = registro["nome"]
+    if storage.exists(nome):
+        return False
+    # o storage de mídia renomeia pelo conteúdo; aqui o nome tem que ser o do backup
+    salvar = getattr(storage, "salvar_no_nome", storage.save)
+    with open(_caminho_media(pasta, registro["sha256"]), "rb") as f:
+        salvo = salvar(nome, File(f))
+    if salvo != nome:
+        raise RuntimeError(f"storage gravou {nome} como {salvo}")
+    return True
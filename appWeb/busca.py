@@ -0,0 +1,236 @@
+"""
+Busca textual do catálogo do comprador.
+
+- Postgres: coluna ``Produto.busca_vetor`` (tsvector) com índice GIN,
+  ranqueada por ``SearchRank``.
+- SQLite: tabela sombra FTS5 ``appWeb_produto_fts`` (rowid = id do produto),
+  ranqueada por bm25.
+- Qualquer outro banco (ou SQLite sem FTS5) cai no icontains antigo.
+
+Se a tabela FTS existe é conferido uma vez por conexão (``connection_created``
+zera a resposta guardada) e não a cada busca ou save.
+
+O índice é mantido pelos signals em ``appWeb/signals.py``. Operações em massa
+(bulk_create, QuerySet.update) não disparam signals; depois delas rode
+``python manage.py reindexar_busca``.
+"""
+import re
+
+from django.db import connection, OperationalError
+from django.db.backends.signals import connection_created
+from django.db.models import F, Q, Value
+from django.dispatch import receiver
+
+from .models import Produto, Vendedor
+
+FTS_TABLE = "appWeb_produto_fts"
+PG_CONFIG = "portuguese"
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _tokens(termo):
+    return _TOKEN_RE.findall(termo or "")[:10]
+
+
+def _produtos_disponiveis():
+    return Produto.objects.filter(
+        status_disponivel=True,
+        vendedor__status_disponivel=True,
+    )
+
+
+# ---------------------------------------------------------------
+# Postgres (SearchVector + GIN)
+# ---------------------------------------------------------------
+def _vetor_pg(nome_venda):
+    from django.contrib.postgres.search import SearchVector
+
+    return (
+        SearchVector("nome", weight="A", config=PG_CONFIG)
+        + SearchVector(Value(nome_venda or ""), weight="A", config=PG_CONFIG)
+        + SearchVector("descricao", weight="B", config=PG_CONFIG)
+    )
+
+
+def _buscar_ids_pg(tokens, inicio, limite):
+    from django.contrib.postgres.search import SearchQuery, SearchRank
+
+    # prefixo em cada palavra ("brig" acha "brigadeiro"), todas obrigatórias
+    query = SearchQuery(
+        " & ".join(f"{tok}:*" for tok in tokens),
+        search_type="raw",
+        config=PG_CONFIG,
+    )
+    ids = (
+        _produtos_disponiveis()
+        .filter(busca_vetor=query)
+        .annotate(rank=SearchRank(F("busca_vetor"), query))
+        .order_by("-rank", "id")
+        .values_list("id", flat=True)
+    )
+    return list(ids[inicio:inicio + limite])
+
+
+# ---------------------------------------------------------------
+# SQLite (FTS5)
+# ---------------------------------------------------------------
+_PRODUTO = Produto._meta.db_table
+_VENDEDOR = Vendedor._meta.db_table
+
+_SQL_FTS_INSERIR = (
+    f'INSERT INTO "{FTS_TABLE}" (rowid, nome, descricao, nome_venda) '
+    "SELECT p.id, p.nome, p.descricao, v.nome_venda "
+    f'FROM "{_PRODUTO}" p JOIN "{_VENDEDOR}" v ON v.id = p.vendedor_id '
+)
+
+
+@receiver(connection_created)
+def _esquecer_fts(sender, connection, **kwargs):
+    # conexão nova (ou reaberta): a tabela pode ter sido criada/apagada
+    connection.fts_disponivel = None
+
+
+def _fts_disponivel():
+    if connection.vendor != "sqlite":
+        return False
+    if getattr(connection, "fts_disponivel", None) is None:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+                [FTS_TABLE],
+            )
+            connection.fts_disponivel = cursor.fetchone() is not None
+    return connection.fts_disponivel
+
+
+def criar_tabela_fts():
+    """Cria a tabela FTS5 se não existir. Ignora SQLite sem FTS5."""
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS "{FTS_TABLE}" '
+                "USING fts5(nome, descricao, nome_venda, "
+                "tokenize='unicode61 remove_diacritics 2')"
+            )
+    except OperationalError:
+        return False
+    connection.fts_disponivel = None
+    return True
+
+
+def _buscar_ids_sqlite(tokens, inicio, limite):
+    # cada palavra entre aspas (escapa a sintaxe do FTS5) e com prefixo
+    match = " ".join('"{}"*'.format(tok.replace('"', '""')) for tok in tokens)
+    # pesos do bm25 por coluna: nome, descricao, nome_venda
+    sql = (
+        f'SELECT p.id FROM "{FTS_TABLE}" f '
+        f'JOIN "{_PRODUTO}" p ON p.id = f.rowid '
+        f'JOIN "{_VENDEDOR}" v ON v.id = p.vendedor_id '
+        f'WHERE "{FTS_TABLE}" MATCH %s '
+        "AND p.status_disponivel AND v.status_disponivel "
+        f'ORDER BY bm25("{FTS_TABLE}", 10.0, 2.0, 10.0), p.id '
+        "LIMIT %s OFFSET %s"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [match, limite, inicio])
+        return [row[0] for row in cursor.fetchall()]
+
+
+# ---------------------------------------------------------------
+# Fallback (icontains)
+# ---------------------------------------------------------------
+def _buscar_ids_icontains(termo, inicio, limite):
+    ids = (
+        _produtos_disponiveis()
+        .filter(Q(nome__icontains=termo) | Q(vendedor__nome_venda__icontains=termo))
+        .order_by("nome", "id")
+        .values_list("id", flat=True)
+    )
+    return list(ids[inicio:inicio + limite])
+
+
+# ---------------------------------------------------------------
+# API usada pelas views
+# ---------------------------------------------------------------
+def buscar_ids(termo, inicio=0, limite=20):
+    """
+    Ids dos produtos disponíveis que batem com ``termo``, do mais relevante
+    para o menos relevante.
+    """
+    tokens = _tokens(termo)
+    if not tokens:
+        return []
+    if connection.vendor == "postgresql":
+        return _buscar_ids_pg(tokens, inicio, limite)
+    if _fts_disponivel():
+        return _buscar_ids_sqlite(tokens, inicio, limite)
+    return _buscar_ids_icontains(termo, inicio, limite)
+
+
+def buscar_produtos(termo, inicio=0, limite=20):
+    """Como ``buscar_ids``, mas devolve os Produto (com vendedor) na ordem do ranking."""
+    ids = buscar_ids(termo, inicio, limite)
+    por_id = Produto.objects.select_related("vendedor").in_bulk(ids)
+    return [por_id[i] for i in ids if i in por_id]
+
+
+def indexar_produto(produto):
+    if connection.vendor == "postgresql":
+        Produto.objects.filter(pk=produto.pk).update(
+            busca_vetor=_vetor_pg(produto.vendedor.nome_venda)
+        )
+    elif _fts_disponivel():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM "{FTS_TABLE}" WHERE rowid = %s', [produto.pk])
+            cursor.execute(_SQL_FTS_INSERIR + "WHERE p.id = %s", [produto.pk])
+
+
+def indexar_vendedor(vendedor):
+    """Reindexa todos os produtos do vendedor (nome_venda entra no índice)."""
+    if connection.vendor == "postgresql":
+        Produto.objects.filter(vendedor=vendedor).update(
+            busca_vetor=_vetor_pg(vendedor.nome_venda)
+        )
+    elif _fts_disponivel():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM "{FTS_TABLE}" WHERE rowid IN '
+                f'(SELECT id FROM "{_PRODUTO}" WHERE vendedor_id = %s)',
+                [vendedor.pk],
+            )
+            cursor.execute(_SQL_FTS_INSERIR + "WHERE p.vendedor_id = %s", [vendedor.pk])
+
+
+def remover_produto(produto_id):
+    if _fts_disponivel():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM "{FTS_TABLE}" WHERE rowid = %s', [produto_id])
+
+
+def remover_produtos(produto_ids):
+    """Tira vários produtos do índice num único DELETE (exclusão em lote)."""
+    produto_ids = list(produto_ids)
+    if produto_ids and _fts_disponivel():
+        marcadores = ", ".join(["%s"] * len(produto_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM "{FTS_TABLE}" WHERE rowid IN ({marcadores})', produto_ids)
+
+
+def reindexar_tudo():
+    """Reconstrói o índice inteiro. Devolve o número de produtos indexados."""
+    if connection.vendor == "postgresql":
+        total = 0
+        for vendedor in Vendedor.objects.only("id", "nome_venda").iterator():
+            total += Produto.objects.filter(vendedor=vendedor).update(
+                busca_vetor=_vetor_pg(vendedor.nome_venda)
+            )
+        return total
+    if connection.vendor == "sqlite":
+        criar_tabela_fts()
+        if _fts_disponivel():
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM "{FTS_TABLE}"')
+                cursor.execute(_SQL_FTS_INSERIR)
+                return cursor.rowcount
+    return 0
@@ -0,0 +1,94 @@
+"""
+Cache das páginas públicas do vendedor e do produto (visão do comprador).
+
+Essas páginas só mudam quando o vendedor edita algo, então guardamos o HTML
+renderizado e invalidamos pelos signals (appWeb/signals.py):
+
+- cada vendedor tem uma "versão" no cache (um token aleatório). Qualquer
+  alteração no vendedor ou nos produtos dele troca o token;
+- a página do vendedor é guardada sob a chave (vendedor, versão);
+- a página do produto é guardada sob o id do produto, junto com o id do
+  vendedor e a versão do vendedor no momento em que foi renderizada. Ela só
+  vale se essa versão ainda for a atual (a página mostra nome, telefone e
+  status do vendedor). Alterações na galeria apagam só a página do produto.
+
+Como a versão é um token e não um contador, se o cache perder a chave da
+versão (LRU, restart) um token novo é criado e as páginas antigas
+simplesmente deixam de casar.
+
+O backend é o cache ``default`` do Django (locmem, arquivo ou Redis, ver
+CACHE_BACKEND em settings.py).
+"""
+import uuid
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+
+PREFIXO = "catalogo"
+
+
+def _timeout():
+    return getattr(settings, "CATALOGO_CACHE_TIMEOUT", 600)
+
+
+def _chave_versao(vendedor_id):
+    return f"{PREFIXO}:versao:vendedor:{vendedor_id}"
+
+
+def _chave_pagina_vendedor(vendedor_id, versao):
+    return f"{PREFIXO}:pagina:vendedor:{vendedor_id}:{versao}"
+
+
+def _chave_pagina_produto(produto_id):
+    return f"{PREFIXO}:pagina:produto:{produto_id}"
+
+
+def versao_vendedor(vendedor_id):
+    versao = cache.get(_chave_versao(vendedor_id))
+    if versao is None:
+        cache.add(_chave_versao(vendedor_id), uuid.uuid4().hex, None)
+        versao = cache.get(_chave_versao(vendedor_id))
+    return versao
+
+
+def invalidar_vendedor(vendedor_id):
+    """Invalida a página do vendedor e as de todos os produtos dele."""
+    cache.set(_chave_versao(vendedor_id), uuid.uuid4().hex, None)
+
+
+def invalidar_vendedores(vendedor_ids):
+    """``invalidar_vendedor`` de vários, com um ``set_many``."""
+    cache.set_many({_chave_versao(vendedor_id): uuid.uuid4().hex for vendedor_id in vendedor_ids}, None)
+
+
+def invalidar_produto(produto_id):
+    cache.delete(_chave_pagina_produto(produto_id))
+
+
+def pode_usar_cache(request):
+    # mensagens do framework de messages são por usuário e vão no base.html
+    return request.method == "GET" and not len(get_messages(request))
+
+
+def pagina_vendedor(vendedor_id, versao):
+    return cache.get(_chave_pagina_vendedor(vendedor_id, versao))
+
+
+def guardar_pagina_vendedor(vendedor_id, versao, conteudo):
+    cache.set(_chave_pagina_vendedor(vendedor_id, versao), conteudo, _timeout())
+
+
+def pagina_produto(produto_id):
+    entrada = cache.get(_chave_pagina_produto(produto_id))
+    if entrada and entrada["versao"] == versao_vendedor(entrada["vendedor_id"]):
+        return entrada["conteudo"]
+    return None
+
+
+def guardar_pagina_produto(produto_id, vendedor_id, versao, conteudo):
+    cache.set(
+        _chave_pagina_produto(produto_id),
+        {"vendedor_id": vendedor_id, "versao": versao, "conteudo": conteudo},
+        _timeout(),
+    )
@@ -0,0 +1,200 @@
+"""
+Carga em massa de Vendedor / Produto / ImagemProduto a partir de fixtures.
+
+O ``loaddata`` do Django desserializa o arquivo inteiro na memória e salva
+linha a linha. Aqui:
+
+- ``ler_objetos`` lê o arquivo de forma incremental: JSON no formato do
+  ``dumpdata`` (um array) ou JSONL (um objeto por linha), opcionalmente .gz;
+- ``carregar_objetos`` agrupa os objetos por model e insere com
+  ``bulk_create`` em lotes, cada lote na sua transação.
+
+Os objetos mantêm o pk do arquivo e as datas (``criado_em``/``atualizado_em``)
+originais. Objetos de outros models são ignorados (e contados).
+"""
+import gzip
+import json
+
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .dados_sinteticos import finalizar_carga
+from .models import ImagemProduto, Produto, Vendedor
+
+MODELS = {
+    "appweb.vendedor": Vendedor,
+    "appweb.produto": Produto,
+    "appweb.imagemproduto": ImagemProduto,
+}
+
+# campos auto_now/auto_now_add de cada model
+_CAMPOS_DATA = {
+    model: [
+        campo.attname for campo in model._meta.concrete_fields
+        if getattr(campo, "auto_now", False) or getattr(campo, "auto_now_add", False)
+    ]
+    for model in MODELS.values()
+}
+
+_TAMANHO_LEITURA = 1024 * 1024
+
+
+def _abrir(caminho):
+    if str(caminho).endswith(".gz"):
+        return gzip.open(caminho, "rt", encoding="utf-8")
+    return open(caminho, "r", encoding="utf-8")
+
+
+def _objetos_array(arquivo, inicio):
+    """Percorre um array JSON grande decodificando um elemento por vez."""
+    decoder = json.JSONDecoder()
+    buffer = inicio
+    pos = buffer.index("[") + 1
+    while True:
+        # pula espaços e vírgulas entre elementos
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buffer):
+                break
+            mais = arquivo.read(_TAMANHO_LEITURA)
+            if not mais:
+                return
+            buffer, pos = mais, 0
+
+        if buffer[pos] == "]":
+            return
+        try:
+            objeto, fim = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            mais = arquivo.read(_TAMANHO_LEITURA)
+            if not mais:
+                raise
+            buffer, pos = buffer[pos:] + mais, 0
+            continue
+        yield objeto
+        pos = fim
+
+
+def ler_objetos(caminho):
+    """Gera os objetos ({"model", "pk", "fields"}) de um .json/.jsonl (ou .gz)."""
+    with _abrir(caminho) as arquivo:
+        inicio = ""
+        while not inicio.strip():
+            mais = arquivo.read(_TAMANHO_LEITURA)
+            if not mais:
+                return
+            inicio += mais
+
+        if inicio.lstrip().startswith("["):
+            yield from _objetos_array(arquivo, inicio)
+            return
+
+        # JSONL
+        for linha in _linhas(inicio, arquivo):
+            linha = linha.strip()
+            if linha:
+                yield json.loads(linha)
+
+
+def _linhas(inicio, arquivo):
+    pendente = inicio
+    while True:
+        *completas, pendente = pendente.split("\n")
+        yield from completas
+        mais = arquivo.read(_TAMANHO_LEITURA)
+        if not mais:
+            break
+        pendente += mais
+    if pendente:
+        yield pendente
+
+
+def _instancia(model, objeto):
+    dados = {}
+    for nome, valor in objeto.get("fields", {}).items():
+        try:
+            campo = model._meta.get_field(nome)
+        except Exception:
+            continue
+        if campo.many_to_many or campo.one_to_many:
+            continue
+        dados[campo.attname] = valor
+    # datas ausentes no arquivo ficam com o horário da carga
+    for nome in _CAMPOS_DATA[model]:
+        dados.setdefault(nome, timezone.now())
+    return model(pk=objeto.get("pk"), **dados)
+
+
+def carregar_objetos(objetos, lote=5000, substituir=False, finalizar=True, log=None):
+    """
+    Insere os objetos com bulk_create, ``lote`` por transação. Com
+    ``substituir``, linhas com o mesmo pk são sobrescritas (upsert), como ao
+    aplicar um backup incremental. ``finalizar=False`` deixa a reindexação da
+    busca e a limpeza do cache para quem chamou (ao carregar vários arquivos).
+    Devolve um dict {label: quantidade} (inclui "ignorados").
+    """
+    log = log or (lambda msg: None)
+    contagem = {label: 0 for label in MODELS}
+    contagem["ignorados"] = 0
+    pendentes = {label: [] for label in MODELS}
+
+    def gravar(label):
+        objs = pendentes[label]
+        if not objs:
+            return
+        model = MODELS[label]
+        opcoes = {}
+        if substituir:
+            opcoes = {
+                "update_conflicts": True,
+                "unique_fields": [model._meta.pk.name],
+                "update_fields": [
+                    campo.name for campo in model._meta.concrete_fields if not campo.primary_key
+                ],
+            }
+        # o bulk_create passa pelo pre_save do auto_now e troca as datas pelo
+        # horário da carga; elas voltam às do arquivo com um bulk_update (que
+        # não chama o pre_save) na mesma transação. Desligar o auto_now nos
+        # campos não serve: eles são do model, compartilhados entre threads.
+        campos_data = _CAMPOS_DATA[model]
+        datas = [[getattr(obj, nome) for nome in campos_data] for obj in objs]
+        with transaction.atomic():
+            model.objects.bulk_create(objs, batch_size=lote, **opcoes)
+            if campos_data:
+                for obj, valores in zip(objs, datas):
+                    for nome, valor in zip(campos_data, valores):
+                        setattr(obj, nome, valor)
+                com_pk = [obj for obj in objs if obj.pk is not None]
+                model.objects.bulk_update(com_pk, campos_data, batch_size=lote)
+        contagem[label] += len(objs)
+        pendentes[label] = []
+        log(f"{label}: {contagem[label]}")
+
+    for objeto in objetos:
+        label = str(objeto.get("model", "")).lower()
+        if label not in MODELS:
+            contagem["ignorados"] += 1
+            continue
+        # os models dependem dos anteriores (FK): grava os pais pendentes antes
+        for anterior in MODELS:
+            if anterior == label:
+                break
+            gravar(anterior)
+        pendentes[label].append(_instancia(MODELS[label], objeto))
+        if len(pendentes[label]) >= lote:
+            gravar(label)
+    for label in MODELS:
+        gravar(label)
+
+    # pks vieram do arquivo: ajusta as sequences (Postgres)
+    sql = connection.ops.sequence_reset_sql(no_style(), list(MODELS.values()))
+    if sql:
+        with connection.cursor() as cursor:
+            for comando in sql:
+                cursor.execute(comando)
+
+    if finalizar:
+        finalizar_carga()
+    return contagem
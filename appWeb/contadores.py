@@ -0,0 +1,116 @@
+"""
+Contadores de produtos desnormalizados no Vendedor.
+
+``total_produtos``, ``produtos_disponiveis`` e ``produtos_atualizados_em``
+evitam um COUNT sobre Produto no painel, nas páginas do comprador e na API.
+Os signals (appWeb/signals.py) aplicam deltas com ``F()`` a cada produto
+criado, alterado ou removido, sem ler o vendedor. Como ``Vendedor.save()``
+não grava esses campos, um vendedor carregado antes não sobrescreve a
+contagem.
+
+Operações em massa (bulk_create, QuerySet.update/delete) não disparam
+signals: depois delas chame ``reconciliar`` (o ``finalizar_carga`` já chama)
+ou rode ``python manage.py reconciliar_contadores``.
+"""
+from django.db.models import Count, F, Max, Q
+from django.utils import timezone
+
+from . import cache_catalogo
+from .models import Produto, Vendedor
+
+CONTADORES = Vendedor.CAMPOS_CONTADORES
+
+
+def _aplicar(vendedor_id, total=0, disponiveis=0):
+    Vendedor.objects.filter(pk=vendedor_id).update(
+        total_produtos=F("total_produtos") + total,
+        produtos_disponiveis=F("produtos_disponiveis") + disponiveis,
+        produtos_atualizados_em=timezone.now(),
+    )
+
+
+def guardar_estado_anterior(produto):
+    """pre_save: lembra (vendedor, disponível) do produto como está no banco."""
+    produto._contadores_antes = None
+    if produto.pk and not produto._state.adding:
+        produto._contadores_antes = (
+            Produto.objects.filter(pk=produto.pk)
+            .values_list("vendedor_id", "status_disponivel")
+            .first()
+        )
+
+
+def produto_salvo(produto, created):
+    antes = None if created else getattr(produto, "_contadores_antes", None)
+    disponivel = int(bool(produto.status_disponivel))
+    if antes is None:
+        _aplicar(produto.vendedor_id, total=1, disponiveis=disponivel)
+        return
+
+    vendedor_antes, disponivel_antes = antes
+    if vendedor_antes != produto.vendedor_id:
+        _aplicar(vendedor_antes, total=-1, disponiveis=-int(disponivel_antes))
+        _aplicar(produto.vendedor_id, total=1, disponiveis=disponivel)
+    else:
+        _aplicar(produto.vendedor_id, disponiveis=disponivel - int(disponivel_antes))
+
+
+def produto_removido(produto):
+    _aplicar(produto.vendedor_id, total=-1, disponiveis=-int(bool(produto.status_disponivel)))
+
+
+def recontar(vendedor_id):
+    """
+    Regrava os contadores de um vendedor a partir de Produto. Usado depois das
+    ações em lote do vendedor (appWeb/lote_produtos.py), que não disparam os
+    signals por produto.
+    """
+    contagem = Produto.objects.filter(vendedor_id=vendedor_id).aggregate(
+        total=Count("id"),
+        disponiveis=Count("id", filter=Q(status_disponivel=True)),
+    )
+    Vendedor.objects.filter(pk=vendedor_id).update(
+        total_produtos=contagem["total"],
+        produtos_disponiveis=contagem["disponiveis"],
+        produtos_atualizados_em=timezone.now(),
+    )
+
+
+def reconciliar(vendedor_ids=None, lote=1000):
+    """
+    Recalcula os contadores a partir de Produto, ``lote`` vendedores por vez,
+    e grava só os que estavam errados. Devolve quantos foram corrigidos.
+    """
+    vendedores = Vendedor.objects.order_by("pk")
+    if vendedor_ids is not None:
+        vendedores = vendedores.filter(pk__in=list(vendedor_ids))
+
+    corrigidos = 0
+    ultimo = 0
+    while True:
+        bloco = list(
+            vendedores.filter(pk__gt=ultimo)
+            .annotate(
+                contagem_total=Count("produtos"),
+                contagem_disponiveis=Count("produtos", filter=Q(produtos__status_disponivel=True)),
+                ultima_alteracao=Max("produtos__atualizado_em"),
+            )
+            .only("pk", "total_produtos", "produtos_disponiveis", "produtos_atualizados_em")[:lote]
+        )
+        if not bloco:
+            return corrigidos
+        ultimo = bloco[-1].pk
+
+        errados = []
+        for vendedor in bloco:
+            if (vendedor.total_produtos, vendedor.produtos_disponiveis) != (
+                vendedor.contagem_total, vendedor.contagem_disponiveis
+            ):
+                vendedor.total_produtos = vendedor.contagem_total
+                vendedor.produtos_disponiveis = vendedor.contagem_disponiveis
+                vendedor.produtos_atualizados_em = vendedor.ultima_alteracao
+                errados.append(vendedor)
+        Vendedor.objects.bulk_update(errados, CONTADORES)
+        for vendedor in errados:
+            cache_catalogo.invalidar_vendedor(vendedor.pk)
+        corrigidos += len(errados)
@@ -0,0 +1,114 @@
+"""
+Gerador de catálogos sintéticos (vendedores + produtos) para benchmarks e
+ambientes de desenvolvimento.
+
+Tudo entra com ``bulk_create`` em lotes, então não passa pelos signals: no fim
+o índice de busca é reconstruído e o cache do catálogo é invalidado.
+"""
+import random
+from decimal import Decimal
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from . import busca, cache_catalogo, contadores, telefones
+from .models import Vendedor, Produto
+
+SENHA_PADRAO = "Senha123!"
+
+LOTE_CACHE = 1000
+
+_COMIDAS = [
+    "Brigadeiro", "Beijinho", "Bolo de pote", "Brownie", "Cookie", "Coxinha",
+    "Empada", "Pão de queijo", "Esfirra", "Trufa", "Cuscuz", "Tapioca",
+    "Pastel", "Quibe", "Bolo de cenoura", "Pudim", "Cone trufado", "Palha italiana",
+    "Sanduíche natural", "Salada de frutas", "Açaí", "Mousse", "Torta de limão",
+]
+_SABORES = [
+    "tradicional", "de chocolate", "de morango", "de ninho", "de maracujá",
+    "de frango", "de carne", "vegano", "de doce de leite", "de coco",
+    "com Nutella", "de queijo", "integral", "zero açúcar", "de paçoca",
+]
+_MARCAS = [
+    "Doces", "Delícias", "Cantinho", "Sabores", "Quitutes", "Lanches", "Ateliê",
+]
+_NOMES = [
+    "Ana", "Bruno", "Carla", "Diego", "Elisa", "Felipe", "Gabi", "Heitor",
+    "Isa", "João", "Larissa", "Marcos", "Nina", "Otávio", "Paula", "Rafa",
+]
+_LOCAIS = [
+    "Saída do bandejão", "Prainha", "Biblioteca central", "Bloco A",
+    "Ponto de ônibus", "Centro de convivência", "Portaria principal",
+]
+
+
+def _em_lotes(total, lote):
+    inicio = 0
+    while inicio < total:
+        yield inicio, min(lote, total - inicio)
+        inicio += lote
+
+
+def gerar_catalogo(vendedores=10, produtos=100, lote=5000, seed=None, prefixo_email="sintetico", log=None):
+    """
+    Cria ``vendedores`` vendedores ativos e ``produtos`` produtos distribuídos
+    entre eles. Todos os vendedores usam a senha ``SENHA_PADRAO`` (o hash é
+    calculado uma vez só). Devolve (ids_vendedores, total_produtos).
+    """
+    rng = random.Random(seed)
+    senha = make_password(SENHA_PADRAO)
+    log = log or (lambda msg: None)
+
+    novos = []
+    for i in range(vendedores):
+        nome = rng.choice(_NOMES)
+        novos.append(Vendedor(
+            email=f"{prefixo_email}{i}@example.com",
+            senha=senha,
+            is_active=True,
+            nome_completo=f"{nome} Sintético {i}",
+            nome_venda=f"{rng.choice(_MARCAS)} da {nome} {i}",
+            celular=f"(11) 9{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}",
+            local_principal_venda=rng.choice(_LOCAIS),
+            status_disponivel=rng.random() < 0.9,
+        ))
+    with transaction.atomic():
+        Vendedor.objects.bulk_create(novos, batch_size=lote)
+    ids_vendedores = list(
+        Vendedor.objects.filter(email__startswith=prefixo_email).order_by("id").values_list("id", flat=True)
+    )
+    log(f"{len(ids_vendedores)} vendedores")
+
+    for inicio, tamanho in _em_lotes(produtos, lote):
+        objs = [
+            Produto(
+                vendedor_id=rng.choice(ids_vendedores),
+                nome=f"{rng.choice(_COMIDAS)} {rng.choice(_SABORES)}",
+                preco=Decimal(rng.randint(150, 2500)) / 100,
+                descricao=f"{rng.choice(_COMIDAS)} feito hoje, {rng.choice(_SABORES)}.",
+                status_disponivel=rng.random() < 0.85,
+            )
+            for _ in range(tamanho)
+        ]
+        with transaction.atomic():
+            Produto.objects.bulk_create(objs, batch_size=lote)
+        log(f"{inicio + tamanho}/{produtos} produtos")
+
+    finalizar_carga()
+    return ids_vendedores, produtos
+
+
+def finalizar_carga():
+    """
+    Depois de bulk_create: normaliza os celulares, recalcula os contadores de
+    produtos, reindexa a busca e invalida o cache do catálogo. Só o do
+    catálogo: um ``cache.clear()`` levaria junto as sessões, o limite de
+    login e as métricas, que moram no mesmo cache.
+    """
+    telefones.preencher_celulares()
+    contadores.reconciliar()
+    busca.reindexar_tudo()
+    ids = Vendedor.objects.order_by("pk").values_list("pk", flat=True).iterator(chunk_size=LOTE_CACHE)
+    while bloco := list(islice(ids, LOTE_CACHE)):
+        cache_catalogo.invalidar_vendedores(bloco)
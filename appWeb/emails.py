@@ -0,0 +1,114 @@
+"""
+Fila de e-mails (outbox) guardada no banco.
+
+As views chamam ``enfileirar_email`` (um INSERT) em vez de ``send_mail``, então
+o tempo de resposta do cadastro e da redefinição de senha não depende mais do
+provedor (SendGrid/SMTP). O comando ``python manage.py enviar_emails`` drena a
+fila em lotes com ``enviar_pendentes``.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import EmailPendente
+
+MAX_TENTATIVAS = 5
+# espera entre tentativas: 1, 2, 4, 8... minutos, até 1 hora
+BACKOFF_BASE = timedelta(minutes=1)
+BACKOFF_MAX = timedelta(hours=1)
+
+
+def enfileirar_email(assunto, mensagem, destinatarios, remetente=None):
+    return EmailPendente.objects.create(
+        assunto=assunto,
+        mensagem=mensagem,
+        remetente=remetente or getattr(settings, "DEFAULT_FROM_EMAIL", "no-reply@localhost"),
+        destinatarios=list(destinatarios),
+    )
+
+
+def _proxima_tentativa(tentativas):
+    return timezone.now() + min(BACKOFF_BASE * (2 ** (tentativas - 1)), BACKOFF_MAX)
+
+
+def _registrar_falha(email, erro, max_tentativas):
+    email.tentativas += 1
+    email.ultimo_erro = str(erro)[:1000]
+    if email.tentativas >= max_tentativas:
+        email.status = EmailPendente.FALHOU
+    else:
+        email.proxima_tentativa_em = _proxima_tentativa(email.tentativas)
+
+
+def _reservar_lote(tamanho):
+    """
+    Pega até ``tamanho`` e-mails vencidos e empurra a próxima tentativa deles
+    para frente, para outro worker não pegar os mesmos enquanto enviamos.
+    """
+    agora = timezone.now()
+    with transaction.atomic():
+        lote = list(
+            EmailPendente.objects.select_for_update(skip_locked=True)
+            .filter(status=EmailPendente.PENDENTE, proxima_tentativa_em__lte=agora)
+            .order_by("proxima_tentativa_em", "id")[:tamanho]
+        )
+        if lote:
+            EmailPendente.objects.filter(pk__in=[e.pk for e in lote]).update(
+                proxima_tentativa_em=agora + BACKOFF_MAX
+            )
+    return lote
+
+
+def enviar_pendentes(tamanho_lote=50, max_tentativas=MAX_TENTATIVAS):
+    """
+    Envia um lote da fila. Devolve (enviados, falhas).
+
+    Usa uma única conexão com o backend de e-mail para o lote inteiro; cada
+    mensagem que falhar é reagendada com backoff exponencial, e depois de
+    ``max_tentativas`` fica com status "falhou".
+    """
+    lote = _reservar_lote(tamanho_lote)
+    if not lote:
+        return 0, 0
+
+    enviados = falhas = 0
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        # provedor fora do ar: o lote inteiro conta como uma tentativa falha
+        for email in lote:
+            _registrar_falha(email, e, max_tentativas)
+        falhas = len(lote)
+    else:
+        try:
+            for email in lote:
+                msg = EmailMessage(
+                    email.assunto,
+                    email.mensagem,
+                    email.remetente,
+                    email.destinatarios,
+                    connection=connection,
+                )
+                try:
+                    msg.send()
+                except Exception as e:
+                    _registrar_falha(email, e, max_tentativas)
+                    falhas += 1
+                else:
+                    email.tentativas += 1
+                    email.status = EmailPendente.ENVIADO
+                    email.enviado_em = timezone.now()
+                    email.ultimo_erro = ""
+                    enviados += 1
+        finally:
+            connection.close()
+
+    EmailPendente.objects.bulk_update(
+        lote,
+        ["status", "tentativas", "proxima_tentativa_em", "ultimo_erro", "enviado_em"],
+    )
+    return enviados, falhas
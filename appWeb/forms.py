@@ -1,5 +1,8 @@
+from decimal import Decimal
+
 from django import forms
 from .models import Vendedor, Produto, ImagemProduto
+from .lote_produtos import ACOES
 
 
 class VendedorForm(forms.ModelForm):
@@ -21,6 +24,29 @@ class ProdutoForm(forms.ModelForm):
         fields = ["nome", "imagem", "preco", "descricao", "status_disponivel"]
 
 
+class AcoesProdutosForm(forms.Form):
+    """Ação em lote sobre os produtos marcados em listar_produtos."""
+    acao = forms.ChoiceField(choices=ACOES)
+    produtos = forms.ModelMultipleChoiceField(queryset=Produto.objects.none())
+    percentual = forms.DecimalField(
+        required=False,
+        max_digits=6,
+        decimal_places=2,
+        min_value=Decimal("-99"),
+        max_value=Decimal("1000"),
+    )
+
+    def __init__(self, *args, vendedor, **kwargs):
+        super().__init__(*args, **kwargs)
+        # só os produtos do próprio vendedor são escolhas válidas
+        self.fields["produtos"].queryset = vendedor.produtos.only("pk")
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get("acao") == "preco" and cleaned_data.get("percentual") is None:
+            self.add_error("percentual", "Informe o percentual do reajuste.")
+        return cleaned_data
+
 
 class AlterarSenhaVendedorForm(forms.Form):
     senha_atual = forms.CharField(
@@ -0,0 +1,104 @@
+"""
+Upload em lote das imagens da galeria (ImagemProduto).
+
+Criar as imagens uma a uma (``ImagemProduto.objects.create`` num loop) faz um
+upload síncrono e um INSERT por arquivo, o que é lento com o Cloudinary. Aqui:
+
+1. original e miniatura são enviados ao storage em paralelo, num pool de
+   threads limitado (GALERIA_UPLOAD_WORKERS). As threads só transferem os
+   bytes: o registro em ArquivoMidia (``storage.salvar_em_paralelo``) fica
+   nesta thread, dentro da transação da view;
+2. se algum upload falhar, o que já tinha subido é apagado e nada vai pro banco;
+3. as linhas entram com um único ``bulk_create`` dentro de uma transação; se
+   ele falhar, os arquivos enviados também são apagados.
+
+As views envolvem o ``form.save()`` e a galeria em
+``storage.apagar_envios_se_falhar()``: se algo falhar depois dos uploads, a
+imagem principal, a miniatura dela e a galeria já enviadas também saem do
+storage. ``remover_imagens`` apaga os arquivos depois do commit.
+
+``bulk_create`` não dispara signals, então a invalidação do cache da página do
+produto é feita aqui mesmo.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+
+from . import cache_catalogo
+from .imagens import gerar_miniatura, nome_miniatura
+from .models import ImagemProduto
+from .storage import FalhaNoEnvio, apagar_envios_se_falhar, salvar_em_paralelo
+
+
+class ErroUploadGaleria(Exception):
+    pass
+
+
+def _workers():
+    return getattr(settings, "GALERIA_UPLOAD_WORKERS", 4)
+
+
+def _itens(produto, arquivo):
+    """(nome, conteúdo) do original e, se der para gerar, da miniatura."""
+    campo = ImagemProduto._meta.get_field("imagem")
+    campo_miniatura = ImagemProduto._meta.get_field("imagem_miniatura")
+    instance = ImagemProduto(produto=produto)
+
+    itens = [(campo.generate_filename(instance, arquivo.name), arquivo)]
+    conteudo_miniatura = gerar_miniatura(arquivo)
+    if conteudo_miniatura is not None:
+        itens.append((
+            campo_miniatura.generate_filename(instance, nome_miniatura(arquivo.name)),
+            ContentFile(conteudo_miniatura),
+        ))
+    return itens
+
+
+def adicionar_imagens(produto, arquivos):
+    """
+    Adiciona ``arquivos`` (UploadedFile) à galeria de ``produto``, tudo ou nada.
+    Devolve a lista de ImagemProduto criadas.
+    """
+    arquivos = list(arquivos)
+    if not arquivos:
+        return []
+
+    por_arquivo = [_itens(produto, arquivo) for arquivo in arquivos]
+    itens = [item for par in por_arquivo for item in par]
+    storage = ImagemProduto._meta.get_field("imagem").storage
+    with apagar_envios_se_falhar():
+        try:
+            with ThreadPoolExecutor(max_workers=min(_workers(), len(itens))) as pool:
+                nomes = iter(salvar_em_paralelo(storage, itens, pool))
+        except FalhaNoEnvio as e:
+            raise ErroUploadGaleria(f"{len(e.erros)} de {len(itens)} arquivos falharam: {e.erros[0]}")
+
+        objs = []
+        for par in por_arquivo:
+            nome = next(nomes)
+            objs.append(ImagemProduto(
+                produto=produto,
+                imagem=nome,
+                imagem_miniatura=next(nomes) if len(par) > 1 else None,
+            ))
+        with transaction.atomic():
+            criadas = ImagemProduto.objects.bulk_create(objs)
+
+    transaction.on_commit(lambda: cache_catalogo.invalidar_produto(produto.pk))
+    return criadas
+
+
+def remover_imagens(produto, ids):
+    """
+    Remove da galeria as imagens ``ids`` que pertencem ao ``produto``. Os
+    signals tiram as referências dos arquivos, que saem do storage depois do
+    commit (appWeb/limpeza_midia.py): se a transação for desfeita, as linhas
+    voltam e precisam deles.
+    """
+    ids = [i for i in ids if str(i).isdigit()]
+    if not ids:
+        return 0
+    removidas, _ = ImagemProduto.objects.filter(produto=produto, id__in=ids).delete()
+    return removidas
@@ -0,0 +1,167 @@
+"""
+Miniaturas (derivadas) das imagens enviadas pelos vendedores.
+
+As listagens mostram as imagens em cards de 64px e o avatar em 96px; mandar o
+original de vários MB para isso é desperdício. Quando uma imagem nova é
+enviada, geramos uma miniatura quadrada de tamanho fixo (WebP, ou JPEG se o
+Pillow não tiver suporte a WebP) e guardamos ao lado do original, no campo
+``*_miniatura`` correspondente.
+"""
+import asyncio
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+
+# (campo original, campo da miniatura) por model
+CAMPOS_MINIATURA = {
+    "Vendedor": ("foto_perfil", "foto_perfil_miniatura"),
+    "Produto": ("imagem", "imagem_miniatura"),
+    "ImagemProduto": ("imagem", "imagem_miniatura"),
+}
+
+# 2x o maior tamanho em que as miniaturas aparecem (avatar de 96px)
+MINIATURA_TAMANHO = (192, 192)
+MINIATURA_QUALIDADE = 80
+
+if features.check("webp"):
+    MINIATURA_FORMATO, MINIATURA_EXTENSAO = "WEBP", "webp"
+else:
+    MINIATURA_FORMATO, MINIATURA_EXTENSAO = "JPEG", "jpg"
+
+
+def nome_miniatura(nome):
+    """``produtos/bolo.png`` -> ``bolo_mini.webp`` (o upload_to põe a pasta)."""
+    base, _ = os.path.splitext(os.path.basename(nome))
+    return f"{base}_mini.{MINIATURA_EXTENSAO}"
+
+
+def gerar_miniatura(arquivo):
+    """
+    Lê ``arquivo`` (qualquer file-like com uma imagem) e devolve os bytes da
+    miniatura, ou None se não for uma imagem que o Pillow consiga abrir.
+    """
+    try:
+        arquivo.seek(0)
+        with Image.open(arquivo) as img:
+            img = ImageOps.exif_transpose(img)
+            img = ImageOps.fit(img, MINIATURA_TAMANHO, Image.Resampling.LANCZOS)
+            if MINIATURA_FORMATO == "JPEG":
+                img = img.convert("RGB")
+            elif img.mode not in ("RGB", "RGBA"):
+                img = img.convert("RGBA")
+            buffer = io.BytesIO()
+            img.save(buffer, MINIATURA_FORMATO, quality=MINIATURA_QUALIDADE, optimize=True)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+    finally:
+        try:
+            arquivo.seek(0)
+        except Exception:
+            pass
+    return buffer.getvalue()
+
+
+def preparar_miniatura(instance):
+    """
+    Se a imagem do ``instance`` acabou de ser enviada (ainda não gravada no
+    storage), anexa a miniatura no campo correspondente. Chamado no pre_save,
+    então original e miniatura são gravados no mesmo ``save()``.
+    """
+    campos = CAMPOS_MINIATURA.get(type(instance).__name__)
+    if not campos:
+        return
+    campo, campo_miniatura = campos
+
+    original = getattr(instance, campo)
+    if not original:
+        setattr(instance, campo_miniatura, None)
+        return
+    if getattr(original, "_committed", True):
+        # imagem já estava no storage: nada mudou
+        return
+
+    conteudo = gerar_miniatura(original.file)
+    if conteudo is None:
+        setattr(instance, campo_miniatura, None)
+        return
+    setattr(instance, campo_miniatura, ContentFile(conteudo, name=nome_miniatura(original.name)))
+
+
+def regerar_miniatura(instance):
+    """
+    Gera a miniatura de uma imagem que já está no storage (backfill).
+    Devolve True se gerou.
+    """
+    campo, campo_miniatura = CAMPOS_MINIATURA[type(instance).__name__]
+    original = getattr(instance, campo)
+    if not original:
+        return False
+    with original.open("rb") as arquivo:
+        conteudo = gerar_miniatura(arquivo)
+    if conteudo is None:
+        return False
+    getattr(instance, campo_miniatura).save(nome_miniatura(original.name), ContentFile(conteudo), save=False)
+    campos = {campo_miniatura: getattr(instance, campo_miniatura).name}
+    # o update() não passa pelo auto_now; sem isso o backup incremental não leva a miniatura
+    if any(f.name == "atualizado_em" for f in instance._meta.concrete_fields):
+        campos["atualizado_em"] = timezone.now()
+    type(instance).objects.filter(pk=instance.pk).update(**campos)
+    return True
+
+
+def arquivo_card(instance):
+    """O que os cards e avatares mostram: a miniatura ou, sem ela, a original."""
+    campo, campo_miniatura = CAMPOS_MINIATURA[type(instance).__name__]
+    return getattr(instance, campo_miniatura) or getattr(instance, campo)
+
+
+async def resolver_urls(arquivos):
+    """
+    URLs dos ``arquivos`` (FieldFile; vazio vira ""), na mesma ordem. No
+    FileSystemStorage a URL é só uma concatenação e as que já estão no LRU do
+    UrlEmCacheStorage (appWeb/storage.py) saem na hora; nos storages remotos
+    (Cloudinary) as demais passam pelo SDK, então são resolvidas em paralelo,
+    em threads, sem travar o event loop.
+    """
+    def url(arquivo):
+        return arquivo.url if arquivo else ""
+
+    def url_imediata(arquivo):
+        if not arquivo:
+            return ""
+        if isinstance(arquivo.storage, FileSystemStorage):
+            return arquivo.url
+        em_memoria = getattr(arquivo.storage, "url_em_memoria", None)
+        return em_memoria(arquivo.name) if em_memoria else None
+
+    urls = [url_imediata(a) for a in arquivos]
+    pendentes = [i for i, u in enumerate(urls) if u is None]
+    if pendentes:
+        executor = _executor_urls()
+        resolvidas = await asyncio.gather(
+            *(sync_to_async(url, thread_sensitive=False, executor=executor)(arquivos[i]) for i in pendentes)
+        )
+        for i, u in zip(pendentes, resolvidas):
+            urls[i] = u
+    return urls
+
+
+_executor = None
+
+
+def _executor_urls():
+    # pool próprio: o executor padrão do asyncio tem só min(32, CPUs + 4) threads
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, "STORAGE_URL_WORKERS", 32),
+            thread_name_prefix="storage-url",
+        )
+    return _executor
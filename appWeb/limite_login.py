@@ -0,0 +1,109 @@
+"""
+Limite de tentativas de login (login_vendedor).
+
+Cada tentativa que falha conta para duas chaves: o IP de origem e o e-mail
+digitado. Quando uma delas passa do limite dentro da janela, o login é
+recusado logo no início, antes de buscar o vendedor e de rodar o
+``check_password`` (PBKDF2, caro de propósito), então uma rajada de
+credential stuffing não prende os workers do gunicorn em CPU.
+
+A janela é deslizante, aproximada com dois contadores fixos no cache (o
+período atual e o anterior): a contagem é ``atual + anterior * fração do
+período anterior que ainda cai na janela``. São no máximo quatro chaves por
+login, lidas com um único ``get_many``.
+
+O backend é o cache ``default`` (locmem, arquivo ou Redis, ver CACHE_BACKEND
+em settings.py); com locmem o limite vale por processo.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+PREFIXO = "login:falhas"
+
+
+def _janela():
+    return getattr(settings, "LOGIN_JANELA_SEGUNDOS", 300)
+
+
+def _limites():
+    return {
+        "ip": getattr(settings, "LOGIN_MAX_FALHAS_IP", 30),
+        "email": getattr(settings, "LOGIN_MAX_FALHAS_EMAIL", 5),
+    }
+
+
+def ip_da_requisicao(request):
+    """
+    IP do cliente. Atrás do roteador do Heroku o REMOTE_ADDR é o do proxy; com
+    LOGIN_CONFIAR_X_FORWARDED_FOR o último endereço do X-Forwarded-For (o que
+    o próprio proxy acrescentou, o cliente não controla) é usado.
+    """
+    if getattr(settings, "LOGIN_CONFIAR_X_FORWARDED_FOR", False):
+        encaminhado = request.META.get("HTTP_X_FORWARDED_FOR", "")
+        if encaminhado.strip():
+            return encaminhado.split(",")[-1].strip()
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def _identificadores(ip, email):
+    email = (email or "").strip().lower()
+    ids = {"ip": ip or "-"}
+    if email:
+        ids["email"] = hashlib.sha256(email.encode()).hexdigest()[:32]
+    return ids
+
+
+def _chave(tipo, identificador, periodo):
+    return f"{PREFIXO}:{tipo}:{identificador}:{periodo}"
+
+
+def bloqueado(ip, email, agora=None):
+    """True se o IP ou o e-mail já passaram do limite de falhas na janela."""
+    agora = time.time() if agora is None else agora
+    janela = _janela()
+    periodo = int(agora // janela)
+    peso_anterior = 1 - (agora % janela) / janela
+
+    ids = _identificadores(ip, email)
+    chaves = {
+        tipo: (_chave(tipo, ident, periodo), _chave(tipo, ident, periodo - 1))
+        for tipo, ident in ids.items()
+    }
+    valores = cache.get_many([chave for par in chaves.values() for chave in par])
+
+    limites = _limites()
+    for tipo, (atual, anterior) in chaves.items():
+        contagem = valores.get(atual, 0) + valores.get(anterior, 0) * peso_anterior
+        if contagem >= limites[tipo]:
+            return True
+    return False
+
+
+def registrar_falha(ip, email, agora=None):
+    agora = time.time() if agora is None else agora
+    janela = _janela()
+    periodo = int(agora // janela)
+    for tipo, ident in _identificadores(ip, email).items():
+        chave = _chave(tipo, ident, periodo)
+        # o contador precisa sobreviver ao período seguinte, onde vira o "anterior"
+        cache.add(chave, 0, janela * 2)
+        try:
+            cache.incr(chave)
+        except ValueError:
+            # expirou entre o add e o incr
+            cache.set(chave, 1, janela * 2)
+
+
+def limpar_email(email, agora=None):
+    """Login certo zera as falhas do e-mail (as do IP continuam contando)."""
+    agora = time.time() if agora is None else agora
+    periodo = int(agora // _janela())
+    ids = _identificadores("", email)
+    if "email" in ids:
+        cache.delete_many([
+            _chave("email", ids["email"], periodo),
+            _chave("email", ids["email"], periodo - 1),
+        ])
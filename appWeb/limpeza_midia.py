@@ -0,0 +1,231 @@
+"""
+Coleta dos arquivos de mídia órfãos.
+
+Excluir um Produto apaga as linhas de ImagemProduto em cascata e trocar a
+``foto_perfil`` no editar_perfil só troca o nome no banco: os arquivos ficam no
+storage (MEDIA_ROOT ou Cloudinary) para sempre. Aqui:
+
+1. os nomes usados pelos seis ImageFields (original e miniatura de Vendedor,
+   Produto e ImagemProduto) vão para um set, lidos em blocos com ``iterator``;
+2. as pastas de upload desses campos (e a ``midia/`` do
+   ConteudoEnderecadoStorage) são percorridas no storage;
+3. o que não está no set, e é mais velho que ``idade_minima`` (um upload em
+   andamento ainda não tem a linha no banco), é apagado em lotes, com
+   ``workers`` threads (no Cloudinary cada exclusão é uma chamada HTTP).
+
+A contagem de ArquivoMidia não entra na decisão: nomes gravados sem ``save``
+(restore, carga) ou apagados por fora não passam por ela, então quem decide são
+os nomes nos ImageFields. Por isso o arquivo é apagado direto no storage de
+verdade, e a linha de ArquivoMidia dele sai junto: um upload futuro do mesmo
+conteúdo envia o arquivo de novo.
+
+No dia a dia a contagem é mantida aqui, chamada pelos signals
+(appWeb/signals.py) e pela exclusão em lote (appWeb/lote_produtos.py): excluir
+um model ou trocar a imagem de um campo tira uma referência dos nomes que ele
+usava (``soltar``), e o arquivo que chega a zero, e que nenhum ImageField usa,
+sai do storage depois do commit.
+
+Antes de apagar um lote, as linhas de ArquivoMidia dele são travadas e as
+referências conferidas de novo no banco: um upload do mesmo conteúdo que
+chegou durante a varredura reaproveitaria o arquivo.
+
+Uso: ``python manage.py limpar_midia [--dry-run]``.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .imagens import CAMPOS_MINIATURA
+from .models import ArquivoMidia, ImagemProduto, Produto, Vendedor
+from .storage import ConteudoEnderecadoStorage, conteudo_enderecado, storage_de_verdade
+
+MODELS = (Vendedor, Produto, ImagemProduto)
+
+
+def _campos():
+    for model in MODELS:
+        for nome_campo in CAMPOS_MINIATURA[model.__name__]:
+            yield model, nome_campo
+
+
+def nomes_referenciados(chunk_size=5000):
+    """Todos os nomes de arquivo guardados nos ImageFields."""
+    nomes = set()
+    for model, nome_campo in _campos():
+        qs = model.objects.exclude(**{nome_campo: ""}).exclude(**{f"{nome_campo}__isnull": True})
+        nomes.update(qs.values_list(nome_campo, flat=True).iterator(chunk_size=chunk_size))
+    return nomes
+
+
+def _pastas():
+    pastas = {model._meta.get_field(nome_campo).upload_to for model, nome_campo in _campos()}
+    pastas.add(ConteudoEnderecadoStorage.PASTA + "/")
+    pastas = sorted(p if p.endswith("/") else p + "/" for p in pastas)
+    # "produtos/" já inclui "produtos/catalogo/"
+    return [p for p in pastas if not any(p != o and p.startswith(o) for o in pastas)]
+
+
+def listar_arquivos(storage, pasta):
+    """Arquivos de ``pasta`` e subpastas (caminhos relativos ao storage)."""
+    try:
+        subpastas, arquivos = storage.listdir(pasta)
+    except FileNotFoundError:
+        return
+    for arquivo in arquivos:
+        yield pasta + arquivo
+    for subpasta in subpastas:
+        yield from listar_arquivos(storage, f"{pasta}{subpasta}/")
+
+
+def _velho(storage, nome, limite):
+    try:
+        return storage.get_modified_time(nome) < limite
+    except NotImplementedError:
+        # storage sem data (Cloudinary): só a conferência no banco protege
+        return True
+
+
+def em_uso(nomes):
+    """Quais de ``nomes`` algum ImageField ainda usa."""
+    referenciados = set()
+    for model, nome_campo in _campos():
+        referenciados.update(
+            model.objects.filter(**{f"{nome_campo}__in": nomes}).values_list(nome_campo, flat=True)
+        )
+    return referenciados
+
+
+def arquivos_de(instance):
+    """Nomes guardados nos ImageFields (original e miniatura) de ``instance``."""
+    nomes = []
+    for nome_campo in CAMPOS_MINIATURA[type(instance).__name__]:
+        arquivo = getattr(instance, nome_campo)
+        if arquivo:
+            nomes.append(arquivo.name)
+    return nomes
+
+
+def arquivos_dos_produtos(produto_ids):
+    """Nomes usados pelos produtos ``produto_ids`` e pelas galerias deles."""
+    nomes = []
+    for model, filtro in ((Produto, "pk__in"), (ImagemProduto, "produto_id__in")):
+        campos = CAMPOS_MINIATURA[model.__name__]
+        for par in model.objects.filter(**{filtro: produto_ids}).values_list(*campos):
+            nomes.extend(nome for nome in par if nome)
+    return nomes
+
+
+def guardar_arquivos_anteriores(instance, update_fields=None):
+    """
+    pre_save: lembra os nomes dos ImageFields como estão no banco e quais
+    campos receberam um upload agora (um upload do mesmo conteúdo mantém o
+    nome, mas soma uma referência).
+    """
+    instance._arquivos_antes = None
+    if not instance.pk or instance._state.adding:
+        return
+    campos = [
+        c for c in CAMPOS_MINIATURA[type(instance).__name__]
+        if c not in instance.get_deferred_fields() and (update_fields is None or c in update_fields)
+    ]
+    if not campos:
+        return
+    antes = type(instance).objects.filter(pk=instance.pk).values_list(*campos).first()
+    if antes is not None:
+        enviados = {c for c in campos if getattr(instance, c) and not getattr(instance, c)._committed}
+        instance._arquivos_antes = (campos, antes, enviados)
+
+
+def arquivos_trocados(instance):
+    """post_save: solta os nomes que saíram dos ImageFields de ``instance``."""
+    guardado = getattr(instance, "_arquivos_antes", None)
+    instance._arquivos_antes = None
+    if guardado is None:
+        return
+    campos, antes, enviados = guardado
+    agora = {campo: getattr(instance, campo).name or "" for campo in campos}
+    soltar([
+        nome for campo, nome in zip(campos, antes)
+        if nome and (nome != agora[campo] or campo in enviados)
+    ])
+
+
+def soltar(nomes):
+    """
+    Tira uma referência de cada nome em ``nomes`` (ver
+    ConteudoEnderecadoStorage.soltar). Os que chegam a zero são apagados
+    depois do commit: se a transação for desfeita, as linhas voltam e
+    precisam deles.
+    """
+    dedup = conteudo_enderecado(Produto._meta.get_field("imagem").storage)
+    if dedup is None or not nomes:
+        return
+    zerados = dedup.soltar(nomes)
+    if zerados:
+        transaction.on_commit(lambda: apagar_soltos(zerados))
+
+
+def apagar_soltos(nomes):
+    """Apaga os arquivos de ``nomes`` ainda sem referência que nenhum ImageField usa."""
+    dedup = conteudo_enderecado(Produto._meta.get_field("imagem").storage)
+    for nome in set(nomes) - em_uso(nomes):
+        try:
+            dedup.apagar_se_solto(nome)
+        except Exception:
+            # o arquivo fica; o limpar_midia tenta de novo
+            pass
+
+
+def _apagar_lote(storage, lote, pool, log):
+    """Apaga os arquivos de ``lote`` que continuam sem referência. Devolve quantos."""
+    def apagar(nome):
+        try:
+            storage.delete(nome)
+            return nome
+        except Exception as e:
+            log(f"  falhou {nome}: {e}")
+            return None
+
+    with transaction.atomic():
+        list(ArquivoMidia.objects.select_for_update().filter(nome_storage__in=lote))
+        referenciados = em_uso(lote)
+        livres = [nome for nome in lote if nome not in referenciados]
+        # ainda dentro da transação: um save do mesmo conteúdo espera a trava
+        # e, sem a linha, envia o arquivo de novo
+        apagados = [nome for nome in pool.map(apagar, livres) if nome]
+        ArquivoMidia.objects.filter(nome_storage__in=apagados).delete()
+    return len(apagados)
+
+
+def coletar(dry_run=False, lote=500, workers=4, idade_minima=3600, chunk_size=5000, log=None):
+    """
+    Procura e (sem ``dry_run``) apaga os órfãos. Devolve
+    ``{"verificados", "orfaos", "apagados"}``.
+    """
+    log = log or (lambda msg: None)
+    storage = storage_de_verdade(Produto._meta.get_field("imagem").storage)
+    referenciados = nomes_referenciados(chunk_size)
+    limite = timezone.now() - timedelta(seconds=idade_minima)
+    resultado = {"verificados": 0, "orfaos": 0, "apagados": 0}
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        pendentes = []
+        for pasta in _pastas():
+            for nome in listar_arquivos(storage, pasta):
+                resultado["verificados"] += 1
+                if nome in referenciados or not _velho(storage, nome, limite):
+                    continue
+                resultado["orfaos"] += 1
+                if dry_run:
+                    log(f"  órfão: {nome}")
+                    continue
+                pendentes.append(nome)
+                if len(pendentes) >= lote:
+                    resultado["apagados"] += _apagar_lote(storage, pendentes, pool, log)
+                    log(f"  {resultado['apagados']} apagados")
+                    pendentes = []
+        if pendentes:
+            resultado["apagados"] += _apagar_lote(storage, pendentes, pool, log)
+    return resultado
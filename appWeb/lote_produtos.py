@@ -0,0 +1,82 @@
+"""
+Ações em lote do vendedor sobre os próprios produtos (tela listar_produtos).
+
+Marcar como disponível/indisponível, reajustar o preço em um percentual ou
+excluir vários produtos vira um único ``QuerySet.update``/``delete`` dentro de
+uma transação, em vez de um POST e um ``save()`` por produto.
+
+``update`` não dispara signals e o ``delete`` roda dentro de
+``signals.em_lote()``, então o que os signals fariam produto a produto é feito
+uma vez aqui: contadores do vendedor (``contadores.recontar``), índice de busca
+e referências dos arquivos de mídia (só na exclusão; status e preço não entram
+no texto indexado nem mexem nas imagens) e a versão do vendedor no cache do
+catálogo, trocada depois do commit.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Round
+from django.utils import timezone
+
+from . import busca, cache_catalogo, contadores, limpeza_midia, signals
+from .models import Produto
+
+ACOES = [
+    ("disponivel", "Marcar como disponível"),
+    ("indisponivel", "Marcar como indisponível"),
+    ("preco", "Reajustar preço (%)"),
+    ("excluir", "Excluir"),
+]
+
+# Produto.preco: max_digits=8, decimal_places=2
+PRECO_MAXIMO = Decimal("999999.99")
+
+
+class ErroAcaoEmLote(Exception):
+    pass
+
+
+def aplicar(vendedor, produto_ids, acao, percentual=None):
+    """
+    Aplica ``acao`` aos produtos ``produto_ids`` que são do ``vendedor`` (ids
+    de outros vendedores são ignorados). Devolve quantos produtos mudaram.
+    """
+    produtos = Produto.objects.filter(vendedor=vendedor, pk__in=list(produto_ids))
+
+    with transaction.atomic():
+        if acao == "excluir":
+            ids = list(produtos.values_list("pk", flat=True))
+            arquivos = limpeza_midia.arquivos_dos_produtos(ids)
+            with signals.em_lote():
+                produtos.delete()
+            busca.remover_produtos(ids)
+            limpeza_midia.soltar(arquivos)
+            afetados = len(ids)
+
+        elif acao in ("disponivel", "indisponivel"):
+            disponivel = acao == "disponivel"
+            afetados = produtos.exclude(status_disponivel=disponivel).update(
+                status_disponivel=disponivel,
+                atualizado_em=timezone.now(),
+            )
+
+        elif acao == "preco":
+            fator = 1 + Decimal(percentual) / 100
+            if fator <= 0:
+                raise ErroAcaoEmLote("O reajuste deixaria o preço zerado ou negativo.")
+            if produtos.filter(preco__gt=PRECO_MAXIMO / fator).exists():
+                raise ErroAcaoEmLote("O reajuste deixaria algum preço acima de R$ 999999,99.")
+            afetados = produtos.update(
+                preco=Round(F("preco") * fator, 2),
+                atualizado_em=timezone.now(),
+            )
+
+        else:
+            raise ValueError(f"ação desconhecida: {acao}")
+
+        if afetados:
+            contadores.recontar(vendedor.pk)
+            transaction.on_commit(lambda: cache_catalogo.invalidar_vendedor(vendedor.pk))
+
+    return afetados
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from appWeb.senhas import atualizar_senhas
+
+
+class Command(BaseCommand):
+    help = (
+        "Converte em lotes as senhas legadas em texto puro para o hasher atual, "
+        "para que nenhum login precise fazer isso, e conta os hashes com "
+        "parâmetros desatualizados."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=500, help="Vendedores por lote (padrão: 500)")
+        parser.add_argument("--workers", type=int, default=4, help="Threads calculando hashes (padrão: 4)")
+
+    def handle(self, *args, **options):
+        log = self.stdout.write if options["verbosity"] > 1 else None
+        resultado = atualizar_senhas(lote=options["lote"], workers=options["workers"], log=log)
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['verificadas']} senhas verificadas, {resultado['convertidas']} convertidas."
+        ))
+        if resultado["desatualizadas"]:
+            self.stdout.write(
+                f"{resultado['desatualizadas']} hashes com parâmetros desatualizados: só dá para "
+                "refazê-los com a senha, quando o vendedor trocar a senha."
+            )
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from appWeb.backup import fazer_backup
+
+
+class Command(BaseCommand):
+    help = (
+        "Exporta Vendedor/Produto/ImagemProduto para um JSONL compactado, lendo "
+        "o banco em blocos. Com --incremental, só o que mudou desde o último "
+        "backup. As imagens vão para um armazenamento por conteúdo (sem cópias repetidas)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--destino", default="backups", help="Diretório dos backups (padrão: backups)")
+        parser.add_argument("--incremental", action="store_true", help="Só as linhas criadas/alteradas desde o último backup")
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Linhas lidas do banco por vez (padrão: 2000)")
+        parser.add_argument("--sem-media", action="store_true", help="Não copia as imagens")
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        caminho, contagem, copiados = fazer_backup(
+            options["destino"],
+            incremental=options["incremental"],
+            chunk_size=options["chunk_size"],
+            com_media=not options["sem_media"],
+            log=self.stdout.write if options["verbosity"] > 1 else None,
+        )
+        linhas = ", ".join(f"{label}={quantidade}" for label, quantidade in contagem.items())
+        self.stdout.write(self.style.SUCCESS(
+            f"{caminho}: {linhas}; {copiados} imagens novas copiadas em {time.perf_counter() - inicio:.1f}s."
+        ))
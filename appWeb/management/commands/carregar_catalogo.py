@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from appWeb.carga import carregar_objetos, ler_objetos
+from appWeb.dados_sinteticos import gerar_catalogo
+
+
+class Command(BaseCommand):
+    help = (
+        "Carrega Vendedor/Produto/ImagemProduto de um fixture grande (JSON do "
+        "dumpdata ou JSONL, opcionalmente .gz) lendo de forma incremental e "
+        "inserindo com bulk_create em lotes. Com --gerar, cria um catálogo sintético."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("arquivos", nargs="*", help="Fixtures .json/.jsonl(.gz)")
+        parser.add_argument("--lote", type=int, default=5000, help="Linhas por bulk_create/transação (padrão: 5000)")
+        parser.add_argument("--gerar", action="store_true", help="Gera um catálogo sintético em vez de ler arquivos")
+        parser.add_argument("--vendedores", type=int, default=100, help="Com --gerar: quantidade de vendedores")
+        parser.add_argument("--produtos", type=int, default=10000, help="Com --gerar: quantidade de produtos")
+        parser.add_argument("--seed", type=int, default=None, help="Com --gerar: semente do gerador")
+
+    def handle(self, *args, **options):
+        if not options["gerar"] and not options["arquivos"]:
+            raise CommandError("Informe um ou mais arquivos ou use --gerar.")
+
+        inicio = time.perf_counter()
+        log = self.stdout.write if options["verbosity"] > 1 else None
+
+        if options["gerar"]:
+            gerar_catalogo(
+                vendedores=options["vendedores"],
+                produtos=options["produtos"],
+                lote=options["lote"],
+                seed=options["seed"],
+                log=log,
+            )
+            resumo = f"{options['vendedores']} vendedores e {options['produtos']} produtos gerados"
+        else:
+            partes = []
+            for caminho in options["arquivos"]:
+                contagem = carregar_objetos(ler_objetos(caminho), lote=options["lote"], log=log)
+                partes.append(f"{caminho}: " + ", ".join(f"{k}={v}" for k, v in contagem.items()))
+            resumo = "; ".join(partes)
+
+        self.stdout.write(self.style.SUCCESS(f"{resumo} em {time.perf_counter() - inicio:.1f}s."))
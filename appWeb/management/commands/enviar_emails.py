@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from appWeb.emails import MAX_TENTATIVAS, enviar_pendentes
+
+
+class Command(BaseCommand):
+    help = "Envia os e-mails da fila (EmailPendente) em lotes, com retentativa e backoff."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=50, help="E-mails por lote (padrão: 50)")
+        parser.add_argument(
+            "--max-tentativas",
+            type=int,
+            default=MAX_TENTATIVAS,
+            help=f"Tentativas antes de marcar como falhou (padrão: {MAX_TENTATIVAS})",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Fica rodando como worker em vez de sair quando a fila esvaziar",
+        )
+        parser.add_argument(
+            "--intervalo",
+            type=float,
+            default=5.0,
+            help="Segundos de espera quando a fila está vazia (com --loop)",
+        )
+
+    def handle(self, *args, **options):
+        total_enviados = total_falhas = 0
+        while True:
+            enviados, falhas = enviar_pendentes(options["lote"], options["max_tentativas"])
+            total_enviados += enviados
+            total_falhas += falhas
+            if enviados or falhas:
+                self.stdout.write(f"lote: {enviados} enviados, {falhas} falhas")
+                continue
+            if not options["loop"]:
+                break
+            time.sleep(options["intervalo"])
+
+        self.stdout.write(self.style.SUCCESS(f"{total_enviados} enviados, {total_falhas} falhas."))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from appWeb.imagens import CAMPOS_MINIATURA, regerar_miniatura
+from appWeb.models import ImagemProduto, Produto, Vendedor
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera as miniaturas das imagens que já estavam no storage antes do "
+        "pipeline de miniaturas (ou de todas, com --todas)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--todas",
+            action="store_true",
+            help="Regera também as que já têm miniatura",
+        )
+
+    def handle(self, *args, **options):
+        for model in (Vendedor, Produto, ImagemProduto):
+            campo, campo_miniatura = CAMPOS_MINIATURA[model.__name__]
+            qs = model.objects.exclude(**{campo: ""}).exclude(**{f"{campo}__isnull": True})
+            if not options["todas"]:
+                qs = qs.filter(**{f"{campo_miniatura}__isnull": True})
+
+            geradas = falhas = 0
+            for instance in qs.only("pk", campo, campo_miniatura).iterator():
+                try:
+                    ok = regerar_miniatura(instance)
+                except Exception as e:
+                    self.stderr.write(f"  {model.__name__} {instance.pk}: {e}")
+                    ok = False
+                if ok:
+                    geradas += 1
+                else:
+                    falhas += 1
+
+            self.stdout.write(f"{model.__name__}: {geradas} miniaturas geradas, {falhas} falhas")
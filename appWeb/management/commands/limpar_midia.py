@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from appWeb.limpeza_midia import coletar
+
+
+class Command(BaseCommand):
+    help = (
+        "Apaga do storage de mídia os arquivos que nenhum vendedor, produto ou "
+        "imagem de galeria usa mais (produtos excluídos, fotos trocadas)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Só lista os órfãos, sem apagar")
+        parser.add_argument("--lote", type=int, default=500, help="Arquivos apagados por lote (padrão: 500)")
+        parser.add_argument("--workers", type=int, default=4, help="Exclusões em paralelo (padrão: 4)")
+        parser.add_argument(
+            "--idade-minima",
+            type=int,
+            default=3600,
+            help="Ignora arquivos mais novos que isso, em segundos (padrão: 3600)",
+        )
+
+    def handle(self, *args, **options):
+        log = self.stdout.write if options["dry_run"] or options["verbosity"] > 1 else None
+        resultado = coletar(
+            dry_run=options["dry_run"],
+            lote=options["lote"],
+            workers=options["workers"],
+            idade_minima=options["idade_minima"],
+            log=log,
+        )
+        if options["dry_run"]:
+            self.stdout.write(self.style.SUCCESS(
+                f"{resultado['verificados']} arquivos verificados, {resultado['orfaos']} órfãos (nada apagado)."
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"{resultado['verificados']} arquivos verificados, {resultado['apagados']} órfãos apagados."
+            ))
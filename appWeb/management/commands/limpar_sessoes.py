@@ -0,0 +1,41 @@
+import time
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        "Apaga as sessões expiradas da tabela django_session em lotes (cada lote "
+        "é um DELETE curto, sem travar a tabela). Rodar periodicamente, ex.: "
+        "Heroku Scheduler."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=1000, help="Sessões apagadas por DELETE (padrão: 1000)")
+        parser.add_argument("--pausa", type=float, default=0.0, help="Segundos de espera entre lotes (padrão: 0)")
+
+    def handle(self, *args, **options):
+        if settings.SESSION_ENGINE.endswith("signed_cookies"):
+            self.stdout.write("SESSION_MODE=signed_cookies: não há sessões no banco.")
+            return
+
+        agora = timezone.now()
+        total = 0
+        while True:
+            chaves = list(
+                Session.objects.filter(expire_date__lt=agora)
+                .values_list("session_key", flat=True)[:options["lote"]]
+            )
+            if not chaves:
+                break
+            apagadas, _ = Session.objects.filter(session_key__in=chaves).delete()
+            total += apagadas
+            if options["verbosity"] > 1:
+                self.stdout.write(f"  {total} sessões apagadas")
+            if options["pausa"]:
+                time.sleep(options["pausa"])
+
+        self.stdout.write(self.style.SUCCESS(f"{total} sessões expiradas apagadas."))
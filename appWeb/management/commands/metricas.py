@@ -0,0 +1,37 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from appWeb import metricas
+
+
+class Command(BaseCommand):
+    help = (
+        "Mostra p50/p95/p99 de queries, tempo de banco, template, storage e "
+        "latência total por view (coletados pelo MetricasMiddleware)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--json", action="store_true", help="Saída em JSON")
+        parser.add_argument("--limpar", action="store_true", help="Apaga as amostras depois de mostrar")
+
+    def handle(self, *args, **options):
+        resumo = metricas.resumo()
+
+        if options["json"]:
+            self.stdout.write(json.dumps(resumo, indent=2))
+        elif not resumo:
+            self.stdout.write("Nenhuma amostra (com CACHE_BACKEND=locmem cada processo só vê as próprias).")
+        else:
+            cabecalho = f"{'view':32} {'n':>6}  " + "  ".join(f"{campo:>22}" for campo in metricas.CAMPOS)
+            self.stdout.write(cabecalho)
+            self.stdout.write(" " * 41 + "  ".join(f"{'p50/p95/p99':>22}" for _ in metricas.CAMPOS))
+            for nome, linha in resumo.items():
+                valores = "  ".join(
+                    f"{linha[campo]['p50']:>6g}/{linha[campo]['p95']:>6g}/{linha[campo]['p99']:>7g}"
+                    for campo in metricas.CAMPOS
+                )
+                self.stdout.write(f"{nome[:32]:32} {linha['n']:>6}  {valores}")
+
+        if options["limpar"]:
+            metricas.limpar()
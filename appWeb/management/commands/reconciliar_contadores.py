@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from appWeb.contadores import reconciliar
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula os contadores de produtos dos vendedores (total, disponíveis, "
+        "última alteração) a partir de Produto e corrige os que divergirem."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=1000, help="Vendedores por lote (padrão: 1000)")
+        parser.add_argument("--vendedor", type=int, action="append", help="Só este vendedor (pode repetir)")
+
+    def handle(self, *args, **options):
+        corrigidos = reconciliar(vendedor_ids=options["vendedor"], lote=options["lote"])
+        self.stdout.write(self.style.SUCCESS(f"{corrigidos} vendedores corrigidos."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from appWeb import busca
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstrói o índice de busca dos produtos (tsvector no Postgres, "
+        "FTS5 no SQLite). Use depois de cargas em massa que não disparam signals."
+    )
+
+    def handle(self, *args, **options):
+        total = busca.reindexar_tudo()
+        self.stdout.write(self.style.SUCCESS(f"{total} produtos indexados."))
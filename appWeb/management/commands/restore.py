@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from appWeb.backup import listar_backups, restaurar
+
+
+class Command(BaseCommand):
+    help = (
+        "Restaura backups gerados pelo comando backup. Sem arquivos, usa o último "
+        "backup completo do diretório e os incrementais feitos depois dele."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("arquivos", nargs="*", help="Backups .jsonl.gz, na ordem em que devem ser aplicados")
+        parser.add_argument("--origem", default="backups", help="Diretório dos backups e do armazenamento de imagens (padrão: backups)")
+        parser.add_argument("--lote", type=int, default=5000, help="Linhas por bulk_create/transação (padrão: 5000)")
+        parser.add_argument("--sem-media", action="store_true", help="Não restaura as imagens")
+
+    def handle(self, *args, **options):
+        arquivos = options["arquivos"] or listar_backups(options["origem"])
+        if not arquivos:
+            raise CommandError(f"Nenhum backup completo em {options['origem']}.")
+
+        inicio = time.perf_counter()
+        log = self.stdout.write if options["verbosity"] > 1 else None
+        for caminho in arquivos:
+            self.stdout.write(f"Aplicando {caminho}")
+        total = restaurar(
+            arquivos,
+            origem=options["origem"],
+            lote=options["lote"],
+            com_media=not options["sem_media"],
+            log=log,
+        )
+        resumo = ", ".join(f"{label}={quantidade}" for label, quantidade in total.items())
+        self.stdout.write(self.style.SUCCESS(f"{resumo} em {time.perf_counter() - inicio:.1f}s."))
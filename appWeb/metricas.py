@@ -0,0 +1,181 @@
+"""
+Métricas por view: nº de queries, tempo de banco, de template, de URLs do
+storage e latência total (coletadas pelo MetricasMiddleware).
+
+Cada processo guarda as últimas amostras de cada url_name em memória e, a cada
+METRICAS_FLUSH_A_CADA requisições, copia para o cache (uma chave por
+processo). Para os leitores acharem essas chaves, cada processo ocupa uma das
+METRICAS_MAX_PROCESSOS "vagas" com ``cache.add`` (atômico em todos os
+backends), sem uma lista compartilhada para ler, alterar e gravar. O endpoint
+/metricas/ e o comando ``manage.py metricas`` juntam as amostras de todos os
+processos e calculam p50/p95/p99. Com o cache locmem cada processo só
+enxerga o próprio; para juntar os workers do gunicorn use CACHE_BACKEND=file
+ou redis.
+"""
+import contextvars
+import math
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+from django.conf import settings
+from django.core.cache import cache
+
+CAMPOS = ("queries", "db_ms", "template_ms", "storage_ms", "total_ms")
+PERCENTIS = (50, 95, 99)
+
+_TIMEOUT = 60 * 60 * 24
+
+# métricas da requisição atual (None fora de uma requisição)
+atual = contextvars.ContextVar("appweb_metricas", default=None)
+
+
+class MetricasRequisicao:
+    __slots__ = ("queries", "db", "template", "storage", "inicio")
+
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.template = 0.0
+        self.storage = 0.0
+        self.inicio = time.perf_counter()
+
+    def como_amostra(self):
+        return (
+            self.queries,
+            round(self.db * 1000, 2),
+            round(self.template * 1000, 2),
+            round(self.storage * 1000, 2),
+            round((time.perf_counter() - self.inicio) * 1000, 2),
+        )
+
+
+def cronometrar(atributo):
+    """Decorator: soma o tempo da chamada em ``atributo`` das métricas atuais."""
+    def decorator(func):
+        def wrapper(*args, **kwargs):
+            metricas = atual.get()
+            if metricas is None:
+                return func(*args, **kwargs)
+            inicio = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                setattr(metricas, atributo, getattr(metricas, atributo) + time.perf_counter() - inicio)
+        wrapper.__wrapped__ = func
+        return wrapper
+    return decorator
+
+
+# ---------------------------------------------------------------
+# Armazenamento das amostras
+# ---------------------------------------------------------------
+_lock = threading.Lock()
+_amostras = defaultdict(lambda: deque(maxlen=_max_amostras()))
+_desde_flush = 0
+
+
+def _max_amostras():
+    return getattr(settings, "METRICAS_MAX_AMOSTRAS", 1000)
+
+
+def _max_processos():
+    return getattr(settings, "METRICAS_MAX_PROCESSOS", 64)
+
+
+def _chave_processo(pid=None):
+    return f"metricas:processo:{pid or os.getpid()}"
+
+
+def _chaves_vagas():
+    return [f"metricas:vaga:{i}" for i in range(_max_processos())]
+
+
+# vaga ocupada por este processo
+_vaga = None
+
+
+def registrar(url_name, amostra):
+    global _desde_flush
+    with _lock:
+        _amostras[url_name].append(amostra)
+        _desde_flush += 1
+        flush = _desde_flush >= getattr(settings, "METRICAS_FLUSH_A_CADA", 50)
+        if flush:
+            _desde_flush = 0
+            copia = {nome: list(valores) for nome, valores in _amostras.items()}
+    if flush:
+        _publicar(copia)
+
+
+def _publicar(copia):
+    global _vaga
+    pid = os.getpid()
+    cache.set(_chave_processo(pid), copia, _TIMEOUT)
+    # a vaga expira junto com as amostras, então a de um processo que morreu
+    # volta a ficar livre
+    if _vaga is not None and cache.get(_vaga) == pid:
+        cache.touch(_vaga, _TIMEOUT)
+        return
+    _vaga = None
+    for chave in _chaves_vagas():
+        if cache.add(chave, pid, _TIMEOUT) or cache.get(chave) == pid:
+            _vaga = chave
+            return
+
+
+def _pids():
+    return set(cache.get_many(_chaves_vagas()).values())
+
+
+def todas_amostras():
+    """Amostras de todos os processos que publicaram + as deste processo."""
+    juntas = defaultdict(list)
+    pids = _pids() - {os.getpid()}
+    publicadas = cache.get_many([_chave_processo(pid) for pid in pids])
+    for dados in publicadas.values():
+        for nome, valores in dados.items():
+            juntas[nome].extend(valores)
+    with _lock:
+        for nome, valores in _amostras.items():
+            juntas[nome].extend(valores)
+    return juntas
+
+
+def limpar():
+    global _desde_flush, _vaga
+    pids = _pids()
+    cache.delete_many(_chaves_vagas() + [_chave_processo(pid) for pid in pids])
+    _vaga = None
+    with _lock:
+        _amostras.clear()
+        _desde_flush = 0
+
+
+# ---------------------------------------------------------------
+# Resumo
+# ---------------------------------------------------------------
+def percentil(ordenados, p):
+    # nearest-rank
+    return ordenados[max(0, math.ceil(p / 100 * len(ordenados)) - 1)]
+
+
+def resumo():
+    """
+    {url_name: {"n": ..., "queries": {"p50": .., "p95": .., "p99": .., "max": ..}, ...}}
+    ordenado pela soma da latência (as views que mais custam primeiro).
+    """
+    resultado, custo = {}, {}
+    for nome, amostras in todas_amostras().items():
+        if not amostras:
+            continue
+        linha = {"n": len(amostras)}
+        for i, campo in enumerate(CAMPOS):
+            valores = sorted(a[i] for a in amostras)
+            linha[campo] = {f"p{p}": percentil(valores, p) for p in PERCENTIS}
+            linha[campo]["max"] = valores[-1]
+        resultado[nome] = linha
+        custo[nome] = sum(a[CAMPOS.index("total_ms")] for a in amostras)
+
+    return {nome: resultado[nome] for nome in sorted(resultado, key=custo.get, reverse=True)}
@@ -0,0 +1,168 @@
+"""
+Middlewares do appWeb.
+"""
+import time
+
+import whitenoise.middleware
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.models.fields.files import FieldFile
+from django.template.backends.django import Template as DjangoTemplate
+from django.utils.functional import SimpleLazyObject
+
+from . import metricas, sessao
+
+_ganchos_instalados = False
+
+
+def _contar_query(execute, sql, params, many, context):
+    # as conexões são por thread e o ORM async roda as queries numa thread à
+    # parte; o contextvar, não: ele acompanha a requisição até lá
+    atual = metricas.atual.get()
+    if atual is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        atual.queries += 1
+        atual.db += time.perf_counter() - inicio
+
+
+def _instalar_contador(connection, **kwargs):
+    if _contar_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_contar_query)
+
+
+def _instalar_ganchos():
+    """
+    Conta as queries de todas as conexões e cronometra a renderização de
+    templates e o ``.url`` dos arquivos (que no Cloudinary passa pelo SDK).
+    Os dois últimos trocam métodos de classes do Django no processo inteiro,
+    por isso só são instalados com METRICAS_ATIVAS; e fora de uma requisição
+    medida os wrappers não fazem nada além de chamar o original.
+    """
+    global _ganchos_instalados
+    if _ganchos_instalados:
+        return
+    connection_created.connect(_instalar_contador)
+    for conexao in connections.all(initialized_only=True):
+        _instalar_contador(conexao)
+    DjangoTemplate.render = metricas.cronometrar("template")(DjangoTemplate.render)
+    FieldFile.url = property(metricas.cronometrar("storage")(FieldFile.url.fget))
+    _ganchos_instalados = True
+
+
+class MetricasMiddleware:
+    """
+    Mede, por requisição: nº de queries e tempo de banco, tempo de template,
+    tempo gasto montando URLs do storage e latência total. Devolve tudo no
+    header Server-Timing e guarda a amostra por url_name (ver appWeb/metricas.py).
+    Com METRICAS_ATIVAS=False ele sai da pilha e não instala nada.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "METRICAS_ATIVAS", True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        _instalar_ganchos()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        atual = metricas.MetricasRequisicao()
+        token = metricas.atual.set(atual)
+        try:
+            response = self.get_response(request)
+        finally:
+            metricas.atual.reset(token)
+        return self._registrar(request, response, atual)
+
+    async def __acall__(self, request):
+        atual = metricas.MetricasRequisicao()
+        token = metricas.atual.set(atual)
+        try:
+            response = await self.get_response(request)
+        finally:
+            metricas.atual.reset(token)
+        # registrar pode gravar no cache compartilhado (rede, no Redis)
+        return await sync_to_async(self._registrar, thread_sensitive=False)(request, response, atual)
+
+    @staticmethod
+    def _registrar(request, response, atual):
+        amostra = atual.como_amostra()
+        queries, db_ms, template_ms, storage_ms, total_ms = amostra
+        response["Server-Timing"] = ", ".join([
+            f'db;dur={db_ms};desc="{queries} queries"',
+            f"tpl;dur={template_ms}",
+            f"storage;dur={storage_ms}",
+            f"total;dur={total_ms}",
+        ])
+
+        match = getattr(request, "resolver_match", None)
+        url_name = match.url_name if match and match.url_name else f"<{response.status_code}>"
+        metricas.registrar(url_name, amostra)
+        return response
+
+
+class VendedorMiddleware:
+    """
+    ``request.vendedor``: o Vendedor logado, resolvido só quando a view usa e
+    no máximo uma vez por requisição (ver appWeb/sessao.py). Sem login ele é
+    falso (``if not request.vendedor``), mas não é ``None``: é um proxy, como
+    o ``request.user``. Precisa vir depois do SessionMiddleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        request.vendedor = SimpleLazyObject(lambda: sessao.obter_vendedor(request))
+        # no modo async devolve a corotina da próxima camada
+        return self.get_response(request)
+
+
+class WhiteNoiseMiddleware(whitenoise.middleware.WhiteNoiseMiddleware):
+    """
+    O WhiteNoise só é síncrono; sob ASGI (uvicorn) um único middleware
+    síncrono na pilha faz o Django rodar todas as views numa thread, e as views
+    async deixam de ser async. Sem WHITENOISE_AUTOREFRESH, achar o arquivo é
+    só um lookup num dict, então a versão async responde os estáticos direto
+    e repassa o resto sem sair do event loop.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,165 @@
+"""
+Arquivos de mídia (MEDIA_URL) servidos pelo próprio Django, para quando o
+storage é o FileSystemStorage (sem Cloudinary).
+
+O ``static()`` do Django só funciona em DEBUG e manda o arquivo inteiro a cada
+visita. Aqui:
+
+- ``ETag`` (tamanho + mtime) e ``Last-Modified``; ``If-None-Match`` e
+  ``If-Modified-Since`` respondem 304 sem abrir o arquivo;
+- ``Cache-Control`` longo e ``immutable`` para nomes com o hash do conteúdo
+  (mudou o conteúdo, mudou o nome), e MIDIA_CACHE_MAX_AGE com revalidação para
+  os demais;
+- ``Range`` de um intervalo (206, ou 416 fora do arquivo), com ``If-Range``;
+- o arquivo vai num ``FileResponse``, lido em blocos (``block_size``) sem
+  carregar tudo na memória; um trecho (Range) só até o fim do intervalo. No
+  Procfile o app roda sob ASGI (uvicorn), onde não há sendfile: cada bloco
+  passa pelo Python (o Django lê o arquivo numa thread e manda pelo event
+  loop). Para mídia grande ou muito acessada, o caminho é o Cloudinary/CDN
+  ou um proxy na frente servindo MEDIA_ROOT direto.
+"""
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+# nomes gerados a partir do conteúdo (appWeb/storage.py): hash hexadecimal
+NOME_COM_HASH = re.compile(r"(^|[/_.-])[0-9a-f]{32,}(\.[^/]*)?$")
+
+UM_ANO = 365 * 24 * 60 * 60
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _max_age():
+    return getattr(settings, "MIDIA_CACHE_MAX_AGE", 3600)
+
+
+def _etag(stat):
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def _cache_control(caminho):
+    if NOME_COM_HASH.search(caminho):
+        return f"public, max-age={UM_ANO}, immutable"
+    return f"public, max-age={_max_age()}, must-revalidate"
+
+
+def _nao_modificado(request, etag, mtime):
+    if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+    if if_none_match is not None:
+        # comparação fraca (RFC 9110): W/"x" casa com "x"
+        etags = [e.removeprefix("W/") for e in parse_etags(if_none_match)]
+        return "*" in etags or etag in etags
+    desde = parse_http_date_safe(request.META.get("HTTP_IF_MODIFIED_SINCE", ""))
+    return desde is not None and int(mtime) <= desde
+
+
+def _intervalo(request, etag, mtime, tamanho):
+    """
+    (inicio, fim) inclusivos do Range pedido, None para mandar o arquivo
+    inteiro, ou "invalido" (416).
+    """
+    cabecalho = request.META.get("HTTP_RANGE", "")
+    if not cabecalho:
+        return None
+    if_range = request.META.get("HTTP_IF_RANGE")
+    if if_range and if_range != etag and parse_http_date_safe(if_range) != int(mtime):
+        return None
+    # vários intervalos (multipart/byteranges) não valem a pena: arquivo inteiro
+    m = _RANGE.match(cabecalho.strip())
+    if not m or m.groups() == ("", ""):
+        return None
+    inicio, fim = m.groups()
+    if inicio == "":
+        # bytes=-N: os últimos N bytes
+        sufixo = int(fim)
+        if sufixo == 0:
+            return "invalido"
+        return max(tamanho - sufixo, 0), tamanho - 1
+    inicio = int(inicio)
+    fim = tamanho - 1 if fim == "" else min(int(fim), tamanho - 1)
+    if inicio >= tamanho or inicio > fim:
+        return "invalido"
+    return inicio, fim
+
+
+class _Trecho:
+    """Lê de ``arquivo`` só ``restante`` bytes, a partir da posição atual."""
+
+    def __init__(self, arquivo, restante):
+        self.arquivo = arquivo
+        self.restante = restante
+
+    def read(self, n=-1):
+        if self.restante <= 0:
+            return b""
+        if n < 0 or n > self.restante:
+            n = self.restante
+        dados = self.arquivo.read(n)
+        self.restante -= len(dados)
+        return dados
+
+    def close(self):
+        self.arquivo.close()
+
+
+@require_safe
+def servir_midia(request, caminho):
+    try:
+        completo = safe_join(settings.MEDIA_ROOT, caminho)
+    except SuspiciousFileOperation:
+        raise Http404
+    try:
+        stat = os.stat(completo)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404
+    if not os.path.isfile(completo):
+        raise Http404
+
+    etag = _etag(stat)
+    cabecalhos = {
+        "ETag": etag,
+        "Last-Modified": http_date(stat.st_mtime),
+        "Cache-Control": _cache_control(caminho),
+        "Accept-Ranges": "bytes",
+    }
+
+    if _nao_modificado(request, etag, stat.st_mtime):
+        resposta = HttpResponseNotModified()
+        for nome, valor in cabecalhos.items():
+            resposta[nome] = valor
+        return resposta
+
+    tamanho = stat.st_size
+    intervalo = _intervalo(request, etag, stat.st_mtime, tamanho)
+    if intervalo == "invalido":
+        resposta = HttpResponse(status=416)
+        resposta["Content-Range"] = f"bytes */{tamanho}"
+        return resposta
+
+    tipo, codificacao = mimetypes.guess_type(completo)
+    arquivo = open(completo, "rb")
+    if intervalo is None:
+        resposta = FileResponse(arquivo, content_type=tipo or "application/octet-stream")
+    else:
+        inicio, fim = intervalo
+        arquivo.seek(inicio)
+        resposta = FileResponse(
+            _Trecho(arquivo, fim - inicio + 1),
+            status=206,
+            content_type=tipo or "application/octet-stream",
+        )
+        resposta["Content-Range"] = f"bytes {inicio}-{fim}/{tamanho}"
+        resposta["Content-Length"] = str(fim - inicio + 1)
+    if codificacao:
+        resposta["Content-Encoding"] = codificacao
+    for nome, valor in cabecalhos.items():
+        resposta[nome] = valor
+    return resposta
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:52
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+FTS_TABLE = "appWeb_produto_fts"
+
+
+def criar_indice_busca(apps, schema_editor):
+    """
+    Postgres: índice GIN + preenche o tsvector dos produtos existentes.
+    SQLite: cria a tabela FTS5 e copia os produtos existentes para ela.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS "produto_busca_vetor_gin" '
+            'ON "appWeb_produto" USING gin ("busca_vetor")'
+        )
+        schema_editor.execute(
+            'UPDATE "appWeb_produto" p SET "busca_vetor" = '
+            "setweight(to_tsvector('portuguese', coalesce(p.nome, '')), 'A') || "
+            "setweight(to_tsvector('portuguese', coalesce(v.nome_venda, '')), 'A') || "
+            "setweight(to_tsvector('portuguese', coalesce(p.descricao, '')), 'B') "
+            'FROM "appWeb_vendedor" v WHERE v.id = p.vendedor_id'
+        )
+    elif vendor == "sqlite":
+        try:
+            schema_editor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS "{FTS_TABLE}" '
+                "USING fts5(nome, descricao, nome_venda, "
+                "tokenize='unicode61 remove_diacritics 2')"
+            )
+        except Exception:
+            # SQLite compilado sem FTS5: a busca cai no icontains.
+            return
+        schema_editor.execute(
+            f'INSERT INTO "{FTS_TABLE}" (rowid, nome, descricao, nome_venda) '
+            "SELECT p.id, p.nome, p.descricao, v.nome_venda "
+            'FROM "appWeb_produto" p JOIN "appWeb_vendedor" v ON v.id = p.vendedor_id'
+        )
+
+
+def remover_indice_busca(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute('DROP INDEX IF EXISTS "produto_busca_vetor_gin"')
+    elif vendor == "sqlite":
+        schema_editor.execute(f'DROP TABLE IF EXISTS "{FTS_TABLE}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appWeb', '0004_vendedor_is_active'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='produto',
+            name='busca_vetor',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, editable=False, null=True),
+        ),
+        # O GinIndex só existe no Postgres; no banco ele é criado pelo RunPython.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='produto',
+                    index=django.contrib.postgres.indexes.GinIndex(fields=['busca_vetor'], name='produto_busca_vetor_gin'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(criar_indice_busca, remover_indice_busca),
+            ],
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appWeb', '0005_produto_busca_vetor'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='produto',
+            index=models.Index(condition=models.Q(('status_disponivel', True)), fields=['nome', 'id'], name='produto_disp_nome_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='produto',
+            index=models.Index(condition=models.Q(('status_disponivel', True)), fields=['vendedor', 'nome'], name='produto_vend_disp_nome_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appWeb', '0006_indices_catalogo_comprador'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imagemproduto',
+            name='imagem_miniatura',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='produtos/catalogo/'),
+        ),
+        migrations.AddField(
+            model_name='produto',
+            name='imagem_miniatura',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='produtos/'),
+        ),
+        migrations.AddField(
+            model_name='vendedor',
+            name='foto_perfil_miniatura',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='vendedores/perfis/'),
+        ),
+    ]
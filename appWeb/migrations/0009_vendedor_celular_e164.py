@@ -0,0 +1,68 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+LOTE = 1000
+DDI_BRASIL = "55"
+
+
+def normalizar_celular(celular):
+    """
+    Cópia de appWeb.telefones.normalizar_celular no dia desta migration: o
+    módulo importa os models atuais e pode mudar depois, e a migration tem que
+    continuar rodando igual.
+    """
+    texto = (celular or "").strip()
+    digitos = "".join(filter(str.isdigit, texto))
+    if not digitos:
+        return ""
+
+    if texto.startswith("+"):
+        pass
+    elif digitos.startswith("00"):
+        digitos = digitos[2:]
+    else:
+        if digitos.startswith("0"):
+            digitos = digitos[1:]
+            if len(digitos) in (12, 13):  # código de operadora
+                digitos = digitos[2:]
+        if len(digitos) in (10, 11):
+            digitos = DDI_BRASIL + digitos
+        elif not digitos.startswith(DDI_BRASIL):
+            return ""
+
+    if digitos.startswith(DDI_BRASIL) and len(digitos) not in (12, 13):
+        return ""
+    if not 8 <= len(digitos) <= 15:
+        return ""
+    return f"+{digitos}"
+
+
+def preencher_celular_e164(apps, schema_editor):
+    """Normaliza o celular dos vendedores existentes, em lotes."""
+    Vendedor = apps.get_model("appWeb", "Vendedor")
+    ultimo = 0
+    while True:
+        vendedores = list(Vendedor.objects.filter(id__gt=ultimo).order_by("id").only("id", "celular")[:LOTE])
+        if not vendedores:
+            break
+        ultimo = vendedores[-1].id
+        for vendedor in vendedores:
+            vendedor.celular_e164 = normalizar_celular(vendedor.celular)
+        Vendedor.objects.bulk_update(vendedores, ["celular_e164"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appWeb', '0008_emailpendente'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vendedor',
+            name='celular_e164',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=16),
+        ),
+        migrations.RunPython(preencher_celular_e164, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:13
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Q
+
+LOTE = 1000
+
+
+def preencher_contadores(apps, schema_editor):
+    """Conta os produtos de cada vendedor existente, em lotes."""
+    Vendedor = apps.get_model("appWeb", "Vendedor")
+    ultimo = 0
+    while True:
+        bloco = list(
+            Vendedor.objects.filter(pk__gt=ultimo).order_by("pk")
+            .annotate(
+                contagem_total=Count("produtos"),
+                contagem_disponiveis=Count("produtos", filter=Q(produtos__status_disponivel=True)),
+                ultima_alteracao=Max("produtos__atualizado_em"),
+            )
+            .only("pk")[:LOTE]
+        )
+        if not bloco:
+            break
+        ultimo = bloco[-1].pk
+        for vendedor in bloco:
+            vendedor.total_produtos = vendedor.contagem_total
+            vendedor.produtos_disponiveis = vendedor.contagem_disponiveis
+            vendedor.produtos_atualizados_em = vendedor.ultima_alteracao
+        Vendedor.objects.bulk_update(bloco, ["total_produtos", "produtos_disponiveis", "produtos_atualizados_em"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appWeb', '0009_vendedor_celular_e164'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vendedor',
+            name='produtos_atualizados_em',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='vendedor',
+            name='produtos_disponiveis',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='vendedor',
+            name='total_produtos',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(preencher_contadores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:20
+
+import appWeb.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appWeb', '0010_vendedor_contadores'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='imagemproduto',
+            name='imagem',
+            field=models.ImageField(storage=appWeb.storage.storage_midia, upload_to='produtos/catalogo/'),
+        ),
+        migrations.AlterField(
+            model_name='imagemproduto',
+            name='imagem_miniatura',
+            field=models.ImageField(blank=True, editable=False, null=True, storage=appWeb.storage.storage_midia, upload_to='produtos/catalogo/'),
+        ),
+        migrations.AlterField(
+            model_name='produto',
+            name='imagem',
+            field=models.ImageField(blank=True, help_text='Imagem principal (aparece nas listas)', null=True, storage=appWeb.storage.storage_midia, upload_to='produtos/'),
+        ),
+        migrations.AlterField(
+            model_name='produto',
+            name='imagem_miniatura',
+            field=models.ImageField(blank=True, editable=False, null=True, storage=appWeb.storage.storage_midia, upload_to='produtos/'),
+        ),
+        migrations.AlterField(
+            model_name='vendedor',
+            name='foto_perfil',
+            field=models.ImageField(blank=True, null=True, storage=appWeb.storage.storage_midia, upload_to='vendedores/perfis/'),
+        ),
+        migrations.AlterField(
+            model_name='vendedor',
+            name='foto_perfil_miniatura',
+            field=models.ImageField(blank=True, editable=False, null=True, storage=appWeb.storage.storage_midia, upload_to='vendedores/perfis/'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appWeb', '0011_imagens_storage_midia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArquivoMidia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=100, unique=True)),
+                ('nome_storage', models.CharField(db_index=True, max_length=255)),
+                ('referencias', models.PositiveIntegerField(default=0)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
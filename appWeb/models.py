@@ -1,4 +1,9 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.utils import timezone
+
+from .storage import storage_midia
 
 
 class Vendedor(models.Model):
@@ -11,6 +16,9 @@ class Vendedor(models.Model):
     nome_completo = models.CharField(max_length=150)
     nome_venda = models.CharField(max_length=100)
     celular = models.CharField(max_length=20)
+    # celular em E.164, mantido no pre_save (ver appWeb/telefones.py);
+    # indexado para buscar vendedor pelo telefone e achar duplicados
+    celular_e164 = models.CharField(max_length=16, blank=True, default="", editable=False, db_index=True)
     local_principal_venda = models.CharField(
         max_length=100,
         help_text="Ex.: Saída do bandejão, prainha, etc."
@@ -22,14 +30,45 @@ class Vendedor(models.Model):
     
     foto_perfil = models.ImageField(
         upload_to="vendedores/perfis/",
+        storage=storage_midia,
         null=True,
         blank=True
     )
+    # gerada automaticamente a partir da foto_perfil (ver appWeb/imagens.py)
+    foto_perfil_miniatura = models.ImageField(
+        upload_to="vendedores/perfis/",
+        storage=storage_midia,
+        null=True,
+        blank=True,
+        editable=False,
+    )
     criado_em = models.DateTimeField(auto_now_add=True)
     atualizado_em = models.DateTimeField(auto_now=True)
 
+    # contadores desnormalizados, mantidos com F() pelos signals de Produto
+    # (ver appWeb/contadores.py)
+    total_produtos = models.PositiveIntegerField(default=0, editable=False)
+    produtos_disponiveis = models.PositiveIntegerField(default=0, editable=False)
+    produtos_atualizados_em = models.DateTimeField(null=True, blank=True, editable=False)
+
+    CAMPOS_CONTADORES = ["total_produtos", "produtos_disponiveis", "produtos_atualizados_em"]
+
     def __str__(self):
         return self.nome_venda or self.nome_completo
+
+    def save(self, *args, **kwargs):
+        # os contadores só mudam por F(); um save() comum com a instância
+        # carregada antes sobrescreveria a contagem atual com a antiga
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                campo.name for campo in self._meta.concrete_fields
+                if not campo.primary_key and campo.name not in self.CAMPOS_CONTADORES
+            ]
+        super().save(*args, **kwargs)
+
+    @property
+    def whatsapp_link(self):
+        return f"https://wa.me/{self.celular_e164[1:]}" if self.celular_e164 else ""
     
 
 
@@ -42,10 +81,19 @@ class Produto(models.Model):
     nome = models.CharField(max_length=100)
     imagem = models.ImageField(
         upload_to="produtos/",
+        storage=storage_midia,
         null=True,
         blank=True,
         help_text="Imagem principal (aparece nas listas)"
     )
+    # gerada automaticamente a partir da imagem (ver appWeb/imagens.py)
+    imagem_miniatura = models.ImageField(
+        upload_to="produtos/",
+        storage=storage_midia,
+        null=True,
+        blank=True,
+        editable=False,
+    )
 
     preco = models.DecimalField(max_digits=8, decimal_places=2)
     descricao = models.TextField(blank=True)
@@ -56,11 +104,30 @@ class Produto(models.Model):
     criado_em = models.DateTimeField(auto_now_add=True)
     atualizado_em = models.DateTimeField(auto_now=True)
 
+    # Só é usado no Postgres (ver appWeb/busca.py); no SQLite a busca
+    # usa a tabela FTS5 appWeb_produto_fts.
+    busca_vetor = SearchVectorField(null=True, blank=True, editable=False)
+
     def __str__(self):
         return f"{self.nome} ({self.vendedor.nome_venda})"
 
     class Meta:
         ordering = ["nome"]
+        indexes = [
+            GinIndex(fields=["busca_vetor"], name="produto_busca_vetor_gin"),
+            # catálogo do comprador: disponíveis ordenados por (nome, id)
+            models.Index(
+                fields=["nome", "id"],
+                condition=models.Q(status_disponivel=True),
+                name="produto_disp_nome_id_idx",
+            ),
+            # perfil do vendedor na visão do comprador: disponíveis dele por nome
+            models.Index(
+                fields=["vendedor", "nome"],
+                condition=models.Q(status_disponivel=True),
+                name="produto_vend_disp_nome_idx",
+            ),
+        ]
 
 
 class ImagemProduto(models.Model):
@@ -69,7 +136,14 @@ class ImagemProduto(models.Model):
         on_delete=models.CASCADE,
         related_name="imagens_catalogo"
     )
-    imagem = models.ImageField(upload_to="produtos/catalogo/")
+    imagem = models.ImageField(upload_to="produtos/catalogo/", storage=storage_midia)
+    imagem_miniatura = models.ImageField(
+        upload_to="produtos/catalogo/",
+        storage=storage_midia,
+        null=True,
+        blank=True,
+        editable=False,
+    )
 
     criado_em = models.DateTimeField(auto_now_add=True)
 
@@ -77,25 +151,59 @@ class ImagemProduto(models.Model):
         return f"Imagem de {self.produto.nome} ({self.id})"
 
 
-# If Cloudinary storage is available at runtime, attach it to the ImageField
-# instances so uploads always use Cloudinary even if the default_storage
-# instance was created earlier as a filesystem storage.
-try:
-    from cloudinary_storage.storage import MediaCloudinaryStorage
-    _cloud_storage = MediaCloudinaryStorage()
-except Exception:
-    _cloud_storage = None
-
-if _cloud_storage:
-    try:
-        Vendedor._meta.get_field('foto_perfil').storage = _cloud_storage
-    except Exception:
-        pass
-    try:
-        Produto._meta.get_field('imagem').storage = _cloud_storage
-    except Exception:
-        pass
-    try:
-        ImagemProduto._meta.get_field('imagem').storage = _cloud_storage
-    except Exception:
-        pass
\ No newline at end of file
+class EmailPendente(models.Model):
+    """
+    Outbox de e-mails. As views só enfileiram; o comando ``enviar_emails``
+    (processo worker do Procfile) envia em lotes, com retentativa.
+    """
+    PENDENTE = "pendente"
+    ENVIADO = "enviado"
+    FALHOU = "falhou"
+    STATUS_CHOICES = [
+        (PENDENTE, "Pendente"),
+        (ENVIADO, "Enviado"),
+        (FALHOU, "Falhou"),
+    ]
+
+    assunto = models.CharField(max_length=255)
+    mensagem = models.TextField()
+    remetente = models.CharField(max_length=255)
+    destinatarios = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDENTE)
+    tentativas = models.PositiveIntegerField(default=0)
+    proxima_tentativa_em = models.DateTimeField(default=timezone.now)
+    ultimo_erro = models.TextField(blank=True)
+    criado_em = models.DateTimeField(auto_now_add=True)
+    enviado_em = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.assunto} -> {', '.join(self.destinatarios)} ({self.status})"
+
+    class Meta:
+        indexes = [
+            # o worker só olha os pendentes que já podem ser enviados
+            models.Index(
+                fields=["proxima_tentativa_em", "id"],
+                condition=models.Q(status="pendente"),
+                name="email_pendente_fila_idx",
+            ),
+        ]
+
+
+class ArquivoMidia(models.Model):
+    """
+    Arquivos com nome pelo conteúdo (ConteudoEnderecadoStorage, em
+    appWeb/storage.py) e quantas referências cada um tem. Cada upload de um
+    conteúdo igual soma uma; ``storage.delete``, excluir o model ou trocar a
+    imagem do campo tiram uma (appWeb/signals.py). O arquivo só sai do
+    storage com a última (ver ConteudoEnderecadoStorage).
+    """
+    # midia/<sha[:2]>/<sha256><extensão>
+    nome = models.CharField(max_length=100, unique=True)
+    # o nome que o storage devolveu (e que fica nos ImageFields)
+    nome_storage = models.CharField(max_length=255, db_index=True)
+    referencias = models.PositiveIntegerField(default=0)
+    criado_em = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.nome} ({self.referencias})"
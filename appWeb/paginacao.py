@@ -0,0 +1,90 @@
+"""
+Paginação por cursor (keyset) para as listagens do comprador.
+
+Em vez de OFFSET, a próxima página começa logo depois da última linha
+entregue, comparando a tupla (nome, id). Assim o custo de cada página não
+depende de quantos produtos existem antes dela.
+
+Resultados de busca são ordenados por relevância, que não é uma chave
+estável; para eles o cursor guarda só a posição no ranking
+(``paginar_busca``).
+"""
+from django.core import signing
+from django.db.models import Q
+
+from .models import Produto
+
+CURSOR_SALT = "appWeb-catalogo-cursor"
+
+# Produto.Meta.ordering (["nome"]) + id como desempate, para a ordem ser total.
+ORDENACAO_CATALOGO = [*Produto._meta.ordering, "id"]
+
+
+def gerar_cursor(produto):
+    return signing.dumps({"nome": produto.nome, "id": produto.id}, salt=CURSOR_SALT, compress=True)
+
+
+def ler_cursor(cursor):
+    """Devolve (nome, id) do cursor, ou None se estiver vazio/inválido."""
+    if not cursor:
+        return None
+    try:
+        data = signing.loads(cursor, salt=CURSOR_SALT)
+        return data["nome"], int(data["id"])
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        return None
+
+
+def _aplicar_cursor(queryset, cursor):
+    queryset = queryset.order_by(*ORDENACAO_CATALOGO)
+    posicao = ler_cursor(cursor)
+    if posicao:
+        nome, ultimo_id = posicao
+        queryset = queryset.filter(Q(nome__gt=nome) | Q(nome=nome, id__gt=ultimo_id))
+    return queryset
+
+
+def _cortar(itens, tamanho):
+    proximo_cursor = None
+    if len(itens) > tamanho:
+        itens = itens[:tamanho]
+        proximo_cursor = gerar_cursor(itens[-1])
+    return itens, proximo_cursor
+
+
+def paginar_por_cursor(queryset, cursor=None, tamanho=20):
+    """
+    Aplica o keyset sobre ``queryset`` e devolve (itens, proximo_cursor).
+
+    Busca ``tamanho + 1`` linhas só para saber se existe próxima página,
+    sem precisar de COUNT.
+    """
+    queryset = _aplicar_cursor(queryset, cursor)
+    return _cortar(list(queryset[:tamanho + 1]), tamanho)
+
+
+async def apaginar_por_cursor(queryset, cursor=None, tamanho=20):
+    """``paginar_por_cursor`` para views async (ORM async)."""
+    queryset = _aplicar_cursor(queryset, cursor)
+    return _cortar([item async for item in queryset[:tamanho + 1]], tamanho)
+
+
+def paginar_busca(buscar, cursor=None, tamanho=20):
+    """
+    Pagina uma busca ranqueada. ``buscar(inicio, limite)`` deve devolver a
+    lista de itens já na ordem de relevância.
+    """
+    inicio = 0
+    if cursor:
+        try:
+            inicio = int(signing.loads(cursor, salt=CURSOR_SALT)["pos"])
+        except (signing.BadSignature, KeyError, TypeError, ValueError):
+            inicio = 0
+
+    itens = list(buscar(inicio, tamanho + 1))
+    proximo_cursor = None
+    if len(itens) > tamanho:
+        itens = itens[:tamanho]
+        proximo_cursor = signing.dumps({"pos": inicio + tamanho}, salt=CURSOR_SALT)
+
+    return itens, proximo_cursor
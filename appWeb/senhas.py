@@ -0,0 +1,86 @@
+"""
+Manutenção em lote das senhas dos vendedores, fora do caminho do login.
+
+- Senhas legadas gravadas em texto puro (o login ainda aceita e converte na
+  hora) são passadas pelo ``make_password`` aqui, em lotes, com o hash rodando
+  em várias threads (o PBKDF2 do hashlib solta o GIL). Assim nenhum login paga
+  esse custo.
+- Hashes com parâmetros desatualizados (outro hasher que não o preferido, ou
+  PBKDF2 com menos iterações que o do Django atual) não dá para refazer sem a
+  senha em texto: eles são só contados, para acompanhar a migração.
+
+Uso: ``python manage.py atualizar_senhas``.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import get_hasher, identify_hasher, is_password_usable, make_password
+from django.db import transaction
+from django.utils import timezone
+
+from . import cache_catalogo
+from .models import Vendedor
+
+
+def _texto_puro(senha):
+    if not senha or not is_password_usable(senha):
+        return False
+    try:
+        identify_hasher(senha)
+    except ValueError:
+        return True
+    return False
+
+
+def _desatualizada(senha, preferido):
+    try:
+        hasher = identify_hasher(senha)
+    except ValueError:
+        return False
+    return hasher.algorithm != preferido.algorithm or hasher.must_update(senha)
+
+
+def atualizar_senhas(lote=500, workers=4, log=None):
+    """
+    Converte as senhas em texto puro, ``lote`` vendedores por vez. Devolve
+    ``{"verificadas", "convertidas", "desatualizadas"}``.
+    """
+    preferido = get_hasher("default")
+    resultado = {"verificadas": 0, "convertidas": 0, "desatualizadas": 0}
+    ultimo = 0
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        while True:
+            bloco = list(
+                Vendedor.objects.filter(id__gt=ultimo)
+                .exclude(senha="")
+                .order_by("id")
+                .only("id", "senha")[:lote]
+            )
+            if not bloco:
+                return resultado
+            ultimo = bloco[-1].id
+            resultado["verificadas"] += len(bloco)
+
+            legadas = [v for v in bloco if _texto_puro(v.senha)]
+            resultado["desatualizadas"] += sum(
+                1 for v in bloco if not _texto_puro(v.senha) and _desatualizada(v.senha, preferido)
+            )
+
+            hashes = list(pool.map(make_password, [v.senha for v in legadas]))
+            convertidos = []
+            with transaction.atomic():
+                for vendedor, novo in zip(legadas, hashes):
+                    # só se a senha não mudou enquanto o hash era calculado;
+                    # atualizado_em à mão (o update() não passa pelo auto_now)
+                    # para o backup --incremental levar o hash novo
+                    if Vendedor.objects.filter(id=vendedor.id, senha=vendedor.senha).update(
+                        senha=novo, atualizado_em=timezone.now()
+                    ):
+                        convertidos.append(vendedor.id)
+            # o vendedor da sessão fica em cache com a senha antiga (appWeb/sessao.py)
+            for vendedor_id in convertidos:
+                cache_catalogo.invalidar_vendedor(vendedor_id)
+            resultado["convertidas"] += len(convertidos)
+
+            if log:
+                log(f"  até id {ultimo}: {resultado['convertidas']} convertidas")
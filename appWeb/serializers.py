@@ -0,0 +1,56 @@
+from rest_framework import serializers
+
+from .models import Vendedor, Produto
+
+
+class CamposSelecionaveisMixin:
+    """
+    Permite escolher os campos pela query string: ``?fields=id,nome,preco``.
+    Campos desconhecidos são ignorados.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get("request")
+        if request is None:
+            return
+        campos = request.query_params.get("fields")
+        if not campos:
+            return
+        pedidos = {c.strip() for c in campos.split(",") if c.strip()}
+        for nome in set(self.fields) - pedidos:
+            self.fields.pop(nome)
+
+
+class VendedorSerializer(CamposSelecionaveisMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Vendedor
+        fields = [
+            "id",
+            "nome_venda",
+            "celular",
+            "celular_e164",
+            "local_principal_venda",
+            "foto_perfil",
+            "foto_perfil_miniatura",
+            "produtos_disponiveis",
+            "atualizado_em",
+        ]
+
+
+class ProdutoSerializer(CamposSelecionaveisMixin, serializers.ModelSerializer):
+    vendedor_nome = serializers.CharField(source="vendedor.nome_venda", read_only=True)
+
+    class Meta:
+        model = Produto
+        fields = [
+            "id",
+            "nome",
+            "preco",
+            "descricao",
+            "imagem",
+            "imagem_miniatura",
+            "vendedor",
+            "vendedor_nome",
+            "atualizado_em",
+        ]
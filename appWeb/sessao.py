@@ -0,0 +1,60 @@
+"""
+Vendedor logado (``request.vendedor``).
+
+O VendedorMiddleware (appWeb/middleware.py) coloca em ``request.vendedor`` um
+objeto preguiçoso: o vendedor só é buscado se a view usar. A busca passa por
+um cache curto, com chave (id, versão do vendedor em appWeb/cache_catalogo.py);
+como os signals trocam a versão sempre que o vendedor é salvo, um vendedor
+editado nunca sai desatualizado do cache.
+
+O hash da senha não vai para o cache (que pode ser um Redis compartilhado):
+o vendedor é carregado com ``defer("senha")``, e quem precisa dela (alterar a
+senha) a busca no banco ao acessar o campo.
+"""
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.shortcuts import redirect
+
+from . import cache_catalogo
+from .models import Vendedor
+
+CHAVE_SESSAO = "vendedor_id"
+
+
+def _timeout():
+    return getattr(settings, "VENDEDOR_SESSAO_CACHE_TIMEOUT", 60)
+
+
+def _chave(vendedor_id, versao):
+    return f"sessao:vendedor:{vendedor_id}:{versao}"
+
+
+def obter_vendedor(request):
+    """Vendedor da sessão ou None (sem login ou vendedor removido)."""
+    vendedor_id = request.session.get(CHAVE_SESSAO)
+    if not vendedor_id:
+        return None
+
+    chave = _chave(vendedor_id, cache_catalogo.versao_vendedor(vendedor_id))
+    vendedor = cache.get(chave)
+    if vendedor is None:
+        vendedor = Vendedor.objects.defer("senha").filter(id=vendedor_id).first()
+        if vendedor is None:
+            request.session.pop(CHAVE_SESSAO, None)
+            return None
+        cache.set(chave, vendedor, _timeout())
+    return vendedor
+
+
+def vendedor_obrigatorio(view):
+    """Manda para o login quem não tem vendedor na sessão."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.vendedor:
+            messages.error(request, "Você precisa estar logado para acessar esta página.")
+            return redirect("login")
+        return view(request, *args, **kwargs)
+    return wrapper
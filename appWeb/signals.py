@@ -0,0 +1,150 @@
+"""
+Signals do appWeb.
+
+- Mantêm o índice de busca (appWeb/busca.py) em dia com Produto e Vendedor.
+- Geram as miniaturas das imagens enviadas (appWeb/imagens.py).
+- Normalizam o celular do vendedor para E.164 (appWeb/telefones.py).
+- Mantêm os contadores de produtos do vendedor (appWeb/contadores.py).
+- Tiram as referências dos arquivos de mídia que um model excluído ou com a
+  imagem trocada deixou de usar (appWeb/limpeza_midia.py).
+- Invalidam o cache das páginas públicas do catálogo (appWeb/cache_catalogo.py).
+
+Dentro de ``em_lote()`` os receivers de exclusão por produto/imagem não fazem
+nada: quem apaga em massa (appWeb/lote_produtos.py) refaz índice, contadores,
+referências de mídia e cache uma vez só no fim.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import busca, cache_catalogo, contadores, imagens, limpeza_midia, telefones
+from .models import ImagemProduto, Produto, Vendedor
+
+_em_lote = ContextVar("appweb_signals_em_lote", default=False)
+
+
+@contextmanager
+def em_lote():
+    token = _em_lote.set(True)
+    try:
+        yield
+    finally:
+        _em_lote.reset(token)
+
+
+@receiver(pre_save, sender=Vendedor)
+@receiver(pre_save, sender=Produto)
+@receiver(pre_save, sender=ImagemProduto)
+def imagem_enviada_gerar_miniatura(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    imagens.preparar_miniatura(instance)
+
+
+@receiver(pre_save, sender=Vendedor)
+@receiver(pre_save, sender=Produto)
+@receiver(pre_save, sender=ImagemProduto)
+def imagem_salvando_referencias(sender, instance, raw=False, update_fields=None, **kwargs):
+    # depois de imagem_enviada_gerar_miniatura: a miniatura nova já está no campo
+    if raw:
+        return
+    limpeza_midia.guardar_arquivos_anteriores(instance, update_fields)
+
+
+@receiver(post_save, sender=Vendedor)
+@receiver(post_save, sender=Produto)
+@receiver(post_save, sender=ImagemProduto)
+def imagem_salva_referencias(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    limpeza_midia.arquivos_trocados(instance)
+
+
+@receiver(post_delete, sender=Vendedor)
+@receiver(post_delete, sender=Produto)
+@receiver(post_delete, sender=ImagemProduto)
+def imagem_removida_referencias(sender, instance, **kwargs):
+    if _em_lote.get():
+        return
+    limpeza_midia.soltar(limpeza_midia.arquivos_de(instance))
+
+
+@receiver(pre_save, sender=Vendedor)
+def vendedor_normalizar_celular(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    instance.celular_e164 = telefones.normalizar_celular(instance.celular)
+
+
+@receiver(pre_save, sender=Produto)
+def produto_salvando_contadores(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    contadores.guardar_estado_anterior(instance)
+
+
+@receiver(post_save, sender=Produto)
+def produto_salvo_contadores(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    contadores.produto_salvo(instance, created)
+
+
+@receiver(post_delete, sender=Produto)
+def produto_removido_contadores(sender, instance, **kwargs):
+    if _em_lote.get():
+        return
+    contadores.produto_removido(instance)
+
+
+@receiver(post_save, sender=Produto)
+def produto_salvo_indexar(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    busca.indexar_produto(instance)
+
+
+@receiver(post_delete, sender=Produto)
+def produto_removido_indexar(sender, instance, **kwargs):
+    if _em_lote.get():
+        return
+    busca.remover_produto(instance.pk)
+
+
+@receiver(post_save, sender=Vendedor)
+def vendedor_salvo_indexar(sender, instance, created=False, raw=False, **kwargs):
+    # vendedor novo ainda não tem produtos; nos outros casos o nome_venda
+    # pode ter mudado e ele faz parte do índice de todos os produtos dele
+    if raw or created:
+        return
+    update_fields = kwargs.get("update_fields")
+    if update_fields is not None and "nome_venda" not in update_fields:
+        return
+    busca.indexar_vendedor(instance)
+
+
+@receiver(post_save, sender=Vendedor)
+@receiver(post_delete, sender=Vendedor)
+def vendedor_alterado_invalidar_cache(sender, instance, **kwargs):
+    cache_catalogo.invalidar_vendedor(instance.pk)
+
+
+@receiver(post_save, sender=Produto)
+@receiver(post_delete, sender=Produto)
+def produto_alterado_invalidar_cache(sender, instance, **kwargs):
+    if _em_lote.get():
+        return
+    # a página do vendedor lista os produtos dele
+    cache_catalogo.invalidar_produto(instance.pk)
+    cache_catalogo.invalidar_vendedor(instance.vendedor_id)
+
+
+@receiver(post_save, sender=ImagemProduto)
+@receiver(post_delete, sender=ImagemProduto)
+def imagem_alterada_invalidar_cache(sender, instance, **kwargs):
+    if _em_lote.get():
+        return
+    # a galeria só aparece na página do produto
+    cache_catalogo.invalidar_produto(instance.produto_id)
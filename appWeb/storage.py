@@ -0,0 +1,482 @@
+"""
+Storage das imagens enviadas (foto de perfil, imagem do produto e galeria).
+
+``storage_midia()`` é o ``storage=`` dos ImageFields em appWeb/models.py: o
+Cloudinary quando ele está configurado (CLOUDINARY_URL), senão o storage padrão
+do Django (FileSystemStorage em MEDIA_ROOT), envolvido nas camadas abaixo
+(ligadas por padrão):
+
+- ``ConteudoEnderecadoStorage`` (STORAGE_DEDUP): nome pelo hash do conteúdo,
+  uploads iguais gravados uma vez só, contagem de referências;
+- ``UrlEmCacheStorage`` (STORAGE_URL_CACHE), por fora.
+
+``UrlEmCacheStorage`` memoriza ``url(nome)``. No Cloudinary cada ``.url``
+passa pelo montador de URLs do SDK, e uma listagem faz dezenas delas:
+
+- LRU em memória, por processo, com até STORAGE_URL_CACHE_TAMANHO nomes;
+- cache compartilhado (o ``default``, ver CACHE_BACKEND) com validade de
+  STORAGE_URL_CACHE_TIMEOUT segundos, para um worker novo não começar do zero.
+  No FileSystemStorage ele é pulado: a URL é uma concatenação, mais barata que
+  ir ao cache.
+
+``save`` e ``delete`` esquecem a URL do nome nos dois níveis. O resto da API de
+Storage é repassado ao storage de verdade.
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, Storage, default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+PREFIXO = "storage:url"
+
+
+def _tamanho():
+    return getattr(settings, "STORAGE_URL_CACHE_TAMANHO", 5000)
+
+
+def _timeout():
+    return getattr(settings, "STORAGE_URL_CACHE_TIMEOUT", 3600)
+
+
+def storage_de_verdade(storage):
+    """O storage por baixo das camadas deste módulo."""
+    while isinstance(storage, StorageRepassado):
+        storage = storage.backend
+    return storage
+
+
+def _camada(storage, classe):
+    while isinstance(storage, StorageRepassado):
+        if isinstance(storage, classe):
+            return storage
+        storage = storage.backend
+    return None
+
+
+def conteudo_enderecado(storage):
+    """A camada ConteudoEnderecadoStorage de ``storage``, ou None (STORAGE_DEDUP desligado)."""
+    return _camada(storage, ConteudoEnderecadoStorage)
+
+
+# arquivos gravados no storage de verdade dentro de apagar_envios_se_falhar
+_envios = ContextVar("envios_storage", default=None)
+
+
+def anotar_envio(apagar, nome):
+    """``apagar(nome)`` desfaz o envio se o bloco de apagar_envios_se_falhar falhar."""
+    envios = _envios.get()
+    if envios is not None:
+        envios.append((apagar, nome))
+
+
+def _apagar(apagar, nomes):
+    for nome in nomes:
+        try:
+            apagar(nome)
+        except Exception:
+            pass
+
+
+@contextmanager
+def apagar_envios_se_falhar():
+    """
+    Se o bloco sair com exceção, apaga os arquivos que as camadas deste módulo
+    gravaram nele. Fica por fora do ``transaction.atomic()``: o rollback desfaz
+    as linhas que apontariam para eles, e sem isso os arquivos ficariam órfãos
+    no storage. Só entram os arquivos que subiram dentro do bloco; um conteúdo
+    que já existia (ConteudoEnderecadoStorage) não é apagado.
+    """
+    pai = _envios.get()
+    envios = []
+    token = _envios.set(envios)
+    try:
+        yield
+    except BaseException:
+        for apagar, nome in envios:
+            _apagar(apagar, [nome])
+        raise
+    else:
+        if pai is not None:
+            pai.extend(envios)
+    finally:
+        _envios.reset(token)
+
+
+class FalhaNoEnvio(Exception):
+    """Envios de ``salvar_em_paralelo`` que falharam (``erros``); os que subiram já foram apagados."""
+
+    def __init__(self, erros):
+        super().__init__(erros[0])
+        self.erros = erros
+
+
+def _resultados(futuros):
+    feitos, erros = [], []
+    for futuro in futuros:
+        try:
+            feitos.append(futuro.result())
+        except Exception as e:
+            feitos.append(None)
+            erros.append(e)
+    return feitos, erros
+
+
+def salvar_em_paralelo(storage, itens, pool):
+    """
+    Grava ``itens`` (pares nome, conteúdo) em ``storage`` e devolve os nomes
+    gravados, na mesma ordem. As threads de ``pool`` só transferem os bytes;
+    ArquivoMidia é lido e escrito aqui, na thread de quem chama e dentro da
+    transação dela: uma thread não abre conexão própria nem espera por uma
+    trava que essa transação segura.
+    """
+    backend = storage_de_verdade(storage)
+    dedup = _camada(storage, ConteudoEnderecadoStorage)
+    if dedup is None:
+        salvos, erros = _resultados([pool.submit(backend.save, nome, conteudo) for nome, conteudo in itens])
+        if erros:
+            _apagar(backend.delete, [salvo for salvo in salvos if salvo])
+            raise FalhaNoEnvio(erros)
+        for salvo in salvos:
+            anotar_envio(backend.delete, salvo)
+        return salvos
+
+    nomes = [dedup.nome_por_conteudo(nome, conteudo) for nome, conteudo in itens]
+    registrados = set(dedup._modelo().objects.filter(nome__in=nomes).values_list("nome", flat=True))
+    # conteúdo já registrado, ou repetido no lote, não é enviado de novo
+    pendentes = {}
+    for nome, (_, conteudo) in zip(nomes, itens):
+        if nome not in registrados and nome not in pendentes:
+            pendentes[nome] = pool.submit(dedup.transferir, nome, conteudo)
+    transferidos, erros = _resultados(pendentes.values())
+    transferidos = {nome: t for nome, t in zip(pendentes, transferidos) if t}
+    if erros:
+        _apagar(backend.delete, [salvo for salvo, novo in transferidos.values() if novo])
+        raise FalhaNoEnvio(erros)
+
+    salvos = []
+    for nome, (original, conteudo) in zip(nomes, itens):
+        if nome in transferidos:
+            salvos.append(dedup.registrar(nome, *transferidos.pop(nome)))
+        else:
+            # sumiu do banco desde a consulta acima (limpar_midia): envia aqui
+            salvos.append(dedup._referenciar(nome) or dedup.save(original, conteudo))
+    return salvos
+
+
+class StorageRepassado(Storage):
+    """Repassa toda a API de Storage para ``backend``; as subclasses mudam o que precisam."""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def __getattr__(self, nome):
+        # atributos próprios do storage de verdade (location, base_url, ...)
+        if nome == "backend":
+            raise AttributeError(nome)
+        return getattr(self.backend, nome)
+
+    def open(self, name, mode="rb"):
+        return self.backend.open(name, mode)
+
+    def save(self, name, content, max_length=None):
+        return self.backend.save(name, content, max_length=max_length)
+
+    def delete(self, name):
+        self.backend.delete(name)
+
+    def exists(self, name):
+        return self.backend.exists(name)
+
+    def listdir(self, path):
+        return self.backend.listdir(path)
+
+    def size(self, name):
+        return self.backend.size(name)
+
+    def url(self, name):
+        return self.backend.url(name)
+
+    def path(self, name):
+        return self.backend.path(name)
+
+    def get_valid_name(self, name):
+        return self.backend.get_valid_name(name)
+
+    def get_alternative_name(self, file_root, file_ext):
+        return self.backend.get_alternative_name(file_root, file_ext)
+
+    def get_available_name(self, name, max_length=None):
+        return self.backend.get_available_name(name, max_length=max_length)
+
+    def generate_filename(self, filename):
+        return self.backend.generate_filename(filename)
+
+    def get_accessed_time(self, name):
+        return self.backend.get_accessed_time(name)
+
+    def get_created_time(self, name):
+        return self.backend.get_created_time(name)
+
+    def get_modified_time(self, name):
+        return self.backend.get_modified_time(name)
+
+
+class UrlEmCacheStorage(StorageRepassado):
+    def __init__(self, backend, cache_compartilhado=None):
+        super().__init__(backend)
+        # None: só para storages remotos
+        if cache_compartilhado is None:
+            cache_compartilhado = not isinstance(storage_de_verdade(backend), FileSystemStorage)
+        self.cache_compartilhado = cache_compartilhado
+        self._urls = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _chave(self, name):
+        digest = hashlib.sha1(name.encode()).hexdigest()
+        return f"{PREFIXO}:{type(self.backend).__name__}:{digest}"
+
+    def url_em_memoria(self, name):
+        """URL que sai sem custo (LRU do processo ou storage local), ou None."""
+        if not self.cache_compartilhado:
+            return self.url(name)
+        with self._lock:
+            item = self._urls.get(name)
+            if item is not None and item[1] > time.monotonic():
+                self._urls.move_to_end(name)
+                return item[0]
+        return None
+
+    def url(self, name):
+        agora = time.monotonic()
+        with self._lock:
+            item = self._urls.get(name)
+            if item is not None and item[1] > agora:
+                self._urls.move_to_end(name)
+                return item[0]
+
+        url = None
+        if self.cache_compartilhado:
+            url = cache.get(self._chave(name))
+        if url is None:
+            url = self.backend.url(name)
+            if self.cache_compartilhado:
+                cache.set(self._chave(name), url, _timeout())
+
+        with self._lock:
+            self._urls[name] = (url, agora + _timeout())
+            self._urls.move_to_end(name)
+            while len(self._urls) > _tamanho():
+                self._urls.popitem(last=False)
+        return url
+
+    def esquecer_url(self, name):
+        with self._lock:
+            self._urls.pop(name, None)
+        if self.cache_compartilhado:
+            cache.delete(self._chave(name))
+
+    def save(self, name, content, max_length=None):
+        name = self.backend.save(name, content, max_length=max_length)
+        if not isinstance(self.backend, StorageRepassado):
+            anotar_envio(self.backend.delete, name)
+        self.esquecer_url(name)
+        return name
+
+    def delete(self, name):
+        self.backend.delete(name)
+        self.esquecer_url(name)
+
+
+class ConteudoEnderecadoStorage(StorageRepassado):
+    """
+    Dá a cada arquivo o nome ``PASTA/<2 primeiros>/<sha256><extensão>``: o
+    mesmo conteúdo enviado de novo (a mesma foto em vários produtos, a
+    miniatura dela) não é gravado nem transferido outra vez. ArquivoMidia liga
+    o nome pelo conteúdo ao nome que o storage devolveu (iguais no
+    FileSystemStorage; o Cloudinary acrescenta prefixo e sufixo) e conta as
+    referências: cada ``save`` soma uma, cada ``delete`` tira uma e o arquivo
+    só é apagado quando não sobra nenhuma. Como o nome muda junto com o
+    conteúdo, ele pode ser servido com cache imutável (appWeb/midia.py).
+
+    Excluir um model (um a um, em cascata ou em lote) ou trocar a imagem de
+    um campo não passa pelo ``delete`` do storage: nesses casos os signals e
+    a exclusão em lote chamam ``soltar`` (ver appWeb/limpeza_midia.py), e o
+    arquivo que chega a zero sai depois do commit com ``apagar_se_solto``.
+    Nomes gravados nos campos sem ``save`` (restore de backup, carga) não
+    entram na contagem; por isso, antes de apagar, os ImageFields são
+    conferidos, e o ``limpar_midia`` recolhe o que sobrar.
+
+    Arquivos gravados antes, com o nome original, não estão em ArquivoMidia:
+    ``delete`` neles vai direto para o storage.
+
+    ``save`` = ``transferir`` (só bytes) + ``registrar`` (banco). Quem envia
+    em threads (``salvar_em_paralelo``) chama os dois separados, para que o
+    banco fique na thread da transação.
+    """
+    PASTA = "midia"
+
+    def _modelo(self):
+        # appWeb/models.py importa este módulo
+        from .models import ArquivoMidia
+        return ArquivoMidia
+
+    def nome_por_conteudo(self, name, content):
+        digest = hashlib.sha256()
+        for bloco in content.chunks():
+            digest.update(bloco)
+        if hasattr(content, "seek"):
+            content.seek(0)
+        sha = digest.hexdigest()
+        extensao = os.path.splitext(name or "")[1].lower()
+        if not _EXTENSAO.match(extensao):
+            extensao = ""
+        return f"{self.PASTA}/{sha[:2]}/{sha}{extensao}"
+
+    def _referenciar(self, nome):
+        """Mais uma referência a ``nome``, se ele já está registrado: devolve o nome no storage."""
+        ArquivoMidia = self._modelo()
+        if ArquivoMidia.objects.filter(nome=nome).update(referencias=F("referencias") + 1):
+            return ArquivoMidia.objects.values_list("nome_storage", flat=True).get(nome=nome)
+        return None
+
+    def transferir(self, nome, content, max_length=None):
+        """
+        Só os bytes, sem tocar no banco (pode rodar numa thread): grava
+        ``content`` em ``nome`` e devolve ``(salvo, novo)``, o nome que o
+        storage devolveu e se o arquivo subiu agora. O ``registrar`` depois,
+        na thread da transação, conta a referência.
+        """
+        if self.backend.exists(nome):
+            # gravado fora daqui (restore, versão anterior da contagem)
+            return nome, False
+        return self.backend.save(nome, content, max_length=max_length), True
+
+    def registrar(self, nome, salvo, novo):
+        """Conta uma referência a ``nome`` (já transferido); devolve o nome a guardar no campo."""
+        vencedor = self._referenciar(nome)
+        if vencedor is None:
+            try:
+                with transaction.atomic():
+                    self._modelo().objects.create(nome=nome, nome_storage=salvo, referencias=1)
+                if novo:
+                    anotar_envio(self.descartar, salvo)
+                return salvo
+            except IntegrityError:
+                # outro upload do mesmo conteúdo registrou primeiro: fica o dele
+                vencedor = self._referenciar(nome)
+        if novo and salvo != vencedor:
+            self.backend.delete(salvo)
+        return vencedor
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+        nome = self.nome_por_conteudo(name, content)
+
+        # já existe: só mais uma referência, nada é enviado
+        existente = self._referenciar(nome)
+        if existente is not None:
+            return existente
+        salvo, novo = self.transferir(nome, content, max_length=max_length)
+        return self.registrar(nome, salvo, novo)
+
+    def descartar(self, name):
+        """Apaga um arquivo enviado numa transação desfeita, se ninguém mais o registrou."""
+        if not self._modelo().objects.filter(nome_storage=name).exists():
+            self.backend.delete(name)
+
+    def soltar(self, nomes):
+        """
+        Tira uma referência por ocorrência de cada nome (no storage) em
+        ``nomes``, sem passar de zero. Devolve os que ficaram em zero.
+        """
+        ArquivoMidia = self._modelo()
+        vezes = Counter(nome for nome in nomes if nome)
+        por_vezes = {}
+        for nome, n in vezes.items():
+            por_vezes.setdefault(n, []).append(nome)
+        for n, grupo in por_vezes.items():
+            ArquivoMidia.objects.filter(nome_storage__in=grupo).update(
+                referencias=Greatest(F("referencias") - n, 0)
+            )
+        return list(
+            ArquivoMidia.objects.filter(nome_storage__in=list(vezes), referencias=0)
+            .values_list("nome_storage", flat=True)
+        )
+
+    def apagar_se_solto(self, name):
+        """Apaga ``name`` (arquivo e linha) se a contagem dele ainda for zero."""
+        with transaction.atomic():
+            # a linha fica travada até o commit: um save do mesmo conteúdo
+            # espera e, sem ela, envia o arquivo de novo
+            apagadas, _ = self._modelo().objects.filter(nome_storage=name, referencias=0).delete()
+            if apagadas:
+                self.backend.delete(name)
+        return bool(apagadas)
+
+    def salvar_no_nome(self, name, content):
+        """Grava exatamente em ``name`` (restore de backup), sem renomear nem contar."""
+        return self.backend.save(name, content)
+
+    def delete(self, name):
+        ArquivoMidia = self._modelo()
+        with transaction.atomic():
+            linha = ArquivoMidia.objects.select_for_update().filter(nome_storage=name).first()
+            if linha is None:
+                self.backend.delete(name)
+                return
+            if linha.referencias > 1:
+                ArquivoMidia.objects.filter(pk=linha.pk).update(referencias=F("referencias") - 1)
+                return
+            # última referência: a linha sai junto com o arquivo, então um
+            # save do mesmo conteúdo depois disso envia de novo
+            linha.delete()
+            self.backend.delete(name)
+
+
+_EXTENSAO = re.compile(r"^\.[a-z0-9]{1,5}$")
+
+
+_storage = None
+
+
+def _cloudinary_configurado():
+    return bool(
+        getattr(settings, "CLOUDINARY_STORAGE", None)
+        or getattr(settings, "CLOUDINARY_URL", None)
+        or os.environ.get("CLOUDINARY_URL")
+    )
+
+
+def storage_midia():
+    """Storage dos ImageFields (criado uma vez por processo)."""
+    global _storage
+    if _storage is None:
+        backend = default_storage
+        # Cloudinary quando configurado, mesmo que o default_storage tenha
+        # sido criado antes como FileSystemStorage. Configurado e com erro
+        # (pacote faltando, credencial inválida) tem que falhar aqui, e não
+        # cair calado no disco local, que no Heroku some a cada deploy
+        if _cloudinary_configurado():
+            from cloudinary_storage.storage import MediaCloudinaryStorage
+            backend = MediaCloudinaryStorage()
+        if getattr(settings, "STORAGE_DEDUP", True):
+            backend = ConteudoEnderecadoStorage(backend)
+        if getattr(settings, "STORAGE_URL_CACHE", True):
+            backend = UrlEmCacheStorage(backend)
+        _storage = backend
+    return _storage
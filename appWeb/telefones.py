@@ -0,0 +1,71 @@
+"""
+Celular do vendedor em E.164 (``+5511999990000``).
+
+O ``Vendedor.celular`` é texto livre digitado no cadastro ("(11) 99999-0000",
+"11 99999 0000", "+55 11 ..."). A forma normalizada fica em
+``Vendedor.celular_e164`` (indexado), mantida no pre_save (appWeb/signals.py),
+e dela sai o link do WhatsApp (``Vendedor.whatsapp_link``), sem refazer a
+limpeza a cada página.
+"""
+from .models import Vendedor
+
+DDI_BRASIL = "55"
+
+
+def normalizar_celular(celular):
+    """
+    Devolve o número em E.164 ou "" se não parecer um telefone. Sem DDI, assume
+    Brasil: DDD + número (10 ou 11 dígitos), aceitando o 0 de longa distância
+    e o código de operadora na frente ("0 21 11 99999-0000").
+    """
+    texto = (celular or "").strip()
+    digitos = "".join(filter(str.isdigit, texto))
+    if not digitos:
+        return ""
+
+    if texto.startswith("+"):
+        pass
+    elif digitos.startswith("00"):
+        digitos = digitos[2:]
+    else:
+        if digitos.startswith("0"):
+            digitos = digitos[1:]
+            if len(digitos) in (12, 13):  # código de operadora
+                digitos = digitos[2:]
+        if len(digitos) in (10, 11):
+            digitos = DDI_BRASIL + digitos
+        elif not digitos.startswith(DDI_BRASIL):
+            # sem DDD (ou tamanho que não é de celular brasileiro)
+            return ""
+
+    if digitos.startswith(DDI_BRASIL) and len(digitos) not in (12, 13):
+        return ""
+    if not 8 <= len(digitos) <= 15:
+        return ""
+    return f"+{digitos}"
+
+
+def preencher_celulares(lote=1000):
+    """
+    Normaliza os vendedores com celular ainda sem ``celular_e164`` (linhas que
+    entraram por bulk_create, sem passar pelo pre_save). Devolve quantos mudaram.
+    """
+    alterados = 0
+    ultimo = 0
+    while True:
+        vendedores = list(
+            Vendedor.objects.filter(celular_e164="", id__gt=ultimo)
+            .exclude(celular="")
+            .order_by("id")
+            .only("id", "celular")[:lote]
+        )
+        if not vendedores:
+            return alterados
+        ultimo = vendedores[-1].id
+        mudaram = []
+        for vendedor in vendedores:
+            vendedor.celular_e164 = normalizar_celular(vendedor.celular)
+            if vendedor.celular_e164:
+                mudaram.append(vendedor)
+        Vendedor.objects.bulk_update(mudaram, ["celular_e164"])
+        alterados += len(mudaram)
@@ -1,3 +1,1358 @@
-from django.test import TestCase
+import json
+import os
+import re
+import runpy
+import shutil
+import sys
+import tempfile
+import threading
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.contrib.sessions.models import Session
+from django.core import mail
+from django.core.management import call_command
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.core.files.storage import Storage, default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.db.backends.signals import connection_created
+from django.db.models import Q
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+
+from . import busca, cache_catalogo, galeria, imagens, limpeza_midia, lote_produtos, metricas, middleware, views
+from .backup import fazer_backup, listar_backups, restaurar
+from .busca import buscar_produtos
+from .carga import carregar_objetos, ler_objetos
+from .contadores import reconciliar
+from .emails import enviar_pendentes
+from .forms import ProdutoForm, VendedorPerfilForm
+from .models import ArquivoMidia, EmailPendente, ImagemProduto, Vendedor, Produto
+from .paginacao import ORDENACAO_CATALOGO
+from .storage import ConteudoEnderecadoStorage, UrlEmCacheStorage, storage_de_verdade, storage_midia
+from .telefones import normalizar_celular
+
+
+def criar_vendedor(**kwargs):
+    dados = {
+        "email": "vendedor@example.com",
+        "senha": "x",
+        "nome_completo": "Vendedor Teste",
+        "nome_venda": "Doces Teste",
+        "celular": "(11) 99999-0000",
+        "local_principal_venda": "Bandejão",
+        "status_disponivel": True,
+        "is_active": True,
+    }
+    dados.update(kwargs)
+    return Vendedor.objects.create(**dados)
+
+
+class MidiaTemporariaMixin:
+    """MEDIA_ROOT numa pasta temporária, apagada no fim de cada teste."""
+
+    def setUp(self):
+        super().setUp()
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        configuracao = override_settings(MEDIA_ROOT=self.media)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+    def _png(self, nome="foto.png", cor="red"):
+        buffer = BytesIO()
+        Image.new("RGB", (8, 8), cor).save(buffer, "PNG")
+        return SimpleUploadedFile(nome, buffer.getvalue(), content_type="image/png")
+
+    def _arquivos(self):
+        return sorted(
+            os.path.relpath(os.path.join(raiz, nome), self.media)
+            for raiz, _, nomes in os.walk(self.media) for nome in nomes
+        )
+
+
+class IndicesCatalogoTests(TestCase):
+    """
+    Garante que as consultas do comprador usam os índices da migration 0006
+    em vez de varrer a tabela de produtos.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendedor = criar_vendedor()
+        for i in range(5):
+            Produto.objects.create(vendedor=cls.vendedor, nome=f"Produto {i}", preco=1)
+
+    def setUp(self):
+        if connection.vendor == "postgresql":
+            # com poucas linhas o Postgres sempre prefere Seq Scan
+            with connection.cursor() as cursor:
+                cursor.execute("SET enable_seqscan = off")
+
+    def assertSemScanSequencial(self, queryset):
+        plano = queryset.explain()
+        tabela = Produto._meta.db_table
+        if connection.vendor == "postgresql":
+            self.assertNotRegex(plano, rf'Seq Scan on "?{tabela}"?', plano)
+        else:
+            # SQLite: "SCAN tabela" sem "USING ... INDEX" é varredura completa
+            for linha in plano.splitlines():
+                if re.search(rf"\bSCAN {tabela}\b", linha):
+                    self.assertIn("INDEX", linha, plano)
+
+    def catalogo(self):
+        return Produto.objects.select_related("vendedor").filter(
+            status_disponivel=True,
+            vendedor__status_disponivel=True,
+        ).order_by(*ORDENACAO_CATALOGO)
+
+    def test_catalogo_primeira_pagina(self):
+        self.assertSemScanSequencial(self.catalogo()[:21])
+
+    def test_catalogo_pagina_com_cursor(self):
+        qs = self.catalogo().filter(Q(nome__gt="Produto 2") | Q(nome="Produto 2", id__gt=3))
+        self.assertSemScanSequencial(qs[:21])
+
+    def test_produtos_do_vendedor(self):
+        self.assertSemScanSequencial(self.vendedor.produtos.filter(status_disponivel=True))
+
+    def test_detalhe_produto(self):
+        qs = Produto.objects.select_related("vendedor").filter(
+            id=1,
+            status_disponivel=True,
+            vendedor__status_disponivel=True,
+        )
+        self.assertSemScanSequencial(qs)
+
+
+@override_settings(CATALOGO_PAGE_SIZE=3)
+class PaginacaoCatalogoTests(TestCase):
+    """home_cliente / home_cliente_mais paginados por cursor (appWeb/paginacao.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        vendedor = criar_vendedor()
+        # nomes iguais: só o id desempata
+        cls.ids = [Produto.objects.create(vendedor=vendedor, nome="Brigadeiro", preco=1).pk for _ in range(8)]
+
+    def _pagina(self, url="/cliente/produtos/mais/", **params):
+        resposta = self.client.get(url, params)
+        self.assertEqual(resposta.status_code, 200)
+        return [p.pk for p in resposta.context["produtos"]], resposta.context["proximo_cursor"]
+
+    def _todas(self, **params):
+        paginas = []
+        cursor = None
+        while True:
+            ids, cursor = self._pagina(**params, **({"cursor": cursor} if cursor else {}))
+            paginas.append(ids)
+            if not cursor:
+                return paginas
+
+    def test_percorre_tudo_sem_repetir_nem_pular(self):
+        paginas = self._todas()
+        self.assertEqual([len(p) for p in paginas], [3, 3, 2])
+        self.assertEqual(sum(paginas, []), self.ids)
+
+    def test_ultima_pagina_sem_carregar_mais(self):
+        _, cursor = self._pagina()
+        _, cursor = self._pagina(cursor=cursor)
+        resposta = self.client.get("/cliente/produtos/mais/", {"cursor": cursor})
+        self.assertIsNone(resposta.context["proximo_cursor"])
+        self.assertNotContains(resposta, "Carregar mais")
+
+    def test_cursor_invalido_volta_para_a_primeira_pagina(self):
+        primeira, cursor = self._pagina(url="/cliente/")
+        adulterado = cursor[:-1] + ("A" if cursor[-1] != "A" else "B")
+        for invalido in ("lixo", adulterado):
+            self.assertEqual(self._pagina(url="/cliente/", cursor=invalido)[0], primeira)
+            self.assertEqual(self._pagina(cursor=invalido)[0], primeira)
+
+    def test_cursor_da_busca_avanca(self):
+        paginas = self._todas(q="brigadeiro")
+        self.assertEqual([len(p) for p in paginas], [3, 3, 2])
+        self.assertEqual(sorted(sum(paginas, [])), self.ids)
+
+
+class BuscaTests(TestCase):
+    """
+    Busca do comprador no backend em uso (FTS5 no SQLite, GIN no Postgres) e
+    no fallback icontains.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendedor = criar_vendedor(nome_venda="Doces da Ana")
+        cls.brigadeiro = Produto.objects.create(
+            vendedor=cls.vendedor, nome="Brigadeiro", descricao="De colher", preco=1
+        )
+        cls.bolo = Produto.objects.create(
+            vendedor=cls.vendedor, nome="Bolo de pote", descricao="Recheio de brigadeiro", preco=1
+        )
+        cls.pao = Produto.objects.create(vendedor=cls.vendedor, nome="Pão de mel", preco=1)
+        outro = criar_vendedor(email="fechado@example.com", status_disponivel=False)
+        Produto.objects.create(vendedor=outro, nome="Brigadeiro gourmet", preco=1)
+
+    def ids(self, termo):
+        return [p.pk for p in buscar_produtos(termo, 0, 10)]
+
+    def test_nome_pesa_mais_que_descricao(self):
+        self.assertEqual(self.ids("brigadeiro"), [self.brigadeiro.pk, self.bolo.pk])
+
+    def test_prefixo_e_todas_as_palavras(self):
+        self.assertEqual(self.ids("brig"), [self.brigadeiro.pk, self.bolo.pk])
+        self.assertEqual(self.ids("bolo brig"), [self.bolo.pk])
+
+    def test_nome_da_venda_e_paginacao(self):
+        self.assertEqual(len(self.ids("ana")), 3)
+        self.assertEqual(len(buscar_produtos("ana", 2, 10)), 1)
+
+    @skipUnless(connection.vendor == "sqlite", "FTS5 só existe no SQLite")
+    def test_sem_acento_no_fts(self):
+        self.assertEqual(self.ids("pao"), [self.pao.pk])
+
+    def test_fallback_icontains(self):
+        with mock.patch.object(busca, "_fts_disponivel", return_value=False), \
+                mock.patch.object(connection, "vendor", "sqlite"):
+            self.assertEqual(self.ids("brig"), [self.brigadeiro.pk])
+            self.assertEqual(self.ids("doces da ana"), [self.bolo.pk, self.brigadeiro.pk, self.pao.pk])
+
+    @skipUnless(connection.vendor == "sqlite", "FTS5 só existe no SQLite")
+    def test_tabela_fts_conferida_uma_vez_por_conexao(self):
+        self.ids("bolo")
+        with CaptureQueriesContext(connection) as consultas:
+            self.ids("bolo")
+            self.ids("mel")
+        self.assertFalse([q for q in consultas if "sqlite_master" in q["sql"]])
+
+        connection_created.send(sender=connection.__class__, connection=connection)
+        with CaptureQueriesContext(connection) as consultas:
+            self.ids("bolo")
+        self.assertEqual(len([q for q in consultas if "sqlite_master" in q["sql"]]), 1)
+
+
+class FilaEmailsTests(TestCase):
+    """As views só enfileiram; o envio acontece no enviar_pendentes (locmem nos testes)."""
+
+    def test_cadastro_enfileira_sem_enviar(self):
+        resp = self.client.post("/cadastro/", {
+            "email": "novo@example.com",
+            "senha": "Senha123!",
+            "nome_completo": "Novo Vendedor",
+            "nome_venda": "Novo",
+            "celular": "11999990000",
+            "local_principal_venda": "Prainha",
+        })
+        self.assertEqual(resp.status_code, 302)
+        self.assertEqual(len(mail.outbox), 0)
+        email = EmailPendente.objects.get()
+        self.assertEqual(email.destinatarios, ["novo@example.com"])
+
+        self.assertEqual(enviar_pendentes(), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn("/activate/", mail.outbox[0].body)
+        email.refresh_from_db()
+        self.assertEqual(email.status, EmailPendente.ENVIADO)
+
+    def test_reset_de_senha_enfileira(self):
+        criar_vendedor(email="reset@example.com")
+        self.client.post("/password-reset/", {"email": "reset@example.com"})
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(EmailPendente.objects.count(), 1)
+
+    def test_falha_reagenda_com_backoff(self):
+        EmailPendente.objects.create(
+            assunto="Oi", mensagem="x", remetente="a@b.com", destinatarios=["c@d.com"]
+        )
+        with mock.patch("django.core.mail.EmailMessage.send", side_effect=OSError("fora do ar")):
+            self.assertEqual(enviar_pendentes(), (0, 1))
+
+        email = EmailPendente.objects.get()
+        self.assertEqual(email.status, EmailPendente.PENDENTE)
+        self.assertEqual(email.tentativas, 1)
+        self.assertIn("fora do ar", email.ultimo_erro)
+        # ainda não venceu a próxima tentativa
+        self.assertEqual(enviar_pendentes(), (0, 0))
+
+    def test_desiste_depois_do_maximo_de_tentativas(self):
+        EmailPendente.objects.create(
+            assunto="Oi", mensagem="x", remetente="a@b.com", destinatarios=["c@d.com"]
+        )
+        with mock.patch("django.core.mail.EmailMessage.send", side_effect=OSError("erro")):
+            enviar_pendentes(max_tentativas=1)
+        self.assertEqual(EmailPendente.objects.get().status, EmailPendente.FALHOU)
+
+
+class CacheCatalogoTests(TestCase):
+    """Páginas públicas do vendedor/produto saem do cache até o vendedor alterar algo."""
+
+    def setUp(self):
+        cache.clear()
+        self.vendedor = criar_vendedor()
+        self.produto = Produto.objects.create(vendedor=self.vendedor, nome="Brigadeiro", preco=2)
+
+    def test_segunda_visita_sem_queries(self):
+        for url in (f"/cliente/vendedor/{self.vendedor.id}/", f"/cliente/produto/{self.produto.id}/"):
+            primeira = self.client.get(url)
+            with self.assertNumQueries(0):
+                segunda = self.client.get(url)
+            self.assertEqual(primeira.content, segunda.content)
+
+    def test_editar_produto_invalida(self):
+        url_vendedor = f"/cliente/vendedor/{self.vendedor.id}/"
+        url_produto = f"/cliente/produto/{self.produto.id}/"
+        self.client.get(url_vendedor)
+        self.client.get(url_produto)
+
+        self.produto.nome = "Beijinho"
+        self.produto.save()
+
+        self.assertContains(self.client.get(url_vendedor), "Beijinho")
+        self.assertContains(self.client.get(url_produto), "Beijinho")
+
+    def test_editar_vendedor_invalida_pagina_do_produto(self):
+        url_produto = f"/cliente/produto/{self.produto.id}/"
+        self.client.get(url_produto)
+
+        self.vendedor.nome_venda = "Doces da Maria"
+        self.vendedor.save()
+
+        self.assertContains(self.client.get(url_produto), "Doces da Maria")
+
+    def test_alteracao_durante_a_renderizacao_nao_fica_no_cache(self):
+        url_produto = f"/cliente/produto/{self.produto.id}/"
+        carregar = views.carregar_detalhe_produto
+
+        def renomear():
+            self.vendedor.nome_venda = "Doces da Maria"
+            self.vendedor.save()
+
+        async def carregar_e_alterar(produto_id):
+            resultado = await carregar(produto_id)
+            # o vendedor muda depois que o produto foi lido
+            await sync_to_async(renomear)()
+            return resultado
+
+        with mock.patch.object(views, "carregar_detalhe_produto", carregar_e_alterar):
+            self.assertNotContains(self.client.get(url_produto), "Doces da Maria")
+        self.assertContains(self.client.get(url_produto), "Doces da Maria")
+
+
+class DetalheProdutoQueriesTests(TestCase):
+    """A tela de detalhe custa o mesmo número de queries com 1 ou N imagens na galeria."""
+
+    def setUp(self):
+        self.vendedor = criar_vendedor()
+
+    def produto_com_galeria(self, quantidade):
+        produto = Produto.objects.create(
+            vendedor=self.vendedor, nome=f"Bolo {quantidade}", preco=5, imagem="produtos/bolo.jpg"
+        )
+        for i in range(quantidade):
+            ImagemProduto.objects.create(produto=produto, imagem=f"produtos/catalogo/{i}.jpg")
+        return produto
+
+    def queries_do_detalhe(self, produto):
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(f"/cliente/produto/{produto.id}/")
+        self.assertEqual(resp.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_queries_constantes(self):
+        uma = self.produto_com_galeria(1)
+        dez = self.produto_com_galeria(10)
+        self.assertEqual(self.queries_do_detalhe(uma), self.queries_do_detalhe(dez))
+
+    def test_galeria_na_ordem_de_envio(self):
+        produto = self.produto_com_galeria(3)
+        cache.clear()
+        resp = self.client.get(f"/cliente/produto/{produto.id}/")
+        self.assertEqual(resp.context["imagens"], [
+            "/media/produtos/bolo.jpg",
+            "/media/produtos/catalogo/0.jpg",
+            "/media/produtos/catalogo/1.jpg",
+            "/media/produtos/catalogo/2.jpg",
+        ])
+
+
+class VendedorSessaoTests(TestCase):
+    """request.vendedor sai do cache até o vendedor ser salvo."""
+
+    def setUp(self):
+        cache.clear()
+        self.vendedor = criar_vendedor(senha=make_password("Senha123!"))
+        self.client.post("/login/", {"email": self.vendedor.email, "senha": "Senha123!"})
+
+    def _queries_vendedor(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [q for q in ctx.captured_queries if 'FROM "appWeb_vendedor"' in q["sql"]]
+
+    def test_segunda_requisicao_sem_query_do_vendedor(self):
+        self.assertEqual(len(self._queries_vendedor("/painel/")), 1)
+        self.assertEqual(self._queries_vendedor("/painel/"), [])
+        self.assertEqual(self._queries_vendedor("/produtos/"), [])
+
+    def test_senha_fora_do_cache(self):
+        self.client.get("/painel/")
+        chave = f"sessao:vendedor:{self.vendedor.pk}:{cache_catalogo.versao_vendedor(self.vendedor.pk)}"
+        self.assertIn("senha", cache.get(chave).get_deferred_fields())
+
+        resposta = self.client.post("/vendedor/alterar-senha/", {
+            "senha_atual": "Senha123!", "senha_nova": "Nova123!", "confirmar_senha_nova": "Nova123!",
+        })
+        self.assertRedirects(resposta, "/painel/", fetch_redirect_response=False)
+        self.vendedor.refresh_from_db()
+        self.assertTrue(check_password("Nova123!", self.vendedor.senha))
+
+    def test_salvar_vendedor_invalida(self):
+        self.client.get("/painel/")
+        self.vendedor.nome_venda = "Doces da Maria"
+        self.vendedor.save()
+        self.assertContains(self.client.get("/painel/"), "Doces da Maria")
+
+    def test_sem_login_vai_para_o_login(self):
+        self.client.session.flush()
+        self.client.cookies.clear()
+        for url in ("/painel/", "/produtos/", "/perfil/editar/", "/vendedor/alterar-senha/"):
+            self.assertRedirects(self.client.get(url), "/login/", fetch_redirect_response=False)
+
+
+class LimparSessoesTests(TestCase):
+    """manage.py limpar_sessoes e o SESSION_MODE em projetoRP2/settings.py."""
+
+    def _sessao(self, chave, dias):
+        Session.objects.create(
+            session_key=chave, session_data="", expire_date=timezone.now() + timedelta(days=dias)
+        )
+
+    @override_settings(SESSION_ENGINE="django.contrib.sessions.backends.cached_db")
+    def test_apaga_so_as_expiradas_em_lotes(self):
+        for i in range(5):
+            self._sessao(f"velha{i}", -1)
+        self._sessao("viva1", 1)
+        self._sessao("viva2", 30)
+        saida = StringIO()
+        with CaptureQueriesContext(connection) as consultas:
+            call_command("limpar_sessoes", "--lote", "2", stdout=saida)
+        self.assertIn("5 sessões expiradas apagadas", saida.getvalue())
+        self.assertEqual(set(Session.objects.values_list("session_key", flat=True)), {"viva1", "viva2"})
+        # 5 expiradas em lotes de 2: três DELETEs
+        self.assertEqual(len([q for q in consultas if q["sql"].startswith("DELETE")]), 3)
+
+    @override_settings(SESSION_ENGINE="django.contrib.sessions.backends.signed_cookies")
+    def test_signed_cookies_nao_mexe_no_banco(self):
+        self._sessao("velha", -1)
+        saida = StringIO()
+        with self.assertNumQueries(0):
+            call_command("limpar_sessoes", stdout=saida)
+        self.assertIn("signed_cookies", saida.getvalue())
+        self.assertTrue(Session.objects.filter(session_key="velha").exists())
+
+    def test_session_mode_desconhecido(self):
+        with mock.patch.dict(os.environ, {"SESSION_MODE": "redis"}):
+            with self.assertRaisesMessage(ImproperlyConfigured, "cached_db, signed_cookies, db"):
+                runpy.run_path(sys.modules[settings.SETTINGS_MODULE].__file__)
+
+
+class CelularE164Tests(TestCase):
+    def test_normalizacao(self):
+        casos = {
+            "(11) 99999-0000": "+5511999990000",
+            "+55 11 99999-0000": "+5511999990000",
+            "011 99999-0000": "+5511999990000",
+            "11 3333-4444": "+551133334444",
+            "+1 415 555 2671": "+14155552671",
+            "99999-0000": "",
+            "": "",
+        }
+        for celular, esperado in casos.items():
+            self.assertEqual(normalizar_celular(celular), esperado, celular)
+
+    def test_mantido_no_save_e_usado_no_link(self):
+        vendedor = criar_vendedor(celular="(11) 99999-0000")
+        self.assertEqual(vendedor.celular_e164, "+5511999990000")
+        vendedor.celular = "21 98888 7777"
+        vendedor.save()
+        vendedor.refresh_from_db()
+        self.assertEqual(vendedor.whatsapp_link, "https://wa.me/5521988887777")
+        self.assertContains(self.client.get(f"/cliente/vendedor/{vendedor.id}/"), "https://wa.me/5521988887777")
+
+    def test_busca_pelo_celular_na_api(self):
+        vendedor = criar_vendedor(celular="(11) 99999-0000")
+        resposta = self.client.get("/api/v1/vendedores/", {"celular": "+55 (11) 99999 0000"})
+        self.assertEqual([v["id"] for v in resposta.json()["results"]], [vendedor.id])
+        resposta = self.client.get("/api/v1/vendedores/", {"celular": "123"})
+        self.assertEqual(resposta.json()["results"], [])
+
+
+class ApiCatalogoTests(TestCase):
+    """API v1 (appWeb/api.py): cursor, filtros, ?fields= e GET condicional."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendedor = criar_vendedor(nome_venda="Bolos")
+        cls.outro = criar_vendedor(email="outro@example.com", nome_venda="Salgados", celular="(21) 98888-7777")
+        cls.produtos = [
+            Produto.objects.create(vendedor=cls.vendedor, nome=f"Produto {i:02d}", preco=1) for i in range(5)
+        ]
+        cls.produto_outro = Produto.objects.create(vendedor=cls.outro, nome="Coxinha", preco=1)
+        Produto.objects.create(vendedor=cls.vendedor, nome="Esgotado", preco=1, status_disponivel=False)
+        fechado = criar_vendedor(email="fechado@example.com", nome_venda="Fechado", status_disponivel=False)
+        Produto.objects.create(vendedor=fechado, nome="Escondido", preco=1)
+
+    def test_cursor_segue_o_next_na_ordem_do_catalogo(self):
+        resposta = self.client.get("/api/v1/produtos/", {"page_size": 2}).json()
+        self.assertIsNone(resposta["previous"])
+        nomes = [p["nome"] for p in resposta["results"]]
+        while resposta["next"]:
+            resposta = self.client.get(resposta["next"]).json()
+            self.assertLessEqual(len(resposta["results"]), 2)
+            nomes += [p["nome"] for p in resposta["results"]]
+        self.assertEqual(nomes, ["Coxinha"] + [p.nome for p in self.produtos])
+
+    def test_page_size_limitado(self):
+        with mock.patch("appWeb.api.CatalogoCursorPagination.max_page_size", 3):
+            resposta = self.client.get("/api/v1/produtos/", {"page_size": 1000}).json()
+        self.assertEqual(len(resposta["results"]), 3)
+
+    def test_filtros(self):
+        resposta = self.client.get("/api/v1/produtos/", {"vendedor": self.outro.pk}).json()
+        self.assertEqual([p["id"] for p in resposta["results"]], [self.produto_outro.pk])
+        # valor inválido é ignorado
+        resposta = self.client.get("/api/v1/produtos/", {"vendedor": "abc"}).json()
+        self.assertEqual(len(resposta["results"]), 6)
+        resposta = self.client.get("/api/v1/vendedores/").json()
+        self.assertEqual([v["nome_venda"] for v in resposta["results"]], ["Bolos", "Salgados"])
+        resposta = self.client.get("/api/v1/vendedores/", {"celular": "21988887777"}).json()
+        self.assertEqual([v["id"] for v in resposta["results"]], [self.outro.pk])
+
+    def test_indisponiveis_fora(self):
+        fechado = Vendedor.objects.get(email="fechado@example.com")
+        self.assertEqual(self.client.get(f"/api/v1/vendedores/{fechado.pk}/").status_code, 404)
+        escondido = Produto.objects.get(nome="Escondido")
+        self.assertEqual(self.client.get(f"/api/v1/produtos/{escondido.pk}/").status_code, 404)
+
+    def test_fields(self):
+        resposta = self.client.get("/api/v1/produtos/", {"fields": "id, nome,inexistente"}).json()
+        self.assertEqual(set(resposta["results"][0]), {"id", "nome"})
+        resposta = self.client.get(f"/api/v1/vendedores/{self.outro.pk}/", {"fields": "nome_venda"}).json()
+        self.assertEqual(resposta, {"nome_venda": "Salgados"})
+
+    def test_304_sem_serializar_e_200_depois_de_mudar(self):
+        url = "/api/v1/produtos/"
+        resposta = self.client.get(url)
+        etag = resposta["ETag"]
+        # só a agregação das datas
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_MODIFIED_SINCE=resposta["Last-Modified"]).status_code, 304
+        )
+        # outra página/filtro tem outro ETag
+        self.assertNotEqual(self.client.get(url, {"page_size": 2})["ETag"], etag)
+
+        produto = self.produtos[0]
+        produto.preco = 2
+        produto.save()
+        resposta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertNotEqual(resposta["ETag"], etag)
+
+        # um produto sumindo da lista também muda o ETag (contagem)
+        etag = resposta["ETag"]
+        Produto.objects.filter(pk=produto.pk).update(status_disponivel=False)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_304_no_detalhe(self):
+        url = f"/api/v1/produtos/{self.produto_outro.pk}/"
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # mudar o vendedor muda o vendedor_nome do produto
+        self.outro.nome_venda = "Salgados da Bia"
+        self.outro.save()
+        resposta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.json()["vendedor_nome"], "Salgados da Bia")
+
+
+class ContadoresVendedorTests(TestCase):
+    def setUp(self):
+        self.vendedor = criar_vendedor()
+
+    def _contadores(self, vendedor=None):
+        vendedor = vendedor or self.vendedor
+        vendedor.refresh_from_db()
+        return vendedor.total_produtos, vendedor.produtos_disponiveis
+
+    def test_criar_alterar_remover(self):
+        produto = Produto.objects.create(vendedor=self.vendedor, nome="Brigadeiro", preco=2)
+        Produto.objects.create(vendedor=self.vendedor, nome="Bolo", preco=5, status_disponivel=False)
+        self.assertEqual(self._contadores(), (2, 1))
+
+        produto.status_disponivel = False
+        produto.save()
+        self.assertEqual(self._contadores(), (2, 0))
+
+        outro = criar_vendedor(email="outro@example.com")
+        produto.vendedor = outro
+        produto.save()
+        self.assertEqual(self._contadores(), (1, 0))
+        self.assertEqual(self._contadores(outro), (1, 0))
+
+        produto.delete()
+        self.assertEqual(self._contadores(outro), (0, 0))
+        self.assertIsNotNone(outro.produtos_atualizados_em)
+
+    def test_save_do_vendedor_nao_sobrescreve(self):
+        carregado = Vendedor.objects.get(pk=self.vendedor.pk)
+        Produto.objects.create(vendedor=self.vendedor, nome="Brigadeiro", preco=2)
+        carregado.nome_venda = "Outro nome"
+        carregado.save()
+        self.assertEqual(self._contadores(), (1, 1))
+
+    def test_reconciliar(self):
+        Produto.objects.bulk_create([
+            Produto(vendedor=self.vendedor, nome=f"Produto {i}", preco=1, status_disponivel=i % 2 == 0)
+            for i in range(5)
+        ])
+        self.assertEqual(self._contadores(), (0, 0))
+        self.assertEqual(reconciliar(), 1)
+        self.assertEqual(self._contadores(), (5, 3))
+        self.assertEqual(reconciliar(), 0)
+
+    def test_lista_do_vendedor_nao_depende_do_contador(self):
+        vendedor = criar_vendedor(email="lista@example.com", senha=make_password("Senha123!"))
+        self.client.post("/login/", {"email": vendedor.email, "senha": "Senha123!"})
+        # bulk_create não passa pelos signals: contador fica em 0
+        Produto.objects.bulk_create([Produto(vendedor=vendedor, nome="Brigadeiro esquecido", preco=2)])
+        self.assertEqual(self._contadores(vendedor), (0, 0))
+        resposta = self.client.get("/produtos/")
+        self.assertContains(resposta, "Brigadeiro esquecido")
+        self.assertContains(resposta, 'id="acoes-form"')
+        self.assertNotContains(resposta, "Você ainda não cadastrou produtos.")
+
+    def test_etag_da_api_acompanha_os_contadores(self):
+        produto = Produto.objects.create(vendedor=self.vendedor, nome="Brigadeiro", preco=2)
+        for url in (f"/api/v1/vendedores/{self.vendedor.pk}/", "/api/v1/vendedores/"):
+            etag = self.client.get(url)["ETag"]
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            # contador muda por .update(), sem tocar no atualizado_em do vendedor
+            Produto.objects.create(vendedor=self.vendedor, nome=f"Bolo {url}", preco=5)
+            resposta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(resposta.status_code, 200)
+            etag = resposta["ETag"]
+        produto.delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class AcoesProdutosTests(TestCase):
+    """Ações em lote de listar_produtos: um update/delete, contadores e busca em dia."""
+
+    def setUp(self):
+        cache.clear()
+        self.vendedor = criar_vendedor(senha=make_password("Senha123!"))
+        self.client.post("/login/", {"email": self.vendedor.email, "senha": "Senha123!"})
+        self.produtos = [
+            Produto.objects.create(vendedor=self.vendedor, nome=f"Brigadeiro {i}", preco="10.00")
+            for i in range(4)
+        ]
+        self.outro = Produto.objects.create(
+            vendedor=criar_vendedor(email="outro@example.com"), nome="Brigadeiro alheio", preco="10.00"
+        )
+
+    def _acao(self, acao, produtos, **extra):
+        dados = {"acao": acao, "produtos": [p.pk for p in produtos], **extra}
+        return self.client.post("/produtos/acoes/", dados)
+
+    def test_indisponivel_em_um_update(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self._acao("indisponivel", self.produtos[:3])
+        updates = [q for q in ctx.captured_queries if q["sql"].startswith('UPDATE "appWeb_produto"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(Produto.objects.filter(vendedor=self.vendedor, status_disponivel=True).count(), 1)
+        self.vendedor.refresh_from_db()
+        self.assertEqual((self.vendedor.total_produtos, self.vendedor.produtos_disponiveis), (4, 1))
+
+    def test_reajuste_de_preco(self):
+        self._acao("preco", self.produtos[:2], percentual="-12.5")
+        precos = sorted(str(p) for p in Produto.objects.filter(vendedor=self.vendedor).values_list("preco", flat=True))
+        self.assertEqual(precos, ["10.00", "10.00", "8.75", "8.75"])
+
+        resposta = self._acao("preco", self.produtos[:2])
+        self.assertRedirects(resposta, "/produtos/", fetch_redirect_response=False)
+        self.assertEqual(Produto.objects.filter(preco="8.75").count(), 2)
+
+    def test_excluir_em_lote(self):
+        self._acao("excluir", self.produtos[:3])
+        self.assertEqual(list(Produto.objects.filter(vendedor=self.vendedor)), [self.produtos[3]])
+        self.vendedor.refresh_from_db()
+        self.assertEqual((self.vendedor.total_produtos, self.vendedor.produtos_disponiveis), (1, 1))
+        resultados = self.client.get("/cliente/", {"q": "brigadeiro"}).context["produtos"]
+        self.assertEqual({p.pk for p in resultados}, {self.produtos[3].pk, self.outro.pk})
+
+    def test_produto_de_outro_vendedor_nao_e_aceito(self):
+        self._acao("excluir", [self.produtos[0], self.outro])
+        self.assertEqual(Produto.objects.count(), 5)
+
+    def test_excluir_produto_so_por_post(self):
+        url = f"/produtos/{self.produtos[0].pk}/excluir/"
+        self.assertEqual(self.client.get(url).status_code, 405)
+        self.assertTrue(Produto.objects.filter(pk=self.produtos[0].pk).exists())
+        self.client.post(url)
+        self.assertFalse(Produto.objects.filter(pk=self.produtos[0].pk).exists())
+
+
+class LimiteLoginTests(TestCase):
+    """Falhas de login por e-mail/IP bloqueiam antes do check_password."""
+
+    def setUp(self):
+        cache.clear()
+        self.vendedor = criar_vendedor(senha=make_password("Senha123!"))
+
+    def _login(self, senha, email=None, ip="10.0.0.1"):
+        return self.client.post(
+            "/login/", {"email": email or self.vendedor.email, "senha": senha}, REMOTE_ADDR=ip
+        )
+
+    @override_settings(LOGIN_MAX_FALHAS_EMAIL=3)
+    def test_bloqueia_email_sem_calcular_hash(self):
+        for _ in range(3):
+            self.assertEqual(self._login("errada").status_code, 200)
+        with mock.patch("appWeb.views.check_password") as check:
+            resposta = self._login("Senha123!", ip="10.0.0.2")
+        self.assertEqual(resposta.status_code, 429)
+        check.assert_not_called()
+        # outro e-mail, mesmo IP, continua podendo
+        self.assertEqual(self._login("errada", email="outro@example.com").status_code, 200)
+
+    @override_settings(LOGIN_MAX_FALHAS_IP=3)
+    def test_bloqueia_ip(self):
+        for i in range(3):
+            self._login("errada", email=f"nao-existe-{i}@example.com")
+        self.assertEqual(self._login("Senha123!").status_code, 429)
+        self.assertRedirects(self._login("Senha123!", ip="10.0.0.9"), "/painel/", fetch_redirect_response=False)
+
+    @override_settings(LOGIN_JANELA_SEGUNDOS=60, LOGIN_MAX_FALHAS_EMAIL=2)
+    def test_janela_deslizante(self):
+        from .limite_login import bloqueado, registrar_falha
+        for segundo in (40, 50, 55):
+            registrar_falha("1.1.1.1", "a@example.com", agora=6000 + segundo)
+        self.assertTrue(bloqueado("2.2.2.2", "a@example.com", agora=6000 + 59))
+        # no período seguinte as falhas antigas ainda pesam, proporcionalmente
+        self.assertTrue(bloqueado("2.2.2.2", "a@example.com", agora=6060 + 10))
+        self.assertFalse(bloqueado("2.2.2.2", "a@example.com", agora=6060 + 40))
+
+    def test_atualizar_senhas_converte_texto_puro(self):
+        legado = criar_vendedor(email="legado@example.com", senha="senha-antiga")
+        antes = legado.atualizado_em
+        saida = StringIO()
+        call_command("atualizar_senhas", stdout=saida)
+        legado.refresh_from_db()
+        self.assertTrue(check_password("senha-antiga", legado.senha))
+        # o backup incremental filtra por atualizado_em
+        self.assertGreater(legado.atualizado_em, antes)
+        self.assertIn("1 convertidas", saida.getvalue())
+        self.assertRedirects(
+            self._login("senha-antiga", email=legado.email), "/painel/", fetch_redirect_response=False
+        )
+
+
+class UrlEmCacheStorageTests(TestCase):
+    """url() do storage de mídia sai do LRU/cache em vez do SDK."""
+
+    class StorageRemoto(Storage):
+        def __init__(self):
+            self.chamadas = 0
+
+        def url(self, name):
+            self.chamadas += 1
+            return f"https://cdn.example.com/{name}"
+
+        def delete(self, name):
+            pass
+
+    def setUp(self):
+        cache.clear()
+
+    def test_memoriza_e_esquece(self):
+        remoto = self.StorageRemoto()
+        storage = UrlEmCacheStorage(remoto)
+        for _ in range(3):
+            self.assertEqual(storage.url("produtos/a.png"), "https://cdn.example.com/produtos/a.png")
+        self.assertEqual(remoto.chamadas, 1)
+
+        # outro processo (LRU vazio) aproveita o cache compartilhado
+        self.assertEqual(UrlEmCacheStorage(remoto).url("produtos/a.png"), "https://cdn.example.com/produtos/a.png")
+        self.assertEqual(remoto.chamadas, 1)
+
+        storage.delete("produtos/a.png")
+        self.assertIsNone(storage.url_em_memoria("produtos/a.png"))
+        storage.url("produtos/a.png")
+        self.assertEqual(remoto.chamadas, 2)
+
+    @override_settings(STORAGE_URL_CACHE_TAMANHO=2)
+    def test_lru_limitado(self):
+        storage = UrlEmCacheStorage(self.StorageRemoto(), cache_compartilhado=False)
+        for nome in ("a", "b", "c"):
+            storage.url(nome)
+        self.assertEqual(list(storage._urls), ["b", "c"])
+
+    def test_cloudinary_configurado_com_erro_nao_e_engolido(self):
+        with mock.patch("appWeb.storage._storage", None), mock.patch.dict(os.environ, {"CLOUDINARY_URL": ""}):
+            self.assertIs(storage_de_verdade(storage_midia()), default_storage)
+        with (
+            mock.patch("appWeb.storage._storage", None),
+            override_settings(CLOUDINARY_STORAGE={"CLOUD_NAME": "x"}),
+            mock.patch.dict(sys.modules, {"cloudinary_storage.storage": None}),
+        ):
+            with self.assertRaises(ImportError):
+                storage_midia()
+
+
+class MiniaturasTests(MidiaTemporariaMixin, TestCase):
+    """Miniaturas geradas no upload (appWeb/imagens.py) e pelo gerar_miniaturas."""
+
+    def _foto(self, nome="foto.png", tamanho=(800, 600)):
+        # ruído: um PNG que não comprime, como uma foto de verdade
+        buffer = BytesIO()
+        Image.frombytes("RGB", tamanho, os.urandom(tamanho[0] * tamanho[1] * 3)).save(buffer, "PNG")
+        return SimpleUploadedFile(nome, buffer.getvalue(), content_type="image/png")
+
+    def assertMiniatura(self, original, miniatura):
+        with miniatura.open("rb") as arquivo, Image.open(arquivo) as img:
+            self.assertEqual(img.size, imagens.MINIATURA_TAMANHO)
+            self.assertEqual(img.format, imagens.MINIATURA_FORMATO)
+        self.assertTrue(miniatura.name.endswith("." + imagens.MINIATURA_EXTENSAO), miniatura.name)
+        self.assertLess(miniatura.size, original.size / 10)
+
+    def test_upload_pelo_produto_form(self):
+        form = ProdutoForm(
+            {"nome": "Bolo", "preco": "12.00", "descricao": "", "status_disponivel": "on"},
+            {"imagem": self._foto()},
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        produto = form.save(commit=False)
+        produto.vendedor = criar_vendedor()
+        produto.save()
+        produto.refresh_from_db()
+        self.assertMiniatura(produto.imagem, produto.imagem_miniatura)
+
+    def test_upload_pelo_perfil_do_vendedor(self):
+        vendedor = criar_vendedor()
+        dados = {
+            campo: getattr(vendedor, campo)
+            for campo in ("email", "nome_completo", "nome_venda", "celular", "local_principal_venda")
+        }
+        form = VendedorPerfilForm(dados, {"foto_perfil": self._foto("perfil.png", (600, 900))}, instance=vendedor)
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        vendedor.refresh_from_db()
+        self.assertMiniatura(vendedor.foto_perfil, vendedor.foto_perfil_miniatura)
+
+    def test_gerar_miniaturas_preenche_as_que_faltam(self):
+        produto = Produto.objects.create(vendedor=criar_vendedor(), nome="Bolo", preco=1, imagem=self._foto())
+        # como um produto de antes do pipeline de miniaturas
+        Produto.objects.filter(pk=produto.pk).update(imagem_miniatura=None)
+
+        saida = StringIO()
+        call_command("gerar_miniaturas", stdout=saida)
+        self.assertIn("Produto: 1 miniaturas geradas, 0 falhas", saida.getvalue())
+        produto.refresh_from_db()
+        self.assertMiniatura(produto.imagem, produto.imagem_miniatura)
+
+        # de novo: nada a fazer
+        arquivos = self._arquivos()
+        saida = StringIO()
+        call_command("gerar_miniaturas", stdout=saida)
+        self.assertIn("Produto: 0 miniaturas geradas, 0 falhas", saida.getvalue())
+        self.assertEqual(self._arquivos(), arquivos)
+        self.assertEqual(Produto.objects.get(pk=produto.pk).imagem_miniatura.name, produto.imagem_miniatura.name)
+
+
+class ServirMidiaTests(MidiaTemporariaMixin, TestCase):
+    """MEDIA_URL servido com ETag, Range e Cache-Control (appWeb/midia.py)."""
+
+    def setUp(self):
+        super().setUp()
+        os.makedirs(os.path.join(self.media, "produtos"))
+        for nome in ("produtos/foto.png", "produtos/" + "ab" * 32 + ".png"):
+            with open(os.path.join(self.media, nome), "wb") as f:
+                f.write(b"0123456789")
+
+    def _get(self, caminho, **headers):
+        resposta = self.client.get("/media/" + caminho, headers=headers)
+        corpo = b"".join(resposta.streaming_content) if resposta.streaming else resposta.content
+        resposta.close()
+        return resposta, corpo
+
+    def test_inteiro_e_revalidacao(self):
+        resposta, corpo = self._get("produtos/foto.png")
+        self.assertEqual((resposta.status_code, corpo), (200, b"0123456789"))
+        self.assertEqual(resposta["Content-Type"], "image/png")
+        self.assertIn("must-revalidate", resposta["Cache-Control"])
+
+        resposta, _ = self._get("produtos/foto.png", if_none_match=resposta["ETag"])
+        self.assertEqual(resposta.status_code, 304)
+
+    def test_nome_com_hash_e_imutavel(self):
+        resposta, _ = self._get("produtos/" + "ab" * 32 + ".png")
+        self.assertIn("immutable", resposta["Cache-Control"])
+
+    def test_range(self):
+        resposta, corpo = self._get("produtos/foto.png", range="bytes=2-5")
+        self.assertEqual((resposta.status_code, corpo), (206, b"2345"))
+        self.assertEqual(resposta["Content-Range"], "bytes 2-5/10")
+        self.assertEqual(self._get("produtos/foto.png", range="bytes=-3")[1], b"789")
+        self.assertEqual(self._get("produtos/foto.png", range="bytes=20-")[0].status_code, 416)
+        # If-Range com ETag velho: arquivo inteiro
+        resposta, corpo = self._get("produtos/foto.png", range="bytes=2-5", if_range='"velho"')
+        self.assertEqual((resposta.status_code, corpo), (200, b"0123456789"))
+
+    def test_fora_do_media_root(self):
+        self.assertEqual(self._get("../settings.py")[0].status_code, 404)
+        self.assertEqual(self._get("produtos/nao-existe.png")[0].status_code, 404)
+
+
+class ConteudoEnderecadoStorageTests(MidiaTemporariaMixin, TestCase):
+    """Uploads iguais viram um arquivo só, com contagem de referências."""
+
+    def setUp(self):
+        super().setUp()
+        self.vendedor = criar_vendedor()
+
+    def test_mesma_foto_em_dois_produtos(self):
+        a = Produto.objects.create(vendedor=self.vendedor, nome="A", preco=1, imagem=self._png("a.png"))
+        b = Produto.objects.create(vendedor=self.vendedor, nome="B", preco=1, imagem=self._png("outro-nome.PNG"))
+        Produto.objects.create(vendedor=self.vendedor, nome="C", preco=1, imagem=self._png("c.png", "blue"))
+
+        self.assertEqual(a.imagem.name, b.imagem.name)
+        self.assertRegex(a.imagem.name, r"^midia/[0-9a-f]{2}/[0-9a-f]{64}\.png$")
+        # 2 originais + 2 miniaturas
+        self.assertEqual(len(self._arquivos()), 4)
+        self.assertEqual(ArquivoMidia.objects.get(nome_storage=a.imagem.name).referencias, 2)
+
+        storage = a.imagem.storage
+        storage.delete(a.imagem.name)
+        self.assertTrue(storage.exists(b.imagem.name))
+        storage.delete(b.imagem.name)
+        self.assertFalse(storage.exists(b.imagem.name))
+        self.assertFalse(ArquivoMidia.objects.filter(nome_storage=b.imagem.name).exists())
+
+    def test_criar_produto_com_galeria(self):
+        """As threads da galeria só enviam bytes: nenhuma abre conexão com o banco."""
+        self.vendedor.senha = make_password("Senha123!")
+        self.vendedor.save()
+        self.client.post("/login/", {"email": self.vendedor.email, "senha": "Senha123!"})
+        conexoes = []
+
+        def anotar(sender, connection, **kwargs):
+            conexoes.append(connection)
+
+        connection_created.connect(anotar)
+        self.addCleanup(connection_created.disconnect, anotar)
+        resposta = self.client.post("/produtos/novo/", {
+            "nome": "Bolo", "preco": "12.00", "descricao": "", "status_disponivel": "on",
+            "imagem": self._png("bolo.png"),
+            # igual à principal, repetida e uma diferente
+            "imagens_catalogo": [self._png("g1.png"), self._png("g2.png"), self._png("g3.png", "blue")],
+        })
+
+        self.assertRedirects(resposta, "/produtos/", fetch_redirect_response=False)
+        self.assertEqual(conexoes, [])
+        produto = Produto.objects.get(nome="Bolo")
+        galeria = list(produto.imagens_catalogo.order_by("id"))
+        self.assertEqual(len(galeria), 3)
+        self.assertEqual({g.imagem.name for g in galeria[:2]}, {produto.imagem.name})
+        self.assertEqual(ArquivoMidia.objects.get(nome_storage=produto.imagem.name).referencias, 3)
+        self.assertEqual(ArquivoMidia.objects.get(nome_storage=produto.imagem_miniatura.name).referencias, 3)
+        # 2 originais + 2 miniaturas
+        self.assertEqual(len(self._arquivos()), 4)
+
+    def test_nome_antigo_vai_direto_para_o_storage(self):
+        storage = Produto._meta.get_field("imagem").storage
+        os.makedirs(os.path.join(self.media, "produtos"))
+        with open(os.path.join(self.media, "produtos", "antiga.png"), "wb") as f:
+            f.write(b"x")
+        storage.delete("produtos/antiga.png")
+        self.assertEqual(self._arquivos(), [])
+
+    def _referencias(self, nome):
+        linha = ArquivoMidia.objects.filter(nome_storage=nome).first()
+        return linha and linha.referencias
+
+    def test_excluir_produto_tira_referencia(self):
+        a = Produto.objects.create(vendedor=self.vendedor, nome="A", preco=1, imagem=self._png("a.png"))
+        b = Produto.objects.create(vendedor=self.vendedor, nome="B", preco=1, imagem=self._png("b.png"))
+        nomes = [a.imagem.name, a.imagem_miniatura.name]
+        self.assertEqual(self._referencias(a.imagem.name), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            a.delete()
+        self.assertEqual([self._referencias(nome) for nome in nomes], [1, 1])
+        self.assertEqual(len(self._arquivos()), 2)
+
+        # desfeito: a contagem volta e o arquivo fica
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            Produto.objects.get(pk=b.pk).delete()
+            raise RuntimeError
+        self.assertEqual([self._referencias(nome) for nome in nomes], [1, 1])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.vendedor.delete()
+        self.assertEqual(self._arquivos(), [])
+        self.assertFalse(ArquivoMidia.objects.exists())
+
+    def test_trocar_imagem_tira_referencia_da_antiga(self):
+        produto = Produto.objects.create(vendedor=self.vendedor, nome="A", preco=1, imagem=self._png("a.png"))
+        antigos = [produto.imagem.name, produto.imagem_miniatura.name]
+
+        # o mesmo conteúdo de novo: mesmo nome, a contagem não cresce
+        produto.imagem = self._png("de-novo.png")
+        with self.captureOnCommitCallbacks(execute=True):
+            produto.save()
+        self.assertEqual([self._referencias(nome) for nome in antigos], [1, 1])
+
+        produto.imagem = self._png("b.png", "blue")
+        with self.captureOnCommitCallbacks(execute=True):
+            produto.save()
+        self.assertEqual(
+            self._arquivos(), sorted([produto.imagem.name, produto.imagem_miniatura.name])
+        )
+        self.assertFalse(ArquivoMidia.objects.filter(nome_storage__in=antigos).exists())
+
+        # save de outros campos não lê nem solta as imagens
+        with self.assertNumQueries(0):
+            limpeza_midia.guardar_arquivos_anteriores(produto, update_fields={"preco"})
+
+    def test_exclusao_em_lote_tira_referencias(self):
+        produtos = [
+            Produto.objects.create(vendedor=self.vendedor, nome=nome, preco=1, imagem=self._png(f"{nome}.png"))
+            for nome in ("A", "B")
+        ]
+        galeria.adicionar_imagens(produtos[0], [self._png("g.png", "blue")])
+        with self.captureOnCommitCallbacks(execute=True):
+            lote_produtos.aplicar(self.vendedor, [produtos[0].pk], "excluir")
+        self.assertEqual(self._referencias(produtos[1].imagem.name), 1)
+        self.assertEqual(len(self._arquivos()), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            lote_produtos.aplicar(self.vendedor, [produtos[1].pk], "excluir")
+        self.assertEqual(self._arquivos(), [])
+        self.assertFalse(ArquivoMidia.objects.exists())
+
+    def test_arquivo_usado_sem_contagem_fica(self):
+        produto = Produto.objects.create(vendedor=self.vendedor, nome="A", preco=1, imagem=self._png("a.png"))
+        # nome copiado sem save do storage (como no restore): não soma referência
+        copia = Produto.objects.create(vendedor=self.vendedor, nome="Cópia", preco=1)
+        Produto.objects.filter(pk=copia.pk).update(imagem=produto.imagem.name)
+        with self.captureOnCommitCallbacks(execute=True):
+            produto.delete()
+        self.assertEqual(self._referencias(produto.imagem.name), 0)
+        self.assertIn(produto.imagem.name, self._arquivos())
+
+
+class GaleriaTests(MidiaTemporariaMixin, TestCase):
+    """Galeria do produto: upload em paralelo, tudo ou nada, sem arquivos órfãos."""
+
+    def setUp(self):
+        super().setUp()
+        self.vendedor = criar_vendedor(senha=make_password("Senha123!"))
+        self.client.post("/login/", {"email": self.vendedor.email, "senha": "Senha123!"})
+
+    def _dados(self, **extra):
+        return {"nome": "Bolo", "preco": "12.00", "descricao": "", "status_disponivel": "on", **extra}
+
+    def test_upload_da_galeria(self):
+        cores = ["red", "green", "blue"]
+        resposta = self.client.post("/produtos/novo/", self._dados(
+            imagens_catalogo=[self._png(f"{cor}.png", cor) for cor in cores],
+        ))
+        self.assertRedirects(resposta, "/produtos/", fetch_redirect_response=False)
+        imagens = ImagemProduto.objects.filter(produto__nome="Bolo")
+        self.assertEqual(imagens.count(), 3)
+        self.assertFalse(imagens.filter(imagem_miniatura="").exists())
+        # original + miniatura de cada uma
+        self.assertEqual(len(self._arquivos()), 6)
+
+    def test_falha_na_galeria_apaga_o_que_subiu(self):
+        transferir = ConteudoEnderecadoStorage.transferir
+
+        def falhar_nas_threads(storage, nome, content, max_length=None):
+            if threading.current_thread() is not threading.main_thread():
+                raise OSError("storage fora do ar")
+            return transferir(storage, nome, content, max_length)
+
+        with mock.patch.object(ConteudoEnderecadoStorage, "transferir", falhar_nas_threads):
+            resposta = self.client.post("/produtos/novo/", self._dados(
+                imagem=self._png("principal.png", "white"),
+                imagens_catalogo=[self._png("a.png"), self._png("b.png", "blue")],
+            ))
+        self.assertEqual(resposta.status_code, 200)
+        self.assertFalse(Produto.objects.exists())
+        # a principal e a miniatura dela subiram antes da galeria falhar
+        self.assertEqual(self._arquivos(), [])
+        self.assertFalse(ArquivoMidia.objects.exists())
+
+    def test_editar_adiciona_e_remove(self):
+        produto = Produto.objects.create(vendedor=self.vendedor, nome="Bolo", preco=12)
+        manter, remover = galeria.adicionar_imagens(produto, [self._png("a.png"), self._png("b.png", "blue")])
+        remover.refresh_from_db()
+        arquivos_removida = {remover.imagem.name, remover.imagem_miniatura.name}
+
+        with self.captureOnCommitCallbacks(execute=True):
+            resposta = self.client.post(f"/produtos/{produto.pk}/editar/", self._dados(
+                remover_imagens=[remover.pk],
+                imagens_catalogo=[self._png("c.png", "green")],
+            ))
+        self.assertRedirects(resposta, "/produtos/", fetch_redirect_response=False)
+        imagens = produto.imagens_catalogo.all()
+        self.assertEqual(imagens.count(), 2)
+        self.assertIn(manter, imagens)
+        self.assertNotIn(remover.pk, imagens.values_list("pk", flat=True))
+        self.assertTrue(arquivos_removida.isdisjoint(self._arquivos()))
+        self.assertEqual(len(self._arquivos()), 4)
+
+    def test_remover_mantem_arquivo_usado_por_outra_imagem(self):
+        produto = Produto.objects.create(vendedor=self.vendedor, nome="Bolo", preco=12)
+        a, b = galeria.adicionar_imagens(produto, [self._png("a.png"), self._png("igual.png")])
+        with self.captureOnCommitCallbacks(execute=True):
+            galeria.remover_imagens(produto, [a.pk])
+        b.refresh_from_db()
+        self.assertTrue(b.imagem.storage.exists(b.imagem.name))
+
+    @override_settings(GALERIA_UPLOAD_WORKERS=2)
+    def test_threads_limitadas(self):
+        produto = Produto.objects.create(vendedor=self.vendedor, nome="Bolo", preco=12)
+        with mock.patch.object(galeria, "ThreadPoolExecutor", wraps=galeria.ThreadPoolExecutor) as pool:
+            galeria.adicionar_imagens(produto, [self._png(f"{i}.png", (i, 0, 0)) for i in range(5)])
+        pool.assert_called_once_with(max_workers=2)
+        self.assertEqual(produto.imagens_catalogo.count(), 5)
+
+
+class LimparMidiaTests(MidiaTemporariaMixin, TestCase):
+    """manage.py limpar_midia apaga só os arquivos sem referência."""
+
+    def setUp(self):
+        super().setUp()
+        self.vendedor = criar_vendedor()
+
+    def _envelhecer(self):
+        for raiz, _, nomes in os.walk(self.media):
+            for nome in nomes:
+                os.utime(os.path.join(raiz, nome), (0, 0))
+
+    def test_apaga_orfaos(self):
+        fica = Produto.objects.create(vendedor=self.vendedor, nome="Fica", preco=1, imagem=self._png(cor="red"))
+        sai = Produto.objects.create(vendedor=self.vendedor, nome="Sai", preco=1, imagem=self._png(cor="blue"))
+        orfaos = [sai.imagem.name, sai.imagem_miniatura.name]
+        sai.delete()
+        os.makedirs(os.path.join(self.media, "outra-pasta"))
+        open(os.path.join(self.media, "outra-pasta", "nao-mexer.txt"), "w").close()
+
+        # arquivos novos ficam (podem ser de um upload em andamento)
+        call_command("limpar_midia", stdout=StringIO())
+        self.assertTrue(all(fica.imagem.storage.exists(nome) for nome in orfaos))
+
+        self._envelhecer()
+        saida = StringIO()
+        call_command("limpar_midia", "--dry-run", stdout=saida)
+        self.assertIn("2 órfãos", saida.getvalue())
+        self.assertTrue(all(fica.imagem.storage.exists(nome) for nome in orfaos))
+
+        call_command("limpar_midia", "--workers", "2", stdout=StringIO())
+        self.assertFalse(any(fica.imagem.storage.exists(nome) for nome in orfaos))
+        self.assertTrue(fica.imagem.storage.exists(fica.imagem.name))
+        self.assertTrue(fica.imagem.storage.exists(fica.imagem_miniatura.name))
+        self.assertTrue(os.path.exists(os.path.join(self.media, "outra-pasta", "nao-mexer.txt")))
+        self.assertFalse(ArquivoMidia.objects.filter(nome_storage__in=orfaos).exists())
+
+
+class PilhaAsgiTests(TestCase):
+    """
+    Estáticos e páginas pela pilha ASGI (AsyncClient), como sob o uvicorn. O
+    WhiteNoiseMiddleware async usa atributos internos do WhiteNoise
+    (``autorefresh``, ``files``, ``find_file``, ``serve``): uma versão nova
+    que os mude quebra aqui.
+    """
+
+    def setUp(self):
+        self.estaticos = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.estaticos)
+        os.makedirs(os.path.join(self.estaticos, "css"))
+        with open(os.path.join(self.estaticos, "css", "app.css"), "w") as f:
+            f.write("body { color: red; }")
+
+    async def _estatico(self):
+        resposta = await self.async_client.get("/static/css/app.css")
+        self.assertEqual(resposta.status_code, 200)
+        self.addCleanup(resposta.close)
+        self.assertEqual(b"".join(resposta.streaming_content), b"body { color: red; }")
+        self.assertEqual(resposta["Content-Type"], "text/css; charset=\"utf-8\"")
+
+    async def test_estatico_e_pagina(self):
+        with override_settings(STATIC_ROOT=self.estaticos, WHITENOISE_AUTOREFRESH=False):
+            with mock.patch.object(middleware.WhiteNoiseMiddleware, "find_file", side_effect=AssertionError):
+                # sem autorefresh o arquivo sai do dict carregado no início
+                await self._estatico()
+            vendedor = await sync_to_async(criar_vendedor)()
+            await Produto.objects.acreate(vendedor=vendedor, nome="Brigadeiro", preco=1)
+            resposta = await self.async_client.get("/cliente/")
+            self.assertContains(resposta, "Brigadeiro")
+
+    async def test_estatico_com_autorefresh(self):
+        with override_settings(STATIC_ROOT=self.estaticos, WHITENOISE_AUTOREFRESH=True):
+            await self._estatico()
+
+
+class MetricasTests(TestCase):
+    """MetricasMiddleware, o endpoint /metricas/ e a publicação por processo."""
+
+    def setUp(self):
+        cache.clear()
+        metricas.limpar()
+        self.addCleanup(metricas.limpar)
+
+    def test_server_timing_e_amostra_por_view(self):
+        vendedor = criar_vendedor(status_disponivel=True)
+        resposta = self.client.get(f"/cliente/vendedor/{vendedor.pk}/")
+        self.assertRegex(resposta["Server-Timing"], r'^db;dur=[\d.]+;desc="[1-9]\d* queries", tpl;dur=')
+        self.assertEqual(len(metricas.todas_amostras()["detalhe_vendedor_cliente"]), 1)
+
+    @override_settings(METRICAS_TOKEN="segredo")
+    def test_endpoint_pede_o_token(self):
+        self.assertEqual(self.client.get("/metricas/").status_code, 404)
+        self.assertEqual(self.client.get("/metricas/", HTTP_X_METRICAS_TOKEN="errado").status_code, 404)
+        self.assertEqual(self.client.get("/metricas/", HTTP_X_METRICAS_TOKEN="segredo").status_code, 200)
+
+    def test_cada_processo_na_sua_vaga(self):
+        for pid, queries in ((111, 1), (222, 2), (111, 3)):
+            with mock.patch.object(metricas.os, "getpid", return_value=pid):
+                metricas._publicar({"home": [(queries, 1.0, 0.0, 0.0, 2.0)]})
+        self.assertEqual(sorted(a[0] for a in metricas.todas_amostras()["home"]), [2, 3])
+        self.assertEqual(metricas._pids(), {111, 222})
+        metricas.limpar()
+        self.assertEqual(metricas.todas_amostras(), {})
+
+    @override_settings(METRICAS_ATIVAS=False)
+    def test_desligado_nao_instala_ganchos(self):
+        with mock.patch.object(middleware, "_instalar_ganchos") as instalar:
+            with self.assertRaises(MiddlewareNotUsed):
+                middleware.MetricasMiddleware(lambda request: None)
+        instalar.assert_not_called()
+
+
+class CargaTests(TestCase):
+    """Leitura incremental das fixtures e carga em lotes com bulk_create."""
+
+    def setUp(self):
+        self.pasta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.pasta)
+
+    def _objetos(self):
+        vendedor = {
+            "email": "v@example.com", "senha": "x", "nome_completo": "Vendedora", "nome_venda": "Doces",
+            "celular": "(11) 99999-0000", "local_principal_venda": "Bandejão", "status_disponivel": True,
+            "criado_em": "2020-01-02T03:04:05Z", "atualizado_em": "2021-01-02T03:04:05Z",
+        }
+        objetos = [{"model": "appWeb.vendedor", "pk": 7, "fields": vendedor}]
+        for pk in range(10, 15):
+            objetos.append({"model": "appWeb.produto", "pk": pk, "fields": {
+                "vendedor": 7, "nome": f"Bolo {pk} " + "x" * 40, "preco": "5.00",
+                "criado_em": "2020-05-06T07:08:09Z", "atualizado_em": "2022-05-06T07:08:09Z",
+            }})
+        objetos.append({"model": "auth.user", "pk": 1, "fields": {"username": "admin"}})
+        # pai de novo depois dos filhos, no mesmo lote
+        objetos.append({"model": "appWeb.vendedor", "pk": 8, "fields": {**vendedor, "email": "w@example.com"}})
+        objetos.append({"model": "appWeb.produto", "pk": 20, "fields": {
+            "vendedor": 8, "nome": "Torta", "preco": "9.00",
+        }})
+        return objetos
+
+    def _escrever(self, nome, conteudo):
+        caminho = os.path.join(self.pasta, nome)
+        with open(caminho, "w", encoding="utf-8") as f:
+            f.write(conteudo)
+        return caminho
+
+    def test_leitura_com_objetos_cortados_entre_blocos(self):
+        objetos = self._objetos()
+        array = self._escrever("dump.json", json.dumps(objetos, indent=2))
+        jsonl = self._escrever("dump.jsonl", "\n".join(json.dumps(o) for o in objetos) + "\n")
+        # blocos menores que um objeto: todos atravessam a divisa
+        with mock.patch("appWeb.carga._TAMANHO_LEITURA", 7):
+            self.assertEqual(list(ler_objetos(array)), objetos)
+            self.assertEqual(list(ler_objetos(jsonl)), objetos)
+
+    def test_carga_mantem_pks_datas_e_conta_ignorados(self):
+        contagem = carregar_objetos(self._objetos(), lote=2)
+
+        self.assertEqual(contagem, {
+            "appweb.vendedor": 2, "appweb.produto": 6, "appweb.imagemproduto": 0, "ignorados": 1,
+        })
+        vendedor = Vendedor.objects.get(pk=7)
+        self.assertEqual(vendedor.atualizado_em.isoformat(), "2021-01-02T03:04:05+00:00")
+        self.assertEqual(vendedor.criado_em.isoformat(), "2020-01-02T03:04:05+00:00")
+        self.assertEqual(Produto.objects.get(pk=10).atualizado_em.year, 2022)
+        self.assertEqual(Produto.objects.get(pk=20).vendedor_id, 8)
+        # finalizar_carga: contadores e busca em dia
+        self.assertEqual(vendedor.total_produtos, 5)
+        self.assertEqual([p.pk for p in buscar_produtos("torta", 0, 10)], [20])
+        # o auto_now dos models continua ligado
+        produto = Produto.objects.get(pk=20)
+        produto.save()
+        self.assertGreater(produto.atualizado_em.year, 2022)
+
+
+class BackupTests(MidiaTemporariaMixin, TestCase):
+    """Completo + incremental, restaurados num banco e num storage vazios."""
+
+    def setUp(self):
+        super().setUp()
+        self.destino = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.destino)
+
+    def test_completo_incremental_e_restauracao(self):
+        vendedor = criar_vendedor(senha="senha-antiga")
+        bolo = Produto.objects.create(vendedor=vendedor, nome="Bolo", preco=10, imagem=self._png(cor="red"))
+        fazer_backup(self.destino)
+
+        bolo.preco = 12
+        bolo.save()
+        torta = Produto.objects.create(vendedor=vendedor, nome="Torta", preco=20, imagem=self._png(cor="blue"))
+        # .update() por fora do auto_now
+        call_command("atualizar_senhas", stdout=StringIO())
+        _, contagem, _ = fazer_backup(self.destino, incremental=True)
+        self.assertEqual(contagem, {"appWeb.vendedor": 1, "appWeb.produto": 2, "appWeb.imagemproduto": 0})
+
+        esperado = {
+            p.pk: (p.nome, p.preco, p.imagem.name, p.imagem.read())
+            for p in Produto.objects.order_by("pk")
+        }
+        senha = Vendedor.objects.get().senha
+        Vendedor.objects.all().delete()
+        ArquivoMidia.objects.all().delete()
+        shutil.rmtree(self.media)
+        cache.set("limite_login:teste", 1)
+
+        restaurar(listar_backups(self.destino))
+
+        self.assertEqual(Vendedor.objects.get().senha, senha)
+        self.assertEqual(
+            {p.pk: (p.nome, p.preco, p.imagem.name, p.imagem.read()) for p in Produto.objects.order_by("pk")},
+            esperado,
+        )
+        self.assertEqual(Vendedor.objects.get().total_produtos, 2)
+        # só o cache do catálogo é invalidado
+        self.assertEqual(cache.get("limite_login:teste"), 1)
+        self.assertContains(self.client.get(f"/cliente/produto/{torta.pk}/"), "Torta")
@@ -1,5 +1,11 @@
-from django.urls import path
-from . import views
+from django.urls import include, path
+from rest_framework.routers import DefaultRouter
+
+from . import api, views
+
+router_v1 = DefaultRouter()
+router_v1.register("produtos", api.ProdutoViewSet, basename="api-produto")
+router_v1.register("vendedores", api.VendedorViewSet, basename="api-vendedor")
 
 urlpatterns = [
     path("", views.pagina_inicial, name="pagina_inicial"),
@@ -17,13 +23,21 @@ urlpatterns = [
 
     path("produtos/", views.listar_produtos, name="listar_produtos"),
     path("produtos/novo/", views.criar_produto, name="criar_produto"),
+    path("produtos/acoes/", views.acoes_produtos, name="acoes_produtos"),
     path("produtos/<int:produto_id>/editar/", views.editar_produto, name="editar_produto"),
     path("produtos/<int:produto_id>/excluir/", views.excluir_produto, name="excluir_produto"),
 
 
      # COMPRADOR
     path("cliente/", views.home_cliente, name="home_cliente"),
+    path("cliente/produtos/mais/", views.home_cliente_mais, name="home_cliente_mais"),
     path("cliente/info-vendedores/", views.info_vendedores, name="info_vendedores"),
     path("cliente/produto/<int:produto_id>/", views.detalhe_produto_cliente, name="detalhe_produto_cliente"),
     path("cliente/vendedor/<int:vendedor_id>/", views.detalhe_vendedor_cliente, name="detalhe_vendedor_cliente"),
+
+    # API (somente leitura, app mobile)
+    path("api/v1/", include(router_v1.urls)),
+
+    # MÉTRICAS
+    path("metricas/", views.metricas_resumo, name="metricas"),
 ]
@@ -1,18 +1,28 @@
 import os
 from django.shortcuts import render
-from django.shortcuts import render, redirect, get_object_or_404
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
 from django.contrib import messages
 from django.contrib.auth import logout as django_logout
 from django.contrib.auth.hashers import check_password, make_password
-from django.db.models import Q
 from django.urls import reverse
 from django.core import signing
-from django.core.mail import send_mail
+from django.utils.crypto import constant_time_compare
 from django.conf import settings
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.http import Http404, HttpResponse, JsonResponse
+from django.views.decorators.http import require_POST
 
 from .models import Vendedor, Produto
 from .models import Vendedor, Produto, ImagemProduto
-from .forms import VendedorForm, ProdutoForm, AlterarSenhaVendedorForm, VendedorPerfilForm
+from .forms import VendedorForm, ProdutoForm, AlterarSenhaVendedorForm, VendedorPerfilForm, AcoesProdutosForm
+from . import cache_catalogo, galeria, limite_login, lote_produtos, metricas
+from .busca import buscar_produtos
+from .emails import enfileirar_email
+from .imagens import arquivo_card, resolver_urls
+from .paginacao import apaginar_por_cursor, paginar_busca
+from .sessao import vendedor_obrigatorio
+from .storage import apagar_envios_se_falhar
 
 def home(request):
     return render(request, 'appWeb/index.html')
@@ -33,6 +43,14 @@ def login_vendedor(request):
                 pass
         email = request.POST.get("email")
         senha = request.POST.get("senha")
+
+        # limite de falhas por IP e por e-mail: recusa antes de consultar o
+        # banco e de rodar o hash da senha (appWeb/limite_login.py)
+        ip = limite_login.ip_da_requisicao(request)
+        if limite_login.bloqueado(ip, email):
+            messages.error(request, "Muitas tentativas de login. Aguarde alguns minutos e tente novamente.")
+            return render(request, "appWeb/vendedor/login.html", {"email": email}, status=429)
+
         vendedor = Vendedor.objects.filter(email=email).first()
         authenticated = False
         if vendedor:
@@ -46,12 +64,14 @@ def login_vendedor(request):
 
             # Migration helper: if the stored senha appears to be plain and matches,
             # re-hash it and persist so future logins use secure hashing.
+            # (`manage.py atualizar_senhas` does this in batches beforehand.)
             if not authenticated and vendedor.senha and vendedor.senha == senha:
                 vendedor.senha = make_password(senha)
                 vendedor.save()
                 authenticated = True
 
         if authenticated:
+            limite_login.limpar_email(email)
             if not getattr(vendedor, "is_active", True):
                 messages.error(request, "Conta não confirmada. Verifique seu e-mail.")
                 return redirect("login")
@@ -59,6 +79,7 @@ def login_vendedor(request):
             request.session.modified = True
             return redirect("painel_vendedor")
 
+        limite_login.registrar_falha(ip, email)
         # fallback: show error message via Django messages framework
         messages.error(request, "E-mail ou senha inválidos.")
         # Render the login template with the submitted email so the user doesn't need to retype it
@@ -96,11 +117,8 @@ def cadastro_vendedor(request):
                 f"{link}\n\n"
                 "Se você não se cadastrou, ignore esta mensagem.\n"
             )
-            from_email = getattr(settings, "DEFAULT_FROM_EMAIL", "no-reply@localhost")
-            try:
-                send_mail(subject, message, from_email, [vendedor.email])
-            except Exception:
-                pass
+            # só enfileira; o worker (manage.py enviar_emails) faz o envio
+            enfileirar_email(subject, message, [vendedor.email])
 
             messages.success(request, "Conta criada! Verifique seu e-mail para ativar a conta.")
             return redirect("login")
@@ -110,9 +128,9 @@ def cadastro_vendedor(request):
     return render(request, "appWeb/vendedor/cadastro.html", {"form": form})
 
 
+@vendedor_obrigatorio
 def painel_vendedor(request):
-    vendedor_id = request.session.get("vendedor_id")
-    vendedor = get_object_or_404(Vendedor, id=vendedor_id)
+    vendedor = request.vendedor
 
     produtos = vendedor.produtos.all()
 
@@ -121,9 +139,9 @@ def painel_vendedor(request):
         "produtos": produtos
     })
 
+@vendedor_obrigatorio
 def editar_perfil(request):
-    vendedor_id = request.session.get("vendedor_id")
-    vendedor = get_object_or_404(Vendedor, id=vendedor_id)
+    vendedor = request.vendedor
 
     if request.method == "POST":
         form = VendedorPerfilForm(request.POST, request.FILES, instance=vendedor)
@@ -158,13 +176,9 @@ def editar_perfil(request):
         {"form": form, "vendedor": vendedor},
     )
 
+@vendedor_obrigatorio
 def alterar_senha_vendedor(request):
-    vendedor_id = request.session.get("vendedor_id")
-    if not vendedor_id:
-        messages.error(request, "Você precisa estar logado para alterar a senha.")
-        return redirect("login")
-
-    vendedor = get_object_or_404(Vendedor, id=vendedor_id)
+    vendedor = request.vendedor
 
     if request.method == "POST":
         form = AlterarSenhaVendedorForm(request.POST)
@@ -203,31 +217,35 @@ def alterar_senha_vendedor(request):
     )
 
 
+@vendedor_obrigatorio
 def listar_produtos(request):
-    vendedor_id = request.session.get("vendedor_id")
-    vendedor = get_object_or_404(Vendedor, id=vendedor_id)
+    vendedor = request.vendedor
 
     produtos = vendedor.produtos.all()
 
-    return render(request, "appWeb/produto/listar.html", {"produtos": produtos})
+    return render(request, "appWeb/produto/listar.html", {"vendedor": vendedor, "produtos": produtos})
 
 
+@vendedor_obrigatorio
 def criar_produto(request):
-    vendedor_id = request.session.get("vendedor_id")
-    vendedor = get_object_or_404(Vendedor, id=vendedor_id)
+    vendedor = request.vendedor
 
     if request.method == "POST":
         form = ProdutoForm(request.POST, request.FILES)
 
         if form.is_valid():
-            produto = form.save(commit=False)
-            produto.vendedor = vendedor
-            produto.save()
-
-            # IMAGENS DE CATÁLOGO (várias)
-            imagens_catalogo = request.FILES.getlist("imagens_catalogo")
-            for img in imagens_catalogo:
-                ImagemProduto.objects.create(produto=produto, imagem=img)
+            try:
+                # se falhar, o que já subiu sai do storage (o rollback só desfaz as linhas)
+                with apagar_envios_se_falhar(), transaction.atomic():
+                    produto = form.save(commit=False)
+                    produto.vendedor = vendedor
+                    produto.save()
+
+                    # IMAGENS DE CATÁLOGO (várias), enviadas em paralelo
+                    galeria.adicionar_imagens(produto, request.FILES.getlist("imagens_catalogo"))
+            except galeria.ErroUploadGaleria:
+                messages.error(request, "Não foi possível enviar as imagens do catálogo. Tente novamente.")
+                return render(request, "appWeb/produto/criar.html", {"form": form})
 
             messages.success(request, "Produto cadastrado!")
             return redirect("listar_produtos")
@@ -238,17 +256,32 @@ def criar_produto(request):
     return render(request, "appWeb/produto/criar.html", {"form": form})
 
 
+@vendedor_obrigatorio
 def editar_produto(request, produto_id):
-    vendedor_id = request.session.get("vendedor_id")
-    vendedor = get_object_or_404(Vendedor, id=vendedor_id)
+    vendedor = request.vendedor
 
-    produto = get_object_or_404(Produto, id=produto_id, vendedor=vendedor)
+    produto = get_object_or_404(
+        Produto.objects.prefetch_related("imagens_catalogo"),
+        id=produto_id,
+        vendedor=vendedor,
+    )
 
     if request.method == "POST":
         form = ProdutoForm(request.POST, request.FILES, instance=produto)
 
         if form.is_valid():
-            form.save()
+            try:
+                # se falhar, o que já subiu sai do storage (o rollback só desfaz as linhas)
+                with apagar_envios_se_falhar(), transaction.atomic():
+                    form.save()
+
+                    # galeria: remove as marcadas e adiciona as novas
+                    galeria.remover_imagens(produto, request.POST.getlist("remover_imagens"))
+                    galeria.adicionar_imagens(produto, request.FILES.getlist("imagens_catalogo"))
+            except galeria.ErroUploadGaleria:
+                messages.error(request, "Não foi possível enviar as imagens do catálogo. Tente novamente.")
+                return render(request, "appWeb/produto/editar.html", {"form": form, "produto": produto})
+
             messages.success(request, "Produto atualizado!")
             return redirect("listar_produtos")
 
@@ -258,9 +291,10 @@ def editar_produto(request, produto_id):
     return render(request, "appWeb/produto/editar.html", {"form": form, "produto": produto})
 
 
+@require_POST
+@vendedor_obrigatorio
 def excluir_produto(request, produto_id):
-    vendedor_id = request.session.get("vendedor_id")
-    vendedor = get_object_or_404(Vendedor, id=vendedor_id)
+    vendedor = request.vendedor
 
     produto = get_object_or_404(Produto, id=produto_id, vendedor=vendedor)
 
@@ -268,6 +302,42 @@ def excluir_produto(request, produto_id):
     messages.success(request, "Produto removido!")
     return redirect("listar_produtos")
 
+
+@require_POST
+@vendedor_obrigatorio
+def acoes_produtos(request):
+    """
+    Ação em lote sobre os produtos marcados na listagem (disponível,
+    indisponível, reajuste de preço ou exclusão), ver appWeb/lote_produtos.py.
+    """
+    vendedor = request.vendedor
+
+    form = AcoesProdutosForm(request.POST, vendedor=vendedor)
+    if not form.is_valid():
+        if "produtos" in form.errors:
+            messages.error(request, "Selecione ao menos um produto.")
+        else:
+            messages.error(request, next(iter(form.errors.values()))[0])
+        return redirect("listar_produtos")
+
+    acao = form.cleaned_data["acao"]
+    try:
+        afetados = lote_produtos.aplicar(
+            vendedor,
+            [produto.pk for produto in form.cleaned_data["produtos"]],
+            acao,
+            form.cleaned_data["percentual"],
+        )
+    except lote_produtos.ErroAcaoEmLote as e:
+        messages.error(request, str(e))
+        return redirect("listar_produtos")
+
+    if acao == "excluir":
+        messages.success(request, f"{afetados} produto(s) removido(s)!")
+    else:
+        messages.success(request, f"{afetados} produto(s) atualizado(s)!")
+    return redirect("listar_produtos")
+
 # ==========================
 # TRILHA INICIAL
 # ==========================
@@ -280,29 +350,56 @@ def pagina_inicial(request):
 # ==========================
 # TRILHA DO COMPRADOR (visitante)
 
-def home_cliente(request):
+async def _catalogo_cliente(request):
     """
-    Lista de produtos para o comprador (sem login).
-    Permite busca simples por nome do produto ou nome do vendedor.
+    Monta uma página do catálogo do comprador a partir de ?q= e ?cursor=.
+    Usado tanto pela página completa quanto pelo fragmento "carregar mais".
     """
     busca = request.GET.get("q", "").strip()
-
-    produtos = Produto.objects.select_related("vendedor").filter(
-        status_disponivel=True,
-        vendedor__status_disponivel=True,
-    )
+    cursor = request.GET.get("cursor")
+    tamanho = getattr(settings, "CATALOGO_PAGE_SIZE", 20)
 
     if busca:
-        produtos = produtos.filter(
-            Q(nome__icontains=busca) |
-            Q(vendedor__nome_venda__icontains=busca)
+        # busca indexada e ranqueada (ver appWeb/busca.py); usa SQL cru, síncrono
+        produtos, proximo_cursor = await sync_to_async(paginar_busca)(
+            lambda inicio, limite: buscar_produtos(busca, inicio, limite),
+            cursor=cursor,
+            tamanho=tamanho,
+        )
+    else:
+        produtos = Produto.objects.select_related("vendedor").filter(
+            status_disponivel=True,
+            vendedor__status_disponivel=True,
         )
+        produtos, proximo_cursor = await apaginar_por_cursor(produtos, cursor=cursor, tamanho=tamanho)
 
-    context = {
+    urls = await resolver_urls([arquivo_card(produto) for produto in produtos])
+    for produto, url in zip(produtos, urls):
+        produto.url_card = url
+
+    return {
         "produtos": produtos,
         "busca": busca,
+        "proximo_cursor": proximo_cursor,
     }
-    return render(request, "appWeb/cliente/home_cliente.html", context)
+
+
+async def home_cliente(request):
+    """
+    Lista de produtos para o comprador (sem login).
+    Permite busca por nome/descrição do produto ou nome do vendedor.
+    Os produtos vêm paginados por cursor (ver appWeb/paginacao.py).
+    """
+    context = await _catalogo_cliente(request)
+    return await sync_to_async(render)(request, "appWeb/cliente/home_cliente.html", context)
+
+
+async def home_cliente_mais(request):
+    """
+    Fragmento HTML com a próxima página do catálogo (botão "Carregar mais").
+    """
+    context = await _catalogo_cliente(request)
+    return await sync_to_async(render)(request, "appWeb/cliente/_produtos_lista.html", context)
 
 
 def info_vendedores(request):
@@ -313,53 +410,99 @@ def info_vendedores(request):
     return render(request, "appWeb/cliente/info_vendedores.html")
 
 
-def detalhe_produto_cliente(request, produto_id):
+async def carregar_detalhe_produto(produto_id):
     """
-    Tela de detalhes do produto para o comprador.
-    Mostra imagem grande, nome, preço, vendedor e descrição.
-    Botão 'Entre em contato' pode abrir um link de WhatsApp.
+    Busca tudo que a tela de detalhe do produto precisa em 2 queries fixas
+    (produto + vendedor, galeria ordenada), não importa quantas imagens a
+    galeria tenha. Devolve (produto, urls) com as URLs das imagens já
+    resolvidas (em paralelo): principal primeiro, depois a galeria.
     """
-    produto = get_object_or_404(
+    produto = await aget_object_or_404(
         Produto.objects.select_related("vendedor"),
         id=produto_id,
         status_disponivel=True,
         vendedor__status_disponivel=True,
     )
+    galeria = ImagemProduto.objects.filter(produto=produto).order_by("criado_em", "id")
 
-    # se quiser usar link de WhatsApp:
-    whatsapp_link = ""
-    if produto.vendedor.celular:
-        numero = produto.vendedor.celular
-        numero = "".join(filter(str.isdigit, numero))
-        whatsapp_link = f"https://wa.me/55{numero}"
+    arquivos = []
+    if produto.imagem:
+        arquivos.append(produto.imagem)
+    arquivos.extend([img.imagem async for img in galeria])
+    return produto, await resolver_urls(arquivos)
+
+
+async def detalhe_produto_cliente(request, produto_id):
+    """
+    Tela de detalhes do produto para o comprador.
+    Mostra imagem grande, nome, preço, vendedor e descrição.
+    Botão 'Entre em contato' pode abrir um link de WhatsApp.
+    O HTML fica em cache até o vendedor alterar algo (appWeb/cache_catalogo.py).
+    """
+    usar_cache = await sync_to_async(cache_catalogo.pode_usar_cache)(request)
+    if usar_cache:
+        conteudo = await sync_to_async(cache_catalogo.pagina_produto, thread_sensitive=False)(produto_id)
+        if conteudo is not None:
+            return HttpResponse(conteudo)
+        # versão lida antes de carregar o produto, como em detalhe_vendedor_cliente:
+        # se o vendedor alterar algo no meio, a página guardada já nasce vencida
+        vendedor_id = await Produto.objects.filter(id=produto_id).values_list("vendedor_id", flat=True).afirst()
+        if vendedor_id is None:
+            raise Http404
+        versao = await sync_to_async(cache_catalogo.versao_vendedor, thread_sensitive=False)(vendedor_id)
+
+    produto, imagens = await carregar_detalhe_produto(produto_id)
 
     context = {
         "produto": produto,
-        "whatsapp_link": whatsapp_link,
+        "imagens": imagens,
+        # link de WhatsApp a partir do celular já normalizado (appWeb/telefones.py)
+        "whatsapp_link": produto.vendedor.whatsapp_link,
     }
-    return render(request, "appWeb/cliente/detalhe_produto.html", context)
+    response = await sync_to_async(render)(request, "appWeb/cliente/detalhe_produto.html", context)
+    # (o produto pode ter trocado de vendedor entre as duas consultas)
+    if usar_cache and produto.vendedor_id == vendedor_id:
+        await sync_to_async(cache_catalogo.guardar_pagina_produto, thread_sensitive=False)(
+            produto.id, produto.vendedor_id, versao, response.content
+        )
+    return response
 
 
-def detalhe_vendedor_cliente(request, vendedor_id):
+async def detalhe_vendedor_cliente(request, vendedor_id):
     """
     Tela de perfil do vendedor na visão do comprador.
     Mostra dados do vendedor + lista de produtos disponíveis dele.
+    O HTML fica em cache até o vendedor alterar algo (appWeb/cache_catalogo.py).
     """
-    vendedor = get_object_or_404(Vendedor, id=vendedor_id, status_disponivel=True)
+    usar_cache = await sync_to_async(cache_catalogo.pode_usar_cache)(request)
+    if usar_cache:
+        versao = await sync_to_async(cache_catalogo.versao_vendedor, thread_sensitive=False)(vendedor_id)
+        conteudo = await sync_to_async(cache_catalogo.pagina_vendedor, thread_sensitive=False)(vendedor_id, versao)
+        if conteudo is not None:
+            return HttpResponse(conteudo)
 
-    produtos = vendedor.produtos.filter(status_disponivel=True)
+    vendedor = await aget_object_or_404(Vendedor, id=vendedor_id, status_disponivel=True)
 
-    whatsapp_link = ""
-    if vendedor.celular:
-        numero = "".join(filter(str.isdigit, vendedor.celular))
-        whatsapp_link = f"https://wa.me/55{numero}"
+    produtos = [produto async for produto in vendedor.produtos.filter(status_disponivel=True)]
+
+    # avatar + cards, resolvidos juntos
+    vendedor.url_card, *urls = await resolver_urls(
+        [arquivo_card(vendedor)] + [arquivo_card(produto) for produto in produtos]
+    )
+    for produto, url in zip(produtos, urls):
+        produto.url_card = url
 
     context = {
         "vendedor": vendedor,
         "produtos": produtos,
-        "whatsapp_link": whatsapp_link,
+        "whatsapp_link": vendedor.whatsapp_link,
     }
-    return render(request, "appWeb/cliente/detalhe_vendedor.html", context)
+    response = await sync_to_async(render)(request, "appWeb/cliente/detalhe_vendedor.html", context)
+    if usar_cache:
+        await sync_to_async(cache_catalogo.guardar_pagina_vendedor, thread_sensitive=False)(
+            vendedor_id, versao, response.content
+        )
+    return response
 
 
 # -----------------------
@@ -379,12 +522,8 @@ def password_reset_request(request):
                 f"{link}\n\n"
                 "Se você não solicitou essa alteração, ignore esta mensagem.\n"
             )
-            from_email = getattr(settings, "DEFAULT_FROM_EMAIL", "no-reply@localhost")
-            try:
-                send_mail(subject, message, from_email, [vendedor.email])
-            except Exception:
-                # don't leak mail errors to the user; log if needed
-                pass
+            # só enfileira; o worker (manage.py enviar_emails) faz o envio
+            enfileirar_email(subject, message, [vendedor.email])
 
         messages.info(request, "Se o e-mail estiver cadastrado, você receberá instruções por e-mail.")
         return redirect("login")
@@ -443,4 +582,21 @@ def activate_account(request, token):
     vendedor.is_active = True
     vendedor.save()
     messages.success(request, "Conta ativada! Você já pode fazer login.")
-    return render(request, "appWeb/vendedor/activation_confirm.html")
\ No newline at end of file
+    return render(request, "appWeb/vendedor/activation_confirm.html")
+
+
+# -----------------------
+# Métricas (MetricasMiddleware)
+# -----------------------
+def metricas_resumo(request):
+    """
+    JSON com p50/p95/p99 por view. Aberto só em DEBUG ou com o header
+    X-Metricas-Token igual a settings.METRICAS_TOKEN.
+    """
+    token = getattr(settings, "METRICAS_TOKEN", "")
+    autorizado = settings.DEBUG or (
+        token and constant_time_compare(request.headers.get("X-Metricas-Token", ""), token)
+    )
+    if not autorizado:
+        raise Http404
+    return JsonResponse(metricas.resumo())
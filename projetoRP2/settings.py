@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -49,6 +51,51 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 if os.environ.get('CLOUDINARY_URL'):
     DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
 
+# Serve MEDIA_URL from MEDIA_ROOT through appWeb/midia.py (ETag, Range,
+# Cache-Control), also with DEBUG off. Off by default when Cloudinary serves
+# the media. Content-hashed names get a one-year immutable Cache-Control; the
+# others MIDIA_CACHE_MAX_AGE seconds plus revalidation.
+MIDIA_SERVIR = os.environ.get('MIDIA_SERVIR', 'False' if os.environ.get('CLOUDINARY_URL') else 'True') == 'True'
+MIDIA_CACHE_MAX_AGE = int(os.environ.get('MIDIA_CACHE_MAX_AGE', 3600))
+
+
+# Number of products per page in the buyer catalog (keyset/cursor pagination).
+CATALOGO_PAGE_SIZE = int(os.environ.get('CATALOGO_PAGE_SIZE', 20))
+
+
+# Threads used to upload a product's gallery images to the media storage in
+# parallel (criar_produto / editar_produto).
+GALERIA_UPLOAD_WORKERS = int(os.environ.get('GALERIA_UPLOAD_WORKERS', 4))
+
+# Threads (per process) the async buyer views use to resolve remote storage
+# URLs concurrently (appWeb/imagens.py, resolver_urls).
+STORAGE_URL_WORKERS = int(os.environ.get('STORAGE_URL_WORKERS', 32))
+
+# Content-addressed uploads for the image fields (appWeb/storage.py): files are
+# named by their SHA-256 and identical uploads are stored once, so the names
+# can be cached forever. The reference count is an upper bound (model deletes
+# don't decrement it); unused files are removed by `manage.py limpar_midia`.
+STORAGE_DEDUP = os.environ.get('STORAGE_DEDUP', 'True') == 'True'
+
+# Memoized storage URLs for the image fields (appWeb/storage.py): a per-process
+# LRU of STORAGE_URL_CACHE_TAMANHO names plus, for remote storages, the shared
+# cache, both valid for STORAGE_URL_CACHE_TIMEOUT seconds.
+STORAGE_URL_CACHE = os.environ.get('STORAGE_URL_CACHE', 'True') == 'True'
+STORAGE_URL_CACHE_TAMANHO = int(os.environ.get('STORAGE_URL_CACHE_TAMANHO', 5000))
+STORAGE_URL_CACHE_TIMEOUT = int(os.environ.get('STORAGE_URL_CACHE_TIMEOUT', 3600))
+
+
+# Per-view metrics (appWeb.middleware.MetricasMiddleware). The /metricas/ JSON
+# endpoint is open in DEBUG; in production send the X-Metricas-Token header.
+# METRICAS_ATIVAS=False drops the middleware and its template/storage timing
+# hooks. Each process publishes its samples in one of METRICAS_MAX_PROCESSOS
+# cache slots.
+METRICAS_ATIVAS = os.environ.get('METRICAS_ATIVAS', 'True') == 'True'
+METRICAS_MAX_PROCESSOS = int(os.environ.get('METRICAS_MAX_PROCESSOS', 64))
+METRICAS_TOKEN = os.environ.get('METRICAS_TOKEN', '')
+METRICAS_MAX_AMOSTRAS = int(os.environ.get('METRICAS_MAX_AMOSTRAS', 1000))
+METRICAS_FLUSH_A_CADA = int(os.environ.get('METRICAS_FLUSH_A_CADA', 50))
+
 
 # Application definition
 
@@ -72,11 +119,16 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    # per-view query count / DB / template / storage / total timings (Server-Timing header)
+    'appWeb.middleware.MetricasMiddleware',
+    # whitenoise's middleware, made async-capable so ASGI keeps views async
+    'appWeb.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # request.vendedor, resolved lazily from the session
+    'appWeb.middleware.VendedorMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -126,9 +178,99 @@ if _db_url:
             "Install it (add to requirements.txt) or unset DATABASE_URL."
         )
 
+    # Persistent connections (DB_CONN_MAX_AGE) are per thread, and under ASGI
+    # (uvicorn workers) each request runs its sync code on a thread of its own,
+    # so they would pile up one idle connection per thread. With DB_POOL=True
+    # (the Procfile sets it for the web process) connections come from a
+    # psycopg pool per process instead: handed back at the end of the request
+    # and reused by the next one, without a new TLS handshake. Keep
+    # web workers * DB_POOL_MAX_SIZE (+ the worker dyno) under the Postgres
+    # plan's connection limit. Pooling needs psycopg 3 and CONN_MAX_AGE=0.
+    DB_POOL = os.environ.get('DB_POOL', 'False') == 'True'
     DATABASES = {
-        'default': dj_database_url.parse(_db_url, conn_max_age=600, ssl_require=not DEBUG)
+        'default': dj_database_url.parse(
+            _db_url,
+            conn_max_age=0 if DB_POOL else int(os.environ.get('DB_CONN_MAX_AGE', 600)),
+            ssl_require=not DEBUG,
+        )
+    }
+    if DB_POOL:
+        DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+            'timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        }
+
+
+# Cache
+# CACHE_BACKEND chooses the backend: 'locmem' (default, per process), 'file'
+# (shared between gunicorn workers on the same machine, CACHE_LOCATION is the
+# directory) or 'redis' (REDIS_URL, e.g. a local redis-server).
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem')
+if CACHE_BACKEND == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/1'),
+        }
+    }
+elif CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_LOCATION', os.path.join(BASE_DIR, '.cache')),
+        }
     }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'unifood',
+        }
+    }
+
+# Seconds a rendered public seller/product page stays cached. Pages are also
+# invalidated by signals whenever the seller changes something.
+CATALOGO_CACHE_TIMEOUT = int(os.environ.get('CATALOGO_CACHE_TIMEOUT', 600))
+
+# Seconds the logged-in seller (request.vendedor) stays cached between
+# requests. Saving the seller invalidates it right away.
+VENDEDOR_SESSAO_CACHE_TIMEOUT = int(os.environ.get('VENDEDOR_SESSAO_CACHE_TIMEOUT', 60))
+
+
+# Login throttling (appWeb/limite_login.py): failed logins per client IP and
+# per e-mail inside a sliding window of LOGIN_JANELA_SEGUNDOS. Past the limit
+# the login is refused (HTTP 429) before the password is hashed. Set
+# LOGIN_CONFIAR_X_FORWARDED_FOR=True behind a proxy that appends the client IP
+# to X-Forwarded-For (Heroku's router does).
+LOGIN_JANELA_SEGUNDOS = int(os.environ.get('LOGIN_JANELA_SEGUNDOS', 300))
+LOGIN_MAX_FALHAS_IP = int(os.environ.get('LOGIN_MAX_FALHAS_IP', 30))
+LOGIN_MAX_FALHAS_EMAIL = int(os.environ.get('LOGIN_MAX_FALHAS_EMAIL', 5))
+LOGIN_CONFIAR_X_FORWARDED_FOR = os.environ.get('LOGIN_CONFIAR_X_FORWARDED_FOR', 'False') == 'True'
+
+
+# Sessions
+# SESSION_MODE chooses the engine: 'cached_db' (default: reads come from the
+# cache above, writes go to both, so a cache miss or restart loses nothing),
+# 'signed_cookies' (no server storage at all; the payload is just vendedor_id
+# plus messages, signed with SECRET_KEY) or 'db' (Django's default).
+# Expired rows of the db-backed modes are removed by `manage.py limpar_sessoes`.
+# Note: signed_cookies sessions cannot be revoked server-side. Logging out only
+# clears the cookie in that browser, and changing the password does not end the
+# seller's other sessions: a copied cookie stays valid until it expires
+# (SESSION_COOKIE_AGE). Use a db-backed mode if that matters.
+SESSION_ENGINES = {
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+    'db': 'django.contrib.sessions.backends.db',
+}
+SESSION_MODE = os.environ.get('SESSION_MODE', 'cached_db')
+if SESSION_MODE not in SESSION_ENGINES:
+    raise ImproperlyConfigured(
+        f"SESSION_MODE={SESSION_MODE!r} is not valid; use one of: {', '.join(SESSION_ENGINES)}."
+    )
+SESSION_ENGINE = SESSION_ENGINES[SESSION_MODE]
+SESSION_COOKIE_HTTPONLY = True
 
 
 # Password validation
@@ -15,10 +15,11 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 
 from django.conf import settings
-from django.conf.urls.static import static
+
+from appWeb.midia import servir_midia
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -26,5 +27,9 @@ urlpatterns = [
 ]
 
 
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+# Local media (no Cloudinary): served with ETag/Range/Cache-Control, in
+# production too (see appWeb/midia.py).
+if settings.MIDIA_SERVIR:
+    urlpatterns += [
+        re_path(r'^%s(?P<caminho>.+)$' % settings.MEDIA_URL.lstrip('/'), servir_midia, name='midia'),
+    ]
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""Local benchmark of the buyer and seller flows.
+
+Creates a throwaway test database (never touches the real one), seeds a
+synthetic catalog with `bulk_create` (appWeb/dados_sinteticos.py) and drives
+the views through Django's test client, measuring each request.
+
+Usage:
+  python tools/benchmark.py [--produtos 10000] [--vendedores 100]
+                            [--requisicoes 200] [--limpar-cache]
+                            [--seed 42] [--saida bench.json]
+
+Scenarios: home_cliente, home_cliente with ?q=, detalhe_produto_cliente,
+detalhe_vendedor_cliente, painel_vendedor and login_vendedor (POST).
+
+Output (stdout or --saida) is JSON with, per scenario: requests, throughput
+(req/s), p50/p95/p99/max latency in ms and p50/max query counts, plus the
+scale and the current git commit, so runs can be compared between commits.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import subprocess
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "projetoRP2.settings")
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, text=True).strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--produtos", type=int, default=10000, help="Products to seed (e.g. 100, 10000, 1000000)")
+    parser.add_argument("--vendedores", type=int, default=100, help="Sellers to seed")
+    parser.add_argument("--requisicoes", type=int, default=200, help="Requests per scenario")
+    parser.add_argument("--limpar-cache", action="store_true", help="Clear the cache before every request (measures uncached views)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--saida", help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    import django
+    django.setup()
+
+    from django.core.cache import cache
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+
+    from appWeb.dados_sinteticos import SENHA_PADRAO, gerar_catalogo
+    from appWeb.metricas import percentil
+    from appWeb.models import Produto, Vendedor
+
+    setup_test_environment()
+    nome_original = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        rng = random.Random(args.seed)
+        inicio = time.perf_counter()
+        gerar_catalogo(
+            vendedores=args.vendedores,
+            produtos=args.produtos,
+            seed=args.seed,
+            log=lambda msg: print(f"  seed: {msg}", file=sys.stderr),
+        )
+        tempo_seed = time.perf_counter() - inicio
+
+        ids_produtos = list(
+            Produto.objects.filter(status_disponivel=True, vendedor__status_disponivel=True)
+            .values_list("id", flat=True)[:10000]
+        )
+        vendedores = list(Vendedor.objects.filter(status_disponivel=True).values_list("id", "email")[:1000])
+        termos = ["brig", "bolo chocolate", "coxinha", "vegano", "doces"]
+
+        anonimo = Client()
+        logado = Client()
+        sessao = logado.session
+        sessao["vendedor_id"] = vendedores[0][0]
+        sessao.save()
+
+        def login():
+            _, email = rng.choice(vendedores)
+            return Client().post("/login/", {"email": email, "senha": SENHA_PADRAO})
+
+        cenarios = {
+            "home_cliente": lambda: anonimo.get("/cliente/"),
+            "home_cliente_busca": lambda: anonimo.get("/cliente/", {"q": rng.choice(termos)}),
+            "detalhe_produto_cliente": lambda: anonimo.get(f"/cliente/produto/{rng.choice(ids_produtos)}/"),
+            "detalhe_vendedor_cliente": lambda: anonimo.get(f"/cliente/vendedor/{rng.choice(vendedores)[0]}/"),
+            "painel_vendedor": lambda: logado.get("/painel/"),
+            "login_vendedor": login,
+        }
+
+        resultados = {}
+        for nome, requisicao in cenarios.items():
+            latencias, queries, status = [], [], {}
+            requisicao()  # aquecimento
+            inicio_cenario = time.perf_counter()
+            for _ in range(args.requisicoes):
+                if args.limpar_cache:
+                    cache.clear()
+                with CaptureQueriesContext(connection) as ctx:
+                    t0 = time.perf_counter()
+                    resp = requisicao()
+                    latencias.append((time.perf_counter() - t0) * 1000)
+                queries.append(len(ctx.captured_queries))
+                status[resp.status_code] = status.get(resp.status_code, 0) + 1
+            duracao = time.perf_counter() - inicio_cenario
+
+            latencias.sort()
+            queries.sort()
+            resultados[nome] = {
+                "requisicoes": args.requisicoes,
+                "throughput_rps": round(args.requisicoes / duracao, 1),
+                "latencia_ms": {
+                    "p50": round(percentil(latencias, 50), 2),
+                    "p95": round(percentil(latencias, 95), 2),
+                    "p99": round(percentil(latencias, 99), 2),
+                    "max": round(latencias[-1], 2),
+                },
+                "queries": {"p50": percentil(queries, 50), "max": queries[-1]},
+                "status": status,
+            }
+            print(f"  {nome}: {resultados[nome]['latencia_ms']['p50']} ms p50", file=sys.stderr)
+
+        relatorio = {
+            "commit": git_commit(),
+            "banco": connection.vendor,
+            "escala": {
+                "produtos": args.produtos,
+                "vendedores": args.vendedores,
+                "seed_segundos": round(tempo_seed, 2),
+            },
+            "limpar_cache": args.limpar_cache,
+            "cenarios": resultados,
+        }
+    finally:
+        connection.creation.destroy_test_db(nome_original, verbosity=0)
+        teardown_test_environment()
+
+    saida = json.dumps(relatorio, indent=2)
+    if args.saida:
+        Path(args.saida).write_text(saida + "\n")
+        print(f"Report written to {args.saida}", file=sys.stderr)
+    else:
+        print(saida)
+
+
+if __name__ == "__main__":
+    main()
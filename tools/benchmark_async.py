@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""Concurrency of the async buyer views on one worker.
+
+Seeds a throwaway test database (like tools/benchmark.py), points the image
+fields at a fake remote storage whose `url()` sleeps `--latencia-url` seconds
+(what a Cloudinary call costs) and drives home_cliente,
+detalhe_produto_cliente and detalhe_vendedor_cliente through Django's ASGI
+handler (AsyncClient), with the page cache disabled:
+
+  - sequencial: one request at a time, what a sync gunicorn worker does;
+  - concorrente: `--concorrencia` requests in flight on the same event loop,
+    what one uvicorn worker does.
+
+Each request runs like under Django's ASGIHandler: in its own
+ThreadSensitiveContext (so its sync code gets a thread of its own) and with
+close_old_connections at the end. That makes the database connection cost
+visible: with DB_CONN_MAX_AGE=0 every request opens a new connection, with
+DB_POOL=True it borrows one from the pool. SQLite connections are nearly
+free, so to see that cost point DATABASE_URL at Postgres (the test database
+is created and dropped there).
+
+Usage:
+  python tools/benchmark_async.py [--produtos 2000] [--vendedores 50]
+                                  [--requisicoes 100] [--concorrencia 20]
+                                  [--latencia-url 0.02] [--saida bench.json]
+
+Output is JSON with throughput (req/s) and p50/p95 latency per scenario and
+mode, plus the throughput gain of the concurrent mode.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "projetoRP2.settings")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--produtos", type=int, default=2000, help="Products to seed")
+    parser.add_argument("--vendedores", type=int, default=50, help="Sellers to seed")
+    parser.add_argument("--requisicoes", type=int, default=100, help="Requests per scenario and mode")
+    parser.add_argument("--concorrencia", type=int, default=20, help="Requests in flight in the concurrent mode")
+    parser.add_argument("--latencia-url", type=float, default=0.02, help="Seconds each storage url() takes")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--saida", help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    import django
+    django.setup()
+
+    from django.core.files.storage import Storage
+    from django.db import connection
+    from django.test import AsyncClient, override_settings
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    from appWeb.dados_sinteticos import gerar_catalogo
+    from appWeb.imagens import CAMPOS_MINIATURA
+    from appWeb.metricas import percentil
+    from appWeb.models import ImagemProduto, Produto, Vendedor
+
+    class StorageRemotoSimulado(Storage):
+        """Only url() is used by the pages; it blocks like a remote SDK call."""
+
+        def url(self, name):
+            time.sleep(args.latencia_url)
+            return f"https://cdn.example.com/{name}"
+
+        def exists(self, name):
+            return True
+
+    storage = StorageRemotoSimulado()
+    for model in (Vendedor, Produto, ImagemProduto):
+        for nome_campo in CAMPOS_MINIATURA[model.__name__]:
+            model._meta.get_field(nome_campo).storage = storage
+
+    setup_test_environment()
+    nome_original = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        with override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}):
+            relatorio = asyncio.run(_rodar(args, gerar_catalogo, Produto, Vendedor, ImagemProduto, AsyncClient, percentil))
+    finally:
+        # pooled connections (DB_POOL=True) would keep the test database busy
+        if getattr(connection, "pool", None):
+            connection.close_pool()
+        connection.creation.destroy_test_db(nome_original, verbosity=0)
+        teardown_test_environment()
+
+    saida = json.dumps(relatorio, indent=2)
+    if args.saida:
+        Path(args.saida).write_text(saida + "\n")
+        print(f"Report written to {args.saida}", file=sys.stderr)
+    else:
+        print(saida)
+
+
+async def _rodar(args, gerar_catalogo, Produto, Vendedor, ImagemProduto, AsyncClient, percentil):
+    from asgiref.sync import ThreadSensitiveContext, sync_to_async
+    from django.db import close_old_connections, connection
+
+    def seed():
+        gerar_catalogo(vendedores=args.vendedores, produtos=args.produtos, seed=args.seed)
+        # every card has an image, so every page resolves one URL per card
+        Produto.objects.update(imagem="produtos/foto.png")
+        Vendedor.objects.update(foto_perfil="vendedores/perfis/foto.png")
+        ImagemProduto.objects.bulk_create(
+            ImagemProduto(produto_id=pid, imagem=f"produtos/catalogo/{pid}_{i}.png")
+            for pid in Produto.objects.values_list("id", flat=True)[:500]
+            for i in range(4)
+        )
+        ids_produtos = list(
+            Produto.objects.filter(status_disponivel=True, vendedor__status_disponivel=True)
+            .values_list("id", flat=True)[:500]
+        )
+        ids_vendedores = list(Vendedor.objects.filter(status_disponivel=True).values_list("id", flat=True))
+        return ids_produtos, ids_vendedores
+
+    def semear():
+        try:
+            return seed()
+        finally:
+            # the seed runs outside any request: don't leave its connection open
+            connection.close()
+
+    ids_produtos, ids_vendedores = await sync_to_async(semear)()
+    rng = random.Random(args.seed)
+    client = AsyncClient()
+
+    cenarios = {
+        "home_cliente": lambda: client.get("/cliente/"),
+        "detalhe_produto_cliente": lambda: client.get(f"/cliente/produto/{rng.choice(ids_produtos)}/"),
+        "detalhe_vendedor_cliente": lambda: client.get(f"/cliente/vendedor/{rng.choice(ids_vendedores)}/"),
+    }
+
+    async def medir(requisicao):
+        t0 = time.perf_counter()
+        # like ASGIHandler: a thread per request for sync code, and its
+        # connection closed (or handed back to the pool) when it ends
+        async with ThreadSensitiveContext():
+            resp = await requisicao()
+            await sync_to_async(close_old_connections)()
+        assert resp.status_code == 200, resp.status_code
+        return (time.perf_counter() - t0) * 1000
+
+    resultados = {}
+    for nome, requisicao in cenarios.items():
+        await medir(requisicao)  # aquecimento
+        linha = {}
+
+        inicio = time.perf_counter()
+        latencias = [await medir(requisicao) for _ in range(args.requisicoes)]
+        linha["sequencial"] = _resumo(latencias, time.perf_counter() - inicio, percentil)
+
+        semaforo = asyncio.Semaphore(args.concorrencia)
+
+        async def limitada():
+            async with semaforo:
+                return await medir(requisicao)
+
+        inicio = time.perf_counter()
+        latencias = await asyncio.gather(*(limitada() for _ in range(args.requisicoes)))
+        linha["concorrente"] = _resumo(list(latencias), time.perf_counter() - inicio, percentil)
+
+        linha["ganho_throughput"] = round(
+            linha["concorrente"]["throughput_rps"] / linha["sequencial"]["throughput_rps"], 2
+        )
+        resultados[nome] = linha
+        print(f"  {nome}: {linha['ganho_throughput']}x", file=sys.stderr)
+
+    return {
+        "banco": _banco(),
+        "escala": {"produtos": args.produtos, "vendedores": args.vendedores},
+        "requisicoes": args.requisicoes,
+        "concorrencia": args.concorrencia,
+        "latencia_url_s": args.latencia_url,
+        "cenarios": resultados,
+    }
+
+
+def _banco():
+    from django.db import connection
+
+    opcoes = connection.settings_dict.get("OPTIONS", {})
+    return {
+        "vendor": connection.vendor,
+        "conn_max_age": connection.settings_dict["CONN_MAX_AGE"],
+        "pool": bool(opcoes.get("pool")),
+    }
+
+
+def _resumo(latencias, duracao, percentil):
+    latencias.sort()
+    return {
+        "throughput_rps": round(len(latencias) / duracao, 1),
+        "latencia_ms": {
+            "p50": round(percentil(latencias, 50), 2),
+            "p95": round(percentil(latencias, 95), 2),
+        },
+    }
+
+
+if __name__ == "__main__":
+    main()
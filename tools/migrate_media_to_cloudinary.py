@@ -1,29 +1,79 @@
 #!/usr/bin/env python3
-"""Migrate local MEDIA files into Django's default storage.
+"""Migrate local MEDIA files into the storage configured on the ImageFields.
 
 Usage:
   - Ensure `DJANGO_SETTINGS_MODULE` is set (e.g. `projetoRP2.settings`) and
     `CLOUDINARY_URL` is set in the environment to point to Cloudinary.
-  - Run: `python3 tools/migrate_media_to_cloudinary.py [--dry-run]`
+  - Run: `python3 tools/migrate_media_to_cloudinary.py [--dry-run]
+    [--batch-size N] [--workers N] [--checkpoint FILE] [--restart]`
 
 Behavior:
-  - Iterates `Vendedor.foto_perfil`, `Produto.imagem`, and `ImagemProduto.imagem`.
-  - For each file present on disk under `settings.MEDIA_ROOT`, opens it and
-    saves it through `default_storage.save(...)`. When Cloudinary is configured
-    as the default storage, the file will be uploaded to Cloudinary.
-  - Updates model fields to point to the saved name returned by storage.
+  - Iterates `Vendedor.foto_perfil`, `Produto.imagem`, `ImagemProduto.imagem`
+    and their `*_miniatura` thumbnails, in primary-key order, `--batch-size`
+    objects at a time.
+  - For each file present on disk under `settings.MEDIA_ROOT`, uploads it
+    through the field's storage (Cloudinary when configured, see
+    appWeb/models.py). Uploads of a batch run concurrently in a pool of
+    `--workers` threads.
+  - Files are identified by SHA-256, hashed before any upload is submitted.
+    If the same content was already uploaded (in this run, earlier in the
+    batch, or in a previous run recorded in the checkpoint) the upload is
+    skipped and the existing name is reused. A file already in the target
+    storage under the same name is detected from metadata only (the hash in
+    a content-addressed name, otherwise the size), without downloading it.
+  - Uploads go to the storage under the appWeb/storage.py layers, so the
+    worker threads never open database connections.
+  - Model fields of a whole batch are updated with one `bulk_update`.
+  - After each batch, progress (last pk per field, pks whose upload failed,
+    known hashes) is written to the checkpoint file, so an interrupted run
+    resumes where it stopped and the failed objects are retried on the next
+    run. Use `--restart` to ignore an existing checkpoint.
   - Supports `--dry-run` to list actions without performing uploads/changes.
 """
 
 import os
 import sys
+import json
+import hashlib
 import argparse
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+CHUNK = 1024 * 1024
+
+
+def sha256_of(fileobj):
+    h = hashlib.sha256()
+    for chunk in iter(lambda: fileobj.read(CHUNK), b""):
+        h.update(chunk)
+    return h.hexdigest()
+
+
+def load_checkpoint(path, restart):
+    if restart or not path.exists():
+        return {"last_pk": {}, "failed": {}, "hashes": {}}
+    with open(path) as f:
+        data = json.load(f)
+    data.setdefault("last_pk", {})
+    data.setdefault("failed", {})
+    data.setdefault("hashes", {})
+    return data
+
+
+def save_checkpoint(path, data):
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--dry-run", action="store_true", help="Don't perform uploads or DB writes")
-    parser.add_argument("--batch-size", type=int, default=100, help="Number of objects processed per batch (no effect currently)")
+    parser.add_argument("--batch-size", type=int, default=100, help="Objects per batch (one bulk_update and one checkpoint per batch)")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent uploads per batch")
+    parser.add_argument("--checkpoint", default="media_migration_checkpoint.json", help="Progress file used to resume an interrupted run")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start from the beginning")
     args = parser.parse_args()
 
     if "DJANGO_SETTINGS_MODULE" not in os.environ:
@@ -35,57 +85,154 @@ def main():
 
     from django.conf import settings
     from django.core.files import File
-    from django.core.files.storage import default_storage
 
     try:
         from appWeb.models import Vendedor, Produto, ImagemProduto
+        from appWeb.storage import storage_de_verdade
     except Exception as e:
         print("Error importing models:", e)
         sys.exit(1)
 
     media_root = Path(getattr(settings, "MEDIA_ROOT", "media"))
+    checkpoint_path = Path(args.checkpoint)
+    checkpoint = load_checkpoint(checkpoint_path, args.restart)
+    hashes = checkpoint["hashes"]  # sha256 -> name in target storage
     print(f"MEDIA_ROOT = {media_root}")
-    print("Dry run:" , args.dry_run)
-
-    def migrate_field(queryset, field_name, model_name):
-        total = queryset.count()
-        print(f"Processing {total} {model_name} objects for field '{field_name}'")
-        i = 0
-        for inst in queryset.iterator():
-            i += 1
-            file_field = getattr(inst, field_name)
-            if not file_field:
-                continue
-            name = file_field.name
+    print("Dry run:", args.dry_run)
+    print(f"Workers: {args.workers}  Batch size: {args.batch_size}  Checkpoint: {checkpoint_path}")
+
+    def already_in_target(storage, name, digest, size):
+        """True if `storage` has `name` with the local file's content, judged from metadata only."""
+        try:
+            if not storage.exists(name):
+                return False
+            # content-addressed names (appWeb/storage.py) carry the hash
+            if digest in name:
+                return True
+            return storage.size(name) == size
+        except Exception:
+            return False
+
+    def digest_of(src):
+        with open(src, "rb") as f:
+            return sha256_of(f)
+
+    def upload(storage, name, src, digest):
+        """Returns (saved_name, action). Runs in the thread pool; no DB access."""
+        if already_in_target(storage, name, digest, src.stat().st_size):
+            return name, "present"
+        with open(src, "rb") as f:
+            saved_name = storage.save(name, File(f))
+        return saved_name, "uploaded"
+
+    def migrate_batch(model, field_name, storage, batch, pool):
+        """Uploads one batch. Returns (rows updated, pks that failed)."""
+        key = f"{model.__name__}.{field_name}"
+        jobs = []
+        for inst in batch:
+            name = getattr(inst, field_name).name
             src = media_root / name
             if not src.exists():
-                print(f"  [{i}/{total}] SKIP missing file for {model_name}.{field_name}: {src}")
+                print(f"  SKIP missing file for {key} pk={inst.pk}: {src}")
                 continue
-            print(f"  [{i}/{total}] Found file: {src}")
             if args.dry_run:
+                print(f"  Would upload {src}")
                 continue
-            # open and save via default_storage
+            jobs.append((inst, name, src, pool.submit(digest_of, src)))
+
+        # hash first, then one upload per content not seen yet: identical
+        # files in the same batch reuse the name of the first one
+        hashed, failed, uploads = [], [], {}
+        for inst, name, src, future in jobs:
             try:
-                with open(src, "rb") as f:
-                    django_file = File(f)
-                    saved_name = default_storage.save(name, django_file)
-                # update model field to saved_name
-                setattr(inst, field_name, saved_name)
-                inst.save(update_fields=[field_name])
-                print(f"    Uploaded -> {saved_name}")
+                digest = future.result()
             except Exception as e:
-                print(f"    ERROR uploading {src}: {e}")
+                print(f"    ERROR reading {src}: {e}")
+                failed.append(inst.pk)
+                continue
+            hashed.append((inst, name, digest))
+            if digest not in hashes and digest not in uploads:
+                uploads[digest] = pool.submit(upload, storage, name, src, digest)
+
+        changed = []
+        for inst, name, digest in hashed:
+            if digest in hashes:
+                saved_name, action = hashes[digest], "dedup"
+            else:
+                try:
+                    saved_name, action = uploads[digest].result()
+                except Exception as e:
+                    print(f"    ERROR uploading {name}: {e}")
+                    failed.append(inst.pk)
+                    continue
+                hashes[digest] = saved_name
+            print(f"    {action}: {name} -> {saved_name}")
+            if saved_name != name:
+                setattr(inst, field_name, saved_name)
+                changed.append(inst)
+
+        if changed:
+            model.objects.bulk_update(changed, [field_name])
+        return len(changed), failed
+
+    def migrate_field(model, field_name, pool):
+        key = f"{model.__name__}.{field_name}"
+        # the uploads go straight to the storage under the layers of
+        # appWeb/storage.py, so the worker threads never touch the database
+        storage = storage_de_verdade(model._meta.get_field(field_name).storage)
+        last_pk = checkpoint["last_pk"].get(key, 0)
+        failed = set(checkpoint["failed"].get(key, []))
+        queryset = model.objects.exclude(**{field_name: ""}).exclude(**{f"{field_name}__isnull": True})
+        total = queryset.filter(pk__gt=last_pk).count()
+        print(f"Processing {total} {model.__name__} objects for field '{field_name}' (resuming after pk {last_pk})")
+
+        def save_progress():
+            if not args.dry_run:
+                checkpoint["last_pk"][key] = last_pk
+                checkpoint["failed"][key] = sorted(failed)
+                save_checkpoint(checkpoint_path, checkpoint)
+
+        # retry what failed in previous runs first
+        if failed:
+            print(f"  Retrying {len(failed)} objects that failed before")
+            retry = list(queryset.filter(pk__in=failed).order_by("pk").only("pk", field_name))
+            failed.difference_update(inst.pk for inst in retry)
+            for i in range(0, len(retry), args.batch_size):
+                _, batch_failed = migrate_batch(model, field_name, storage, retry[i:i + args.batch_size], pool)
+                failed.update(batch_failed)
+                save_progress()
+
+        done = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk).order_by("pk").only("pk", field_name)[:args.batch_size])
+            if not batch:
+                break
+
+            updated, batch_failed = migrate_batch(model, field_name, storage, batch, pool)
+            failed.update(batch_failed)
+            done += len(batch)
+            last_pk = batch[-1].pk
+            # failed pks stay in the checkpoint and are retried on the next run
+            save_progress()
+            print(f"  [{done}/{total}] batch done (last pk {last_pk}, {updated} rows updated, {len(batch_failed)} failed)")
+
+        if failed:
+            print(f"  {len(failed)} {key} objects failed; run again to retry them")
 
-    # 1) Vendedor.foto_perfil
-    migrate_field(Vendedor.objects.all(), "foto_perfil", "Vendedor")
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        # 1) Vendedor.foto_perfil
+        migrate_field(Vendedor, "foto_perfil", pool)
+        migrate_field(Vendedor, "foto_perfil_miniatura", pool)
 
-    # 2) Produto.imagem
-    migrate_field(Produto.objects.all(), "imagem", "Produto")
+        # 2) Produto.imagem
+        migrate_field(Produto, "imagem", pool)
+        migrate_field(Produto, "imagem_miniatura", pool)
 
-    # 3) ImagemProduto.imagem
-    migrate_field(ImagemProduto.objects.all(), "imagem", "ImagemProduto")
+        # 3) ImagemProduto.imagem
+        migrate_field(ImagemProduto, "imagem", pool)
+        migrate_field(ImagemProduto, "imagem_miniatura", pool)
 
-    print("Done. If not dry-run, files should now be stored via default_storage.")
+    print("Done. If not dry-run, files should now be stored in the target storage.")
 
 if __name__ == "__main__":
     main()